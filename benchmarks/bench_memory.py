@@ -0,0 +1,64 @@
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.build_dataset import build  # noqa: E402
+from scripts.build_h2h_dataset import build_pairs  # noqa: E402
+from scripts.featurizeData import build_features  # noqa: E402
+from scripts.storage import apply_schema  # noqa: E402
+from scripts.synth import generate_results, generate_sources  # noqa: E402
+
+
+def wide(df):
+    """The same frame in the old dtypes: object strings, int64 keys/flags, float64 numbers."""
+    out = {}
+    for col, s in df.items():
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.astype(object)
+        elif pd.api.types.is_integer_dtype(s.dtype):
+            s = s.astype("float64") if s.isna().any() else s.astype("int64")
+        elif pd.api.types.is_float_dtype(s.dtype):
+            s = s.astype("float64")
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def footprint_mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def tables(seasons=10, seed=0, pairs_per_race=50):
+    results = generate_results(seasons=seasons, seed=seed)
+    raw = apply_schema(build(generate_sources(results, seed)), "raw")
+    feats = apply_schema(build_features(raw, "postqual"), "featurized")
+    h2h = apply_schema(build_pairs(feats, pairs_per_race, seed=seed), "h2h")
+    return {"raw": raw, "featurized": feats, "h2h": h2h}
+
+
+def memory_report(frames):
+    rows = []
+    for name, df in frames.items():
+        before, after = footprint_mb(wide(df)), footprint_mb(df)
+        rows.append({"table": name, "rows": len(df), "before_mb": round(before, 2), "after_mb": round(after, 2), "ratio": round(after / before, 3)})
+    return pd.DataFrame(rows)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seasons", type=int, default=10, help="synthetic seasons (36 races, 40 cars each)")
+    ap.add_argument("--pairs_per_race", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    report = memory_report(tables(args.seasons, args.seed, args.pairs_per_race))
+    print(report.to_string(index=False))
+    before, after = report["before_mb"].sum(), report["after_mb"].sum()
+    print(f"total {before:.2f} MB -> {after:.2f} MB ({after / before:.1%} of the wide dtypes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.driveraverages import parse_driveraverages_html, parse_pages  # noqa: E402
+
+
+def synthetic_page(year, race_num, drivers=40, filler=200):
+    nav = "".join(f"<li><a href='/nascar/driver.php?id={i}'>Driver link {i}</a></li>" for i in range(filler))
+    head = "<tr><th>Driver</th><th>Start</th><th>Finish</th><th>Car #</th><th>Pts</th><th>Laps</th><th>Led</th><th>Status</th><th>Team</th><th>Make</th></tr>"
+    body = "".join(
+        f"<tr><td><a href='#'>Driver {i}</a></td><td>{(i * 7) % drivers + 1}</td><td>{i + 1}</td><td>{i}</td><td>{45 - i}</td><td>267</td><td>{i % 5}</td><td>Running</td><td>Team {i % 12}</td><td>Chevrolet</td></tr>"
+        for i in range(drivers)
+    )
+    return f"<html><head><script>var x = 1;</script></head><body><ul>{nav}</ul><h1>Race {race_num} of {year}</h1><table>{head}{body}</table><div>{nav}</div></body></html>"
+
+
+def bench(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=360)
+    ap.add_argument("--iters", type=int, default=50)
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    html = synthetic_page(2024, 1)
+    assert parse_driveraverages_html(html, 202401, 2024, 1, "x", "lxml") == parse_driveraverages_html(html, 202401, 2024, 1, "x", "bs4")
+    t_bs4 = bench(lambda: parse_driveraverages_html(html, 202401, 2024, 1, "x", "bs4"), args.iters)
+    t_lxml = bench(lambda: parse_driveraverages_html(html, 202401, 2024, 1, "x", "lxml"), args.iters)
+    print(f"single page: bs4={t_bs4 * 1000:.2f}ms lxml={t_lxml * 1000:.2f}ms speedup={t_bs4 / t_lxml:.1f}x")
+
+    pages = [(synthetic_page(2000 + i // 36, i % 36 + 1), i, 2000 + i // 36, i % 36 + 1, "x") for i in range(args.pages)]
+    for engine, workers in [("bs4", 1), ("lxml", 1), ("lxml", args.workers)]:
+        t0 = time.perf_counter()
+        parse_pages(pages, engine=engine, workers=workers)
+        print(f"{args.pages} pages engine={engine} workers={workers}: {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.build_dataset import build  # noqa: E402
+from scripts.build_h2h_dataset import build_pairs  # noqa: E402
+from scripts.driveraverages import parse_pages  # noqa: E402
+from scripts.featurizeData import build_features  # noqa: E402
+from scripts.synth import generate_results, generate_sources, render_pages  # noqa: E402
+from scripts.train_predict import score, train_models  # noqa: E402
+
+BASELINE = Path(__file__).resolve().parent / "baselines.json"
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def run_scale(scale, seed=0, parse_workers=1):
+    # 1x is one 36-race season with a 40-car field; 10x/100x add seasons.
+    results = generate_results(seasons=scale, seed=seed)
+    pages = render_pages(results)
+    years = results.drop_duplicates("sked_id").set_index("sked_id")[["year", "season_race_num"]]
+    jobs = [(html, sked_id, int(years.at[sked_id, "year"]), int(years.at[sked_id, "season_race_num"]), "x") for sked_id, html in pages.items()]
+    times = {}
+    parsed, times["parse"] = timed(lambda: parse_pages(jobs, workers=parse_workers))
+    assert sum(len(rows) for rows in parsed) == len(results)
+    raw, times["build_dataset"] = timed(lambda: build(generate_sources(results, seed)))
+    feats, times["build_features"] = timed(lambda: build_features(raw))
+    _, times["h2h_pairs"] = timed(lambda: build_pairs(feats, 50, seed=seed))
+    # train_models prints its holdout metrics; keep the benchmark output to timings.
+    with contextlib.redirect_stdout(io.StringIO()):
+        (artifacts, _), times["fit"] = timed(lambda: train_models(feats))
+    last = feats[feats["year"] == feats["year"].max()]
+    _, times["predict"] = timed(lambda: score(last, *artifacts))
+    return {"rows": len(results), "seconds": {k: round(v, 4) for k, v in times.items()}}
+
+
+def run_suite(scales=(1, 10, 100), seed=0, parse_workers=1):
+    return {f"{scale}x": run_scale(scale, seed, parse_workers) for scale in scales}
+
+
+def load_baseline(path=BASELINE):
+    return json.loads(Path(path).read_text(encoding="utf-8")) if Path(path).exists() else {}
+
+
+def regressions(results, baseline, tolerance=0.5, min_seconds=0.05):
+    """Stages slower than baseline * (1 + tolerance); sub-`min_seconds` stages are too noisy to judge."""
+    out = []
+    for scale, res in results.items():
+        base = baseline.get(scale, {}).get("seconds", {})
+        for stage, seconds in res["seconds"].items():
+            ref = base.get(stage)
+            if ref is not None and max(seconds, ref) >= min_seconds and seconds > ref * (1 + tolerance):
+                out.append(f"{stage}@{scale}: {seconds:.3f}s vs baseline {ref:.3f}s (+{(seconds / ref - 1) * 100:.0f}%)")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scales", default="1,10,100", help="comma list of multipliers (1x = one 36-race season, 40 cars)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--parse_workers", type=int, default=1)
+    ap.add_argument("--baseline", default=str(BASELINE))
+    ap.add_argument("--save_baseline", action="store_true", help="store these timings as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown vs baseline before flagging")
+    args = ap.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    results = run_suite(scales, args.seed, args.parse_workers)
+    for scale, res in results.items():
+        print(f"{scale} rows={res['rows']}: " + " ".join(f"{k}={v:.3f}s" for k, v in res["seconds"].items()))
+
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline)
+        baseline.update(results)
+        Path(args.baseline).write_text(json.dumps(baseline, indent=2), encoding="utf-8")
+        print(f"[OK] baseline saved to {args.baseline}")
+        return
+    found = regressions(results, load_baseline(args.baseline), args.tolerance)
+    for line in found:
+        print(f"[WARN] regression {line}")
+    if found:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.featurizeData import build_features  # noqa: E402
+
+
+def legacy_build_features(df, mode="prequal"):
+    df = df.copy()
+    df["race_date"] = pd.to_datetime(df["race_date"], errors="coerce")
+    df = df.sort_values(["driver_id", "race_date", "season_race_num"])
+    df["target_finish"] = pd.to_numeric(df.get("Finish"), errors="coerce")
+    df["target_top10"] = (df["target_finish"] <= 10).astype("Int64")
+    df["target_top5"] = (df["target_finish"] <= 5).astype("Int64")
+    df["target_win"] = (df["target_finish"] == 1).astype("Int64")
+    df["target_dnf"] = df.get("Status", "").astype(str).str.contains("DNF|Accident|Engine", case=False, na=False).astype("Int64")
+    grp = df.groupby("driver_id", group_keys=False)
+    shifted_finish = grp["target_finish"].shift(1)
+    shifted_top10 = grp["target_top10"].shift(1)
+    shifted_dnf = grp["target_dnf"].shift(1)
+    for w in (5, 10, 20):
+        df[f"drv_finish_mean_{w}"] = shifted_finish.groupby(df["driver_id"]).rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
+        df[f"drv_finish_std_{w}"] = shifted_finish.groupby(df["driver_id"]).rolling(w, min_periods=2).std().reset_index(level=0, drop=True)
+        df[f"drv_top10_rate_{w}"] = shifted_top10.groupby(df["driver_id"]).rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
+        df[f"drv_dnf_rate_{w}"] = shifted_dnf.groupby(df["driver_id"]).rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
+    if mode == "postqual":
+        start_shift = grp["Start"].shift(1)
+        q_shift = grp["qual_speed"].shift(1)
+        df["drv_start_mean_10"] = start_shift.groupby(df["driver_id"]).rolling(10, min_periods=1).mean().reset_index(level=0, drop=True)
+        df["drv_qual_speed_mean_10"] = q_shift.groupby(df["driver_id"]).rolling(10, min_periods=1).mean().reset_index(level=0, drop=True)
+    return df.sort_values(["race_date", "year", "season_race_num", "driver_id"])
+
+
+def synthetic_history(seasons=50, drivers=40, races=36, seed=0):
+    rng = np.random.default_rng(seed)
+    n = seasons * races * drivers
+    year = np.repeat(np.arange(1970, 1970 + seasons), races * drivers)
+    race = np.tile(np.repeat(np.arange(1, races + 1), drivers), seasons)
+    finish = np.tile(np.arange(1, drivers + 1), seasons * races)
+    rng.shuffle(finish.reshape(-1, drivers).T)
+    return pd.DataFrame(
+        {
+            "sked_id": year * 100 + race,
+            "year": year,
+            "season_race_num": race,
+            "race_date": pd.to_datetime(year.astype(str) + "-01-01") + pd.to_timedelta(race * 7, unit="D"),
+            "driver_id": np.tile([f"d{i:03d}" for i in range(drivers)], seasons * races),
+            "Finish": finish.astype(float),
+            "Status": np.where(rng.random(n) < 0.08, "Accident", "Running"),
+            "Start": rng.integers(1, drivers + 1, n).astype(float),
+            "qual_speed": 170 + rng.random(n) * 15,
+        }
+    )
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seasons", type=int, default=50)
+    ap.add_argument("--drivers", type=int, default=40)
+    ap.add_argument("--mode", choices=["prequal", "postqual"], default="postqual")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    df = synthetic_history(args.seasons, args.drivers)
+    t_old, old = timed(lambda: legacy_build_features(df, args.mode), args.repeat)
+    t_new, new = timed(lambda: build_features(df, args.mode), args.repeat)
+    feats = [c for c in old.columns if c.startswith("drv_")]
+    err = np.nanmax(np.abs(old[feats].to_numpy(float) - new[feats].to_numpy(float)))
+    print(f"rows={len(df)} features={len(feats)} legacy={t_old:.3f}s engine={t_new:.3f}s speedup={t_old / t_new:.1f}x max_abs_diff={err:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+CHAIN = ["normalize_ids", "enrich_track_meta", "enrich_race_structure", "enrich_weather", "build_dataset", "featurize", "train_predict", "h2h_predict"]
+SCRIPT = {"featurize": "featurizeData"}
+
+
+def timed(cmd, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    py = sys.executable
+    rows = [
+        ("python -c pass", timed([py, "-c", "pass"], args.repeat)),
+        ("get_entries.py --help", timed([py, "scripts/get_entries.py", "--help"], args.repeat)),
+        ("train_predict.py --help", timed([py, "scripts/train_predict.py", "--help"], args.repeat)),
+        ("nascar.py --help", timed([py, "scripts/nascar.py", "--help"], args.repeat)),
+        ("nascar.py train_predict --help", timed([py, "scripts/nascar.py", "train_predict", "--help"], args.repeat)),
+        ("nascar.py pipeline --help", timed([py, "scripts/nascar.py", "pipeline", "--help"], args.repeat)),
+    ]
+    separate = sum(timed([py, f"scripts/{SCRIPT.get(c, c)}.py", "--help"], args.repeat) for c in CHAIN)
+    chained = [py, "scripts/nascar.py"]
+    for c in CHAIN:
+        chained += [c, "--help", "+"]
+    rows.append((f"{len(CHAIN)} scripts --help, one process each", separate))
+    rows.append((f"{len(CHAIN)} commands --help, chained in nascar.py", timed(chained[:-1], args.repeat)))
+    for name, seconds in rows:
+        print(f"{name:<48}{seconds * 1000:>8.0f} ms")
+
+    out = ROOT / "reports" / f"bench_startup_{int(time.time())}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({name: round(seconds * 1000, 1) for name, seconds in rows}, indent=2), encoding="utf-8")
+    print(f"[OK] wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ param(
 
 $ErrorActionPreference = 'Stop'
 $ts = Get-Date -Format 'yyyyMMdd_HHmmss'
-New-Item -ItemType Directory -Force -Path data/raw,data/enrich,data/featurized,data/dim,models,models_h2h,reports,cache/html | Out-Null
+New-Item -ItemType Directory -Force -Path data/raw,data/enrich,data/featurized,data/dim,models,models_h2h,reports,cache/html,cache/weather | Out-Null
 $log = "reports/pipeline_$ts.log"
 
 function Run-Step($cmd) {
@@ -19,12 +19,12 @@ function Run-Step($cmd) {
 }
 
 Run-Step "python scripts/get_results.py --start_year $StartYear --end_year $EndYear"
-Run-Step "python scripts/normalize_ids.py"
-Run-Step "python scripts/enrich_track_meta.py"
 Run-Step "python scripts/enrich_race_structure.py"
-Run-Step "python scripts/enrich_weather.py"
 Run-Step "python scripts/get_entries.py --year $EndYear --race 1"
 Run-Step "python scripts/get_qualifying.py --year $EndYear --race 1"
+Run-Step "python scripts/normalize_ids.py"
+Run-Step "python scripts/enrich_track_meta.py"
+Run-Step "python scripts/enrich_weather.py"
 Run-Step "python scripts/build_dataset.py"
 Run-Step "python scripts/validate_data.py"
 Run-Step "python scripts/featurizeData.py --mode $Mode"
@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import mean_absolute_error, roc_auc_score, brier_score_loss
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.build_h2h_dataset import build_pairs  # noqa: E402
+from scripts.h2h_predict import choose_model  # noqa: E402
+from scripts.storage import add_csv_arg, read_table, table_columns, write_table  # noqa: E402
+from scripts.train_predict import choose_models, fit_binary_model, model_columns, prob_of_one  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
+H2H_FLAGS = ["same_team_flag", "same_make_flag"]
+
+# Shared by every fit in a worker: set once per process by _init_worker instead of pickled per race.
+_SHARED = {}
+
+
+def feature_cols(df):
+    return [c for c in df.columns if c.startswith("drv_") or c in ["Start", "qual_speed"]]
+
+
+def _numeric(df, cols):
+    return df[cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float, na_value=np.nan) if cols else np.empty((len(df), 0))
+
+
+def race_order(df):
+    # Races keyed by (year, season_race_num) in date order; a race only ever trains on lower ranks.
+    keys = df[["race_date", "year", "season_race_num"]].drop_duplicates(["year", "season_race_num"])
+    keys = keys.sort_values(["race_date", "year", "season_race_num"], kind="stable").reset_index(drop=True)
+    keys["race_idx"] = np.arange(len(keys))
+    return keys[["year", "season_race_num", "race_idx"]]
+
+
+def build_matrix(df, h2h=False, pairs_per_race=50, seed=42):
+    df = df.copy()
+    df["race_date"] = pd.to_datetime(df["race_date"], errors="coerce")
+    df = df[pd.to_numeric(df["target_finish"], errors="coerce").notna()].reset_index(drop=True)
+    keys = race_order(df)
+    df = df.merge(keys, on=["year", "season_race_num"], how="left")
+    feats = feature_cols(df)
+    shared = {
+        "race": df["race_idx"].to_numpy(),
+        "X": _numeric(df, feats),
+        "y": _numeric(df, ["target_finish", "target_top10", "target_dnf"]),
+    }
+    if h2h:
+        pairs = build_pairs(df.drop(columns="race_idx"), pairs_per_race, seed=seed)
+        pairs = pairs.merge(keys, on=["year", "season_race_num"], how="left")
+        shared["h2h_race"] = pairs["race_idx"].to_numpy()
+        shared["h2h_X"] = _numeric(pairs, [c for c in pairs.columns if c.startswith("diff_") or c in H2H_FLAGS])
+        shared["h2h_y"] = pairs["target_a_beats_b"].to_numpy(dtype=float)
+    return shared, keys
+
+
+def _init_worker(shared):
+    _SHARED.clear()
+    _SHARED.update(shared)
+
+
+def _auc(y, p):
+    return float(roc_auc_score(y, p)) if len(np.unique(y)) > 1 else np.nan
+
+
+def impute_split(Xtr, Xte):
+    keep = ~np.isnan(Xtr).all(axis=0)
+    imp = SimpleImputer(strategy="median")
+    return imp.fit_transform(Xtr[:, keep]), imp.transform(Xte[:, keep])
+
+
+def backtest_race(race_idx):
+    s = _SHARED
+    tr, te = s["race"] < race_idx, s["race"] == race_idx
+    Xtr, Xte = impute_split(s["X"][tr], s["X"][te])
+    ytr, yte = s["y"][tr], s["y"][te]
+    reg, clf_top10, clf_dnf, _ = choose_models(verbose=False)
+    reg.fit(Xtr, ytr[:, 0])
+    clf_top10 = fit_binary_model(clf_top10, Xtr, ytr[:, 1].astype(int), "target_top10")
+    clf_dnf = fit_binary_model(clf_dnf, Xtr, ytr[:, 2].astype(int), "target_dnf")
+    preds = {
+        "finish": (yte[:, 0], reg.predict(Xte)),
+        "top10": (yte[:, 1], prob_of_one(clf_top10, Xte)),
+        "dnf": (yte[:, 2], prob_of_one(clf_dnf, Xte)),
+    }
+    if "h2h_X" in s:
+        htr, hte = s["h2h_race"] < race_idx, s["h2h_race"] == race_idx
+        if hte.any() and len(np.unique(s["h2h_y"][htr])) > 1:
+            Htr, Hte = impute_split(s["h2h_X"][htr], s["h2h_X"][hte])
+            model, _ = choose_model(verbose=False)
+            model.fit(Htr, s["h2h_y"][htr])
+            preds["h2h"] = (s["h2h_y"][hte], model.predict_proba(Hte)[:, 1])
+    return race_idx, int(tr.sum()), preds
+
+
+def metrics(preds):
+    out = {}
+    if "finish" in preds:
+        out["mae_finish"] = float(mean_absolute_error(*preds["finish"]))
+    for name in ("top10", "dnf", "h2h"):
+        if name in preds:
+            y, p = preds[name]
+            out[f"auc_{name}"] = _auc(y, p)
+            out[f"brier_{name}"] = float(brier_score_loss(y, p))
+    return out
+
+
+def run_backtest(shared, race_ids, workers=1):
+    if workers <= 1 or len(race_ids) < 2:
+        _init_worker(shared)
+        return [backtest_race(k) for k in race_ids]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared,)) as pool:
+        return list(pool.map(backtest_race, race_ids))
+
+
+def summarize(results, keys):
+    rows, pooled = [], {}
+    for race_idx, n_train, preds in results:
+        key = keys.iloc[race_idx]
+        rows.append({"year": int(key["year"]), "season_race_num": int(key["season_race_num"]), "train_rows": n_train, "rows": len(preds["finish"][0]), **metrics(preds)})
+        for name, (y, p) in preds.items():
+            pooled.setdefault(name, ([], []))
+            pooled[name][0].append(y)
+            pooled[name][1].append(p)
+    per_race = pd.DataFrame(rows)
+    overall = metrics({name: (np.concatenate(ys), np.concatenate(ps)) for name, (ys, ps) in pooled.items()})
+    summary = {
+        "races": len(per_race),
+        "pooled": overall,
+        "mean_per_race": {c: float(per_race[c].mean()) for c in per_race.columns if c.startswith(("mae_", "auc_", "brier_"))},
+    }
+    return per_race, summary
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--infile", default="data/featurized/data_featurized.csv")
+    ap.add_argument("--start_year", type=int, required=True)
+    ap.add_argument("--end_year", type=int, required=True)
+    ap.add_argument("--min_train_races", type=int, default=5, help="skip races with fewer earlier races to train on")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--h2h", action="store_true", help="also backtest the H2H model on sampled pairs")
+    ap.add_argument("--pairs_per_race", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", help="default reports/backtest_{start_year}_{end_year}.csv")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
+    args = ap.parse_args()
+    setup_profile(args, "backtest")
+
+    cols = model_columns(args.infile)
+    if args.h2h:
+        cols += [c for c in table_columns(args.infile) if c in ["Team", "Make", "track_id"] and c not in cols]
+    df = read_table(args.infile, "featurized", columns=cols)
+    with stage("feature matrix", df) as st:
+        shared, keys = build_matrix(df, args.h2h, args.pairs_per_race, args.seed)
+        st["rows_out"] = len(shared["X"])
+    in_range = keys["year"].between(args.start_year, args.end_year) & (keys["race_idx"] >= max(args.min_train_races, 1))
+    race_ids = keys.loc[in_range, "race_idx"].astype(int).tolist()
+    if not race_ids:
+        print(f"[WARN] no races in {args.start_year}-{args.end_year} with at least {args.min_train_races} earlier races")
+        return
+    print(f"[INFO] backtesting {len(race_ids)} races with {args.workers} workers")
+    with stage("fit", race_ids) as st:
+        results = run_backtest(shared, race_ids, args.workers)
+        st["rows_out"] = sum(len(preds["finish"][0]) for _, _, preds in results)
+    per_race, summary = summarize(results, keys)
+
+    out = Path(args.out or f"reports/backtest_{args.start_year}_{args.end_year}.csv")
+    write_table(per_race, out, csv=args.csv)
+    summary_path = out.with_name(out.stem + "_summary.json")
+    summary_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    print(per_race.to_string(index=False))
+    print("\nPooled: " + " ".join(f"{k}={v:.3f}" for k, v in summary["pooled"].items()))
+    print(f"[OK] wrote {out} and {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
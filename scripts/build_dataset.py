@@ -1,65 +1,90 @@
 import argparse
+import hashlib
+import json
+import sys
 from pathlib import Path
+
 import pandas as pd
-from pandas.errors import EmptyDataError
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-def _read_csv_if_present(path: str) -> pd.DataFrame:
-    p = Path(path)
-    if not p.exists():
-        return pd.DataFrame()
-    try:
-        return pd.read_csv(p)
-    except EmptyDataError:
-        print(f"[WARN] {path} is empty; skipping")
-        return pd.DataFrame()
+from scripts.results_store import RESULTS_ROOT, ResultsStore, read_results  # noqa: E402
+from scripts.storage import add_csv_arg, concat_tables, exists, group_hashes, read_table, source_path, write_table  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
 
+# Flat source tables; results come from the partitioned store.
+SOURCES = {
+    "entries": ("data/raw/entries.csv", "entries"),
+    "qualifying": ("data/raw/qualifying.csv", "qualifying"),
+    "race_meta": ("data/enrich/race_meta.csv", "race_meta"),
+    "weather": ("data/enrich/weather.csv", "weather"),
+    "track_meta": ("data/enrich/track_meta.csv", "track_meta"),
+}
+SORT_COLS = ["race_date", "year", "season_race_num", "driver_id"]
 
 
+def _read_if_present(path: str, table: str) -> pd.DataFrame:
+    return read_table(path, table) if exists(path) else pd.DataFrame()
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--out", default="data/raw/data.csv")
-    args = ap.parse_args()
 
-    out = Path(args.out)
-    out.parent.mkdir(parents=True, exist_ok=True)
+def load_sources():
+    src = {"results": read_results()}
+    src.update({name: _read_if_present(path, table) for name, (path, table) in SOURCES.items()})
+    return src
+
+
+def source_stamps():
+    """Fingerprint every source without loading it: the store manifest's partition hashes plus file mtimes/sizes."""
+    stamps = {"results": {k: p["sha256"] for k, p in ResultsStore(RESULTS_ROOT).manifest["partitions"].items()}}
+    for name, (path, _) in SOURCES.items():
+        src = source_path(path)
+        stamps[name] = None if src is None else [src.name, src.stat().st_mtime_ns, src.stat().st_size]
+    return stamps
 
-    results = _read_csv_if_present("data/raw/results.csv")
-    entries = _read_csv_if_present("data/raw/entries.csv")
 
+def track_join_keys(base_cols, track_cols):
+    """(left, right) columns build() joins track_meta on, or None when the tables cannot be joined."""
+    if "track_id" in base_cols and "track_id" in track_cols:
+        # normalize_ids resolved track name variants to a stable id; join on that when present.
+        return "track_id", "track_id"
+    if "track" in base_cols and "track_canonical" in track_cols:
+        return "track", "track_canonical"
+    return None
+
+
+def build(src):
+    results, entries = src["results"], src["entries"]
     base = results.copy() if not results.empty else entries.copy()
     if base.empty:
-        pd.DataFrame().to_csv(out, index=False)
-        print("[WARN] empty dataset")
-        return
+        return base
 
     if not entries.empty:
-        combo = pd.concat([base, entries], ignore_index=True, sort=False)
+        combo = concat_tables([base, entries], ignore_index=True, sort=False)
         if "driver_id" not in combo.columns and "Driver" in combo.columns:
             combo["driver_id"] = combo["Driver"].astype(str).str.lower().str.replace(" ", "_", regex=False)
-        dedupe_cols = [c for c in ["sked_id", "driver_id"] if c in combo.columns]
-        if dedupe_cols:
-            base = combo.drop_duplicates(dedupe_cols, keep="last")
-        else:
-            print("[WARN] missing dedupe keys after merge; keeping combined rows")
-            base = combo
-
-    if Path("data/raw/qualifying.csv").exists() and "driver_id" in base.columns:
-        q = _read_csv_if_present("data/raw/qualifying.csv")
+        with stage("dedupe", combo) as st:
+            dedupe_cols = [c for c in ["sked_id", "driver_id"] if c in combo.columns]
+            if dedupe_cols:
+                base = combo.drop_duplicates(dedupe_cols, keep="last")
+            else:
+                print("[WARN] missing dedupe keys after merge; keeping combined rows")
+                base = combo
+            st["rows_out"] = base
+
+    if not src["qualifying"].empty and "driver_id" in base.columns:
+        q = src["qualifying"]
         q = q[[c for c in ["sked_id", "driver_id", "Start", "qual_speed", "pole_speed", "qual_round"] if c in q.columns]]
         base = base.drop(columns=["Start", "qual_speed", "pole_speed", "qual_round"], errors="ignore").merge(q, on=["sked_id", "driver_id"], how="left")
 
-    for p in ["data/enrich/race_meta.csv", "data/enrich/weather.csv"]:
-        if Path(p).exists() and "sked_id" in base.columns:
-            e = _read_csv_if_present(p)
+    for name in ["race_meta", "weather"]:
+        if not src[name].empty and "sked_id" in base.columns:
+            e = src[name]
             if "sked_id" in e.columns:
                 base = base.merge(e, on="sked_id", how="left", suffixes=("", "_enrich"))
 
-    if Path("data/enrich/track_meta.csv").exists() and "track" in base.columns:
-        t = _read_csv_if_present("data/enrich/track_meta.csv")
-        if "track_canonical" in t.columns:
-            base = base.merge(t, left_on="track", right_on="track_canonical", how="left", suffixes=("", "_track"))
+    keys = track_join_keys(base.columns, src["track_meta"].columns)
+    if not src["track_meta"].empty and keys:
+        base = base.merge(src["track_meta"], left_on=keys[0], right_on=keys[1], how="left", suffixes=("", "_track"))
 
     if "driver_id" not in base.columns and "Driver" in base.columns:
         base["driver_id"] = base["Driver"].astype(str).str.lower().str.replace(" ", "_", regex=False)
@@ -81,14 +106,117 @@ def main():
 
     sort_cols = [c for c in ["race_date", "year", "season_race_num", "driver_id"] if c in base.columns]
     if sort_cols:
-        base = base.sort_values(sort_cols)
+        base = base.sort_values(sort_cols, kind="stable")
     else:
         print("[WARN] sort columns missing; writing unsorted dataset")
-    base.to_csv(out, index=False)
-    try:
-        base.to_parquet("data/raw/data.parquet", index=False)
-    except Exception:
-        print("[WARN] pyarrow missing; parquet skipped")
+    return base
+
+
+def partition_hashes(src):
+    parts = {}
+    for name in ["results", "entries", "qualifying", "race_meta", "weather"]:
+        for sked_id, h in group_hashes(src[name], "sked_id").items():
+            parts.setdefault(int(sked_id), []).append(f"{name}:{int(h)}")
+    # Attribute track_meta rows to races through the same key build() joins on.
+    frames, right = [], None
+    for n in ["results", "entries"]:
+        keys = track_join_keys(src[n].columns, src["track_meta"].columns)
+        if keys and "sked_id" in src[n].columns:
+            frames.append(src[n][["sked_id", keys[0]]].set_axis(["sked_id", "track_key"], axis=1))
+            right = keys[1]
+    track_h = group_hashes(src["track_meta"], right) if right else pd.Series(dtype="uint64")
+    if frames and not track_h.empty:
+        tracks = pd.concat(frames).drop_duplicates()
+        for sked_id, track in tracks.itertuples(index=False):
+            if track in track_h.index:
+                parts.setdefault(int(sked_id), []).append(f"track_meta:{int(track_h[track])}")
+    return {str(k): hashlib.sha1("|".join(sorted(v)).encode("utf-8")).hexdigest() for k, v in parts.items()}
+
+
+def code_hash():
+    return hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
+
+
+def global_hash(src):
+    h = hashlib.sha1(code_hash().encode("utf-8"))
+    for name in sorted(src):
+        h.update(f"{name}:{','.join(map(str, src[name].columns))}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def build_state_path(out):
+    out = Path(out)
+    return out.with_name(f".{out.stem}_build_state.json")
+
+
+def _subset(src, sked_ids):
+    out = {}
+    for name, df in src.items():
+        out[name] = df[df["sked_id"].isin(sked_ids)] if "sked_id" in df.columns else df
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", default="data/raw/data.csv")
+    ap.add_argument("--incremental", action="store_true", help="rebuild only sked_ids whose source partitions changed")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
+    args = ap.parse_args()
+    setup_profile(args, "build_dataset")
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    state_path = build_state_path(out)
+
+    state = json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else {}
+    stamps = source_stamps()
+    if args.incremental and exists(out) and state.get("code") == code_hash() and state.get("stamps") == stamps:
+        print(f"[OK] {out} up to date; no source changed")
+        return
+
+    with stage("read") as st:
+        src = load_sources()
+        st["rows_out"] = sum(len(df) for df in src.values())
+    hashes = partition_hashes(src)
+    ghash = global_hash(src)
+
+    def save_state():
+        state_path.write_text(json.dumps({"global": ghash, "code": code_hash(), "stamps": stamps, "partitions": hashes}, indent=1, sort_keys=True), encoding="utf-8")
+
+    if args.incremental and state.get("global") == ghash and exists(out):
+        old = state.get("partitions", {})
+        changed = sorted(int(k) for k, v in hashes.items() if old.get(k) != v)
+        removed = sorted(int(k) for k in old if k not in hashes)
+        if not changed and not removed:
+            # Files were rewritten with the same content; record the new stamps so the next run skips loading.
+            save_state()
+            print(f"[OK] {out} up to date; no source partitions changed")
+            return
+        print(f"[OK] incremental rebuild: changed={len(changed)} removed={len(removed)} unchanged={len(hashes) - len(changed)}")
+        with stage("merge", len(changed)) as st:
+            fresh = build(_subset(src, changed)) if changed else pd.DataFrame()
+            st["rows_out"] = fresh
+        existing = read_table(out, "raw")
+        keep = existing[~existing["sked_id"].isin(changed + removed)]
+        base = concat_tables([keep, fresh], ignore_index=True, sort=False)
+        sort_cols = [c for c in SORT_COLS if c in base.columns]
+        if sort_cols:
+            base = base.sort_values(sort_cols, kind="stable")
+    else:
+        if args.incremental:
+            print("[WARN] no usable build state (first run, schema or code change); doing a full rebuild")
+        with stage("merge", sum(len(df) for df in src.values())) as st:
+            base = build(src)
+            st["rows_out"] = base
+        if base.empty:
+            write_table(pd.DataFrame(), out, csv=args.csv)
+            print("[WARN] empty dataset")
+            return
+
+    with stage("write", base):
+        write_table(base, out, "raw", csv=args.csv)
+    save_state()
     print(f"[OK] wrote {out}")
 
 
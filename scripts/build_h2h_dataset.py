@@ -1,57 +1,127 @@
 import argparse
+import sys
 from pathlib import Path
+
 import numpy as np
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.storage import add_csv_arg, read_table, table_columns, write_table  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
+BASE_COLS = ["sked_id", "year", "season_race_num", "track_type", "track_id", "race_date", "driver_id", "Driver", "Team", "Make", "target_finish", "target_dnf"]
+
+
+def _col(df, name, default):
+    # The backing array keeps categoricals and small ints when pairs are gathered from it.
+    return df[name].array if name in df.columns else np.full(len(df), default, dtype=object)
+
+
+def _same(values, a_idx, b_idx):
+    values = np.where(pd.isna(values), np.nan, values)
+    return (values[a_idx] == values[b_idx]).astype(int)
+
+
+def _numeric(df, cols):
+    if not cols:
+        return np.empty((len(df), 0))
+    return df[cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def pair_features(df, a_idx, b_idx, num_cols):
+    a_idx = np.asarray(a_idx, dtype=np.int64)
+    b_idx = np.asarray(b_idx, dtype=np.int64)
+    fin = pd.to_numeric(df["target_finish"], errors="coerce").to_numpy(dtype=float, na_value=np.nan) if "target_finish" in df.columns else np.full(len(df), np.nan)
+    fa, fb = fin[a_idx], fin[b_idx]
+    both = ~np.isnan(fa) & ~np.isnan(fb)
+    team, make = _col(df, "Team", ""), _col(df, "Make", "")
+    out = {
+        "sked_id": _col(df, "sked_id", np.nan)[a_idx],
+        "year": _col(df, "year", np.nan)[a_idx],
+        "season_race_num": _col(df, "season_race_num", np.nan)[a_idx],
+        "track_type": _col(df, "track_type", "unknown")[a_idx],
+        "track_id": _col(df, "track_id", "")[a_idx],
+        "race_date": _col(df, "race_date", "")[a_idx],
+        "driver_a_id": _col(df, "driver_id", "")[a_idx],
+        "driver_b_id": _col(df, "driver_id", "")[b_idx],
+        "DriverA": _col(df, "Driver", "")[a_idx],
+        "DriverB": _col(df, "Driver", "")[b_idx],
+        "target_a_beats_b": (both & (fa < fb)).astype(int),
+        "target_finish_diff": np.where(both, fb - fa, np.nan),
+        "same_team_flag": _same(team, a_idx, b_idx),
+        "same_make_flag": _same(make, a_idx, b_idx),
+    }
+    X = _numeric(df, num_cols)
+    diffs = X[a_idx] - X[b_idx]
+    for k, c in enumerate(num_cols):
+        out[f"diff_{c}"] = diffs[:, k]
+    return pd.DataFrame(out)
+
+
+_TRIU = {}
+
+
+def _triu(n):
+    if n not in _TRIU:
+        _TRIU[n] = np.triu_indices(n, 1)
+    return _TRIU[n]
+
+
+def sample_pairs(race_sizes, pairs_per_race, rng, all_pairs=False):
+    sizes = np.asarray(race_sizes, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    totals = sizes * (sizes - 1) // 2
+    if totals.sum() == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    a = np.concatenate([_triu(n)[0] + off for n, off in zip(sizes, offsets)])
+    b = np.concatenate([_triu(n)[1] + off for n, off in zip(sizes, offsets)])
+    if all_pairs:
+        return a, b
+    race = np.repeat(np.arange(len(sizes)), totals)
+    # One bulk draw: give every candidate pair a random key and keep the m smallest keys per race.
+    order = np.lexsort((rng.random(len(a)), race))
+    first = np.concatenate([[0], np.cumsum(totals)[:-1]])
+    rank = np.arange(len(order)) - first[race[order]]
+    keep = np.sort(order[rank < np.minimum(pairs_per_race, totals)[race[order]]])
+    return a[keep], b[keep]
+
+
+def build_pairs(df, pairs_per_race=50, include_dnfs=False, seed=42, all_pairs=False):
+    if df.empty:
+        return pd.DataFrame()
+    if not include_dnfs and "target_dnf" in df.columns:
+        df = df[pd.to_numeric(df["target_dnf"], errors="coerce").ne(1).fillna(True).astype(bool)]
+    df = df.sort_values("sked_id", kind="stable").reset_index(drop=True)
+    num_cols = [c for c in df.columns if c.startswith("drv_")]
+    sizes = df.groupby("sked_id", sort=False).size().to_numpy()
+    a_idx, b_idx = sample_pairs(sizes, pairs_per_race, np.random.default_rng(seed), all_pairs)
+    return pair_features(df, a_idx, b_idx, num_cols)
+
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--infile", default="data/featurized/data_featurized.csv")
     ap.add_argument("--out", default="data/featurized/h2h.csv")
     ap.add_argument("--pairs_per_race", type=int, default=50)
+    ap.add_argument("--all_pairs", action="store_true", help="enumerate every driver pair of each race instead of sampling")
+    ap.add_argument("--seed", type=int, default=42)
     ap.add_argument("--include_dnfs", action="store_true")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
     args = ap.parse_args()
+    setup_profile(args, "build_h2h_dataset")
 
     Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    df = pd.read_csv(args.infile)
-    num_cols = [c for c in df.columns if c.startswith("drv_")]
-    rows = []
-    rng = np.random.default_rng(42)
-    for sked_id, grp in df.groupby("sked_id"):
-        g = grp.copy()
-        if not args.include_dnfs and "target_dnf" in g.columns:
-            g = g[g["target_dnf"] != 1]
-        if len(g) < 2:
-            continue
-        pairs = set()
-        max_pairs = min(args.pairs_per_race, len(g) * (len(g) - 1) // 2)
-        while len(pairs) < max_pairs:
-            i, j = sorted(rng.choice(len(g), size=2, replace=False))
-            pairs.add((i, j))
-        g = g.reset_index(drop=True)
-        for i, j in pairs:
-            a, b = g.iloc[i], g.iloc[j]
-            rec = {
-                "sked_id": sked_id,
-                "year": a["year"],
-                "season_race_num": a["season_race_num"],
-                "track_type": a.get("track_type", "unknown"),
-                "track_id": a.get("track_id", ""),
-                "race_date": a.get("race_date", ""),
-                "driver_a_id": a.get("driver_id", ""),
-                "driver_b_id": b.get("driver_id", ""),
-                "DriverA": a.get("Driver", ""),
-                "DriverB": b.get("Driver", ""),
-                "target_a_beats_b": int(pd.notna(a.get("target_finish")) and pd.notna(b.get("target_finish")) and a.get("target_finish") < b.get("target_finish")),
-                "target_finish_diff": (b.get("target_finish") - a.get("target_finish")) if pd.notna(a.get("target_finish")) and pd.notna(b.get("target_finish")) else np.nan,
-                "same_team_flag": int(a.get("Team", "") == b.get("Team", "")),
-                "same_make_flag": int(a.get("Make", "") == b.get("Make", "")),
-            }
-            for c in num_cols:
-                rec[f"diff_{c}"] = pd.to_numeric(a.get(c), errors="coerce") - pd.to_numeric(b.get(c), errors="coerce")
-            rows.append(rec)
-    out = pd.DataFrame(rows)
-    out.to_csv(args.out, index=False)
+    cols = BASE_COLS + [c for c in table_columns(args.infile) if c.startswith("drv_")]
+    with stage("read") as st:
+        df = read_table(args.infile, "featurized", columns=cols)
+        st["rows_out"] = df
+    with stage("pairs", df) as st:
+        out = build_pairs(df, args.pairs_per_race, args.include_dnfs, args.seed, args.all_pairs)
+        st["rows_out"] = out
+    with stage("write", out):
+        write_table(out, args.out, "h2h", csv=args.csv)
     print(f"[OK] wrote {args.out} rows={len(out)}")
 
 
@@ -0,0 +1,6 @@
+# Argument helpers shared by every script. Kept free of pandas so building a parser
+# (e.g. `nascar.py pipeline --help`) does not pay for the data stack.
+
+
+def add_csv_arg(ap):
+    ap.add_argument("--csv", action="store_true", help="also export a CSV copy next to the Parquet output")
@@ -1,19 +1,30 @@
 import argparse
+import sys
 from pathlib import Path
+
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.results_store import read_results  # noqa: E402
+from scripts.storage import add_csv_arg, exists, read_table, write_table  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", default="data/enrich/race_meta.csv")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
     args = ap.parse_args()
+    setup_profile(args, "enrich_race_structure")
 
     out = Path(args.out)
     out.parent.mkdir(parents=True, exist_ok=True)
-    raw = pd.read_csv("data/raw/data.csv") if Path("data/raw/data.csv").exists() else pd.DataFrame()
+    raw = read_results(columns=["sked_id", "year", "season_race_num", "Driver"])
     if raw.empty:
         print("[WARN] no raw data")
-        pd.DataFrame(columns=["sked_id"]).to_csv(out, index=False)
+        write_table(pd.DataFrame(columns=["sked_id"]), out, "race_meta", csv=args.csv)
         return
     g = raw.groupby("sked_id", as_index=False).agg(year=("year", "first"), season_race_num=("season_race_num", "first"))
     g["rr_race_url"] = ""
@@ -26,11 +37,14 @@ def main():
     g["cautions"] = pd.NA
     g["caution_laps"] = pd.NA
     g["scheduled_start_time_local"] = "14:00"
-    if out.exists():
-        df = pd.concat([pd.read_csv(out), g], ignore_index=True).drop_duplicates(["sked_id"], keep="last")
-    else:
-        df = g
-    df.to_csv(out, index=False)
+    with stage("dedupe", g) as st:
+        if exists(out):
+            df = pd.concat([read_table(out, "race_meta"), g], ignore_index=True).drop_duplicates(["sked_id"], keep="last")
+        else:
+            df = g
+        st["rows_out"] = df
+    with stage("write", df):
+        write_table(df, out, "race_meta", csv=args.csv)
     print(f"[OK] wrote {out}")
 
 
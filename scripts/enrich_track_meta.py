@@ -1,7 +1,15 @@
 import argparse
+import sys
 from pathlib import Path
+
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.results_store import read_results  # noqa: E402
+from scripts.storage import add_csv_arg, exists, read_table, write_table  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
 
 def classify(length):
     if pd.isna(length):
@@ -18,13 +26,16 @@ def classify(length):
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", default="data/enrich/track_meta.csv")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
     args = ap.parse_args()
+    setup_profile(args, "enrich_track_meta")
     out = Path(args.out)
     out.parent.mkdir(parents=True, exist_ok=True)
 
-    tracks = pd.read_csv("data/dim/track_dim.csv") if Path("data/dim/track_dim.csv").exists() else pd.DataFrame(columns=["track_id", "track_canonical"])
-    if tracks.empty and Path("data/raw/data.csv").exists():
-        raw = pd.read_csv("data/raw/data.csv")
+    tracks = read_table("data/dim/track_dim.csv", "dim") if exists("data/dim/track_dim.csv") else pd.DataFrame(columns=["track_id", "track_canonical"])
+    raw = read_results(columns=["track"]) if tracks.empty else pd.DataFrame()
+    if not raw.empty:
         tracks = raw[["track"]].drop_duplicates().reset_index(drop=True)
         tracks["track_id"] = [f"track_{i+1:04d}" for i in range(len(tracks))]
         tracks = tracks.rename(columns={"track": "track_canonical"})
@@ -41,12 +52,15 @@ def main():
     tracks["track_timezone"] = "America/New_York"
     tracks["track_type"] = tracks["track_length_mi"].map(classify)
 
-    if out.exists():
-        old = pd.read_csv(out)
-        df = pd.concat([old, tracks], ignore_index=True, sort=False).drop_duplicates(["track_id"], keep="last")
-    else:
-        df = tracks
-    df.to_csv(out, index=False)
+    with stage("dedupe", tracks) as st:
+        if exists(out):
+            old = read_table(out, "track_meta")
+            df = pd.concat([old, tracks], ignore_index=True, sort=False).drop_duplicates(["track_id"], keep="last")
+        else:
+            df = tracks
+        st["rows_out"] = df
+    with stage("write", df):
+        write_table(df, out, "track_meta", csv=args.csv)
     print(f"[OK] wrote {out}")
 
 
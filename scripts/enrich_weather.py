@@ -1,33 +1,83 @@
 import argparse
+import sys
 from pathlib import Path
+
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.results_store import read_results  # noqa: E402
+from scripts.storage import add_csv_arg, concat_tables, exists, read_table, write_table  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+from scripts.weather import GRID, WeatherCache, lookup, make_provider  # noqa: E402
+
+# Entries carry the upcoming race, which has no results yet.
+ENTRIES = "data/raw/entries.csv"
+RACE_COLS = ["sked_id", "race_date", "track", "track_id"]
+TRACK_COLS = ["track_id", "track_canonical", "track_lat", "track_lon", "track_timezone"]
+
+
+def load_races():
+    """One row per sked_id with its date, scheduled start and the track's lat/lon/timezone."""
+    frames = [read_results(columns=RACE_COLS)]
+    if exists(ENTRIES):
+        frames.append(read_table(ENTRIES, "entries", columns=RACE_COLS))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=RACE_COLS)
+    races = concat_tables(frames, ignore_index=True, sort=False).drop_duplicates("sked_id").reset_index(drop=True)
+    if exists("data/enrich/race_meta.csv"):
+        meta = read_table("data/enrich/race_meta.csv", "race_meta", columns=["sked_id", "scheduled_start_time_local"])
+        races = races.merge(meta.drop_duplicates("sked_id", keep="last"), on="sked_id", how="left")
+    if exists("data/enrich/track_meta.csv"):
+        t = read_table("data/enrich/track_meta.csv", "track_meta", columns=TRACK_COLS)
+        if "track_id" in races.columns and "track_id" in t.columns:
+            races = races.merge(t.drop(columns="track_canonical", errors="ignore").drop_duplicates("track_id", keep="last"), on="track_id", how="left")
+        elif "track" in races.columns and "track_canonical" in t.columns:
+            t = t.drop(columns="track_id", errors="ignore").drop_duplicates("track_canonical", keep="last")
+            races = races.merge(t, left_on="track", right_on="track_canonical", how="left").drop(columns="track_canonical")
+    return races.reindex(columns=list(dict.fromkeys([*races.columns, "track_lat", "track_lon", "track_timezone"])))
+
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", default="data/enrich/weather.csv")
+    ap.add_argument("--provider", default="archive:data/enrich/weather_archive.csv", help="archive:<path to hourly observations> or a bulk lookup URL")
+    ap.add_argument("--cache", default="cache/weather/cells.csv")
+    ap.add_argument("--grid", type=float, default=GRID, help="degrees lat/lon are rounded to for cache keys")
+    ap.add_argument("--batch_size", type=int, default=200, help="points per request for URL providers")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
     args = ap.parse_args()
+    setup_profile(args, "enrich_weather")
 
     out = Path(args.out)
     out.parent.mkdir(parents=True, exist_ok=True)
-    race = pd.read_csv("data/enrich/race_meta.csv") if Path("data/enrich/race_meta.csv").exists() else pd.DataFrame(columns=["sked_id"])
-    if race.empty:
-        pd.DataFrame(columns=["sked_id"]).to_csv(out, index=False)
-        print("[WARN] no race meta")
+    with stage("read") as st:
+        races = load_races()
+        st["rows_out"] = races
+    if races.empty:
+        write_table(pd.DataFrame(columns=["sked_id"]), out, "weather", csv=args.csv)
+        print("[WARN] no races")
         return
-    wx = race[["sked_id"]].copy()
-    wx["wx_temp_f"] = 72
-    wx["wx_wind_mph"] = 8
-    wx["wx_gust_mph"] = 14
-    wx["wx_precip_in"] = 0.0
-    wx["wx_precip_flag"] = 0
-    wx["wx_time_used"] = "14:00"
-    wx["wx_source"] = "fallback"
-    if out.exists():
-        df = pd.concat([pd.read_csv(out), wx], ignore_index=True).drop_duplicates(["sked_id"], keep="last")
-    else:
-        df = wx
-    df.to_csv(out, index=False)
+    kwargs = {"batch_size": args.batch_size} if args.provider.startswith(("http://", "https://")) else {}
+    provider = make_provider(args.provider, grid=args.grid, **kwargs)
+    cache = WeatherCache(args.cache)
+    with stage("lookup", races) as st:
+        wx, requested = lookup(races, provider, cache)
+        st["rows_out"] = wx
+    cache.save(csv=args.csv)
+    found = int((wx["wx_source"] != "missing").sum())
+    print(f"[OK] weather for {found}/{len(wx)} races; {requested} cells requested from {provider.source}, rest from cache")
+
+    with stage("dedupe", wx) as st:
+        if exists(out):
+            df = pd.concat([read_table(out, "weather"), wx], ignore_index=True).drop_duplicates(["sked_id"], keep="last")
+        else:
+            df = wx
+        st["rows_out"] = df
+    with stage("write", df):
+        write_table(df, out, "weather", csv=args.csv)
     print(f"[OK] wrote {out}")
 
 
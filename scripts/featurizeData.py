@@ -1,37 +1,56 @@
 import argparse
+import hashlib
+import json
+import sys
 from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.rolling import DEFAULT_STATS, DEFAULT_WINDOWS, FEATURE_FAMILIES, conditional_specs, grouped_rolling, make_specs  # noqa: E402
+from scripts.storage import FLOAT32, add_csv_arg, concat_tables, exists, group_hashes, read_table, write_table  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
+STATE_COLS = ["sked_id", "year", "season_race_num", "race_date", "driver_id", "track", "track_id", "track_type", "Finish", "Status", "Start", "qual_speed"]
+ORDER_COLS = ["race_date", "season_race_num"]
+
+
+def track_key(df):
+    # normalize_ids' stable id when present, so a renamed venue keeps its history.
+    return "track_id" if "track_id" in df.columns and df["track_id"].notna().any() else "track"
+
+
+def feature_groups(df, mode="prequal", windows=DEFAULT_WINDOWS, stats=DEFAULT_STATS):
+    """(key columns, specs) per feature family, driver_id first: the others reuse its sort order."""
+    specs = make_specs(windows, stats)
+    if mode == "postqual":
+        specs += [("drv_start_mean_10", "Start", 10, "mean", 1), ("drv_qual_speed_mean_10", "qual_speed", 10, "mean", 1)]
+    groups = [(["driver_id"], specs)]
+    for prefix, col in (("tt", "track_type"), ("trk", track_key(df))):
+        if col in df.columns:
+            groups.append((["driver_id", col], conditional_specs(prefix)))
+    return groups
+
 
-def build_features(df, mode="prequal"):
+def build_features(df, mode="prequal", windows=DEFAULT_WINDOWS, stats=DEFAULT_STATS):
     if df.empty:
         return df
     df = df.copy()
     df["race_date"] = pd.to_datetime(df["race_date"], errors="coerce")
     df = df.sort_values(["driver_id", "race_date", "season_race_num"])
 
-    df["target_finish"] = pd.to_numeric(df.get("Finish"), errors="coerce")
+    # Finish is a nullable Int16 on load; float keeps missing finishes out of the top-10/win targets instead of <NA>.
+    df["target_finish"] = pd.to_numeric(df.get("Finish"), errors="coerce").astype("float64")
     df["target_top10"] = (df["target_finish"] <= 10).astype("Int64")
     df["target_top5"] = (df["target_finish"] <= 5).astype("Int64")
     df["target_win"] = (df["target_finish"] == 1).astype("Int64")
     df["target_dnf"] = df.get("Status", "").astype(str).str.contains("DNF|Accident|Engine", case=False, na=False).astype("Int64")
 
-    grp = df.groupby("driver_id", group_keys=False)
-    shifted_finish = grp["target_finish"].shift(1)
-    shifted_top10 = grp["target_top10"].shift(1)
-    shifted_dnf = grp["target_dnf"].shift(1)
-
-    for w in (5, 10, 20):
-        df[f"drv_finish_mean_{w}"] = shifted_finish.groupby(df["driver_id"]).rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
-        df[f"drv_finish_std_{w}"] = shifted_finish.groupby(df["driver_id"]).rolling(w, min_periods=2).std().reset_index(level=0, drop=True)
-        df[f"drv_top10_rate_{w}"] = shifted_top10.groupby(df["driver_id"]).rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
-        df[f"drv_dnf_rate_{w}"] = shifted_dnf.groupby(df["driver_id"]).rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
+    df = pd.concat([df, grouped_rolling(df, feature_groups(df, mode, windows, stats)).astype(FLOAT32)], axis=1)
 
     if mode == "postqual":
-        start_shift = grp["Start"].shift(1) if "Start" in df.columns else pd.Series(index=df.index, dtype=float)
-        q_shift = grp["qual_speed"].shift(1) if "qual_speed" in df.columns else pd.Series(index=df.index, dtype=float)
-        df["drv_start_mean_10"] = start_shift.groupby(df["driver_id"]).rolling(10, min_periods=1).mean().reset_index(level=0, drop=True)
-        df["drv_qual_speed_mean_10"] = q_shift.groupby(df["driver_id"]).rolling(10, min_periods=1).mean().reset_index(level=0, drop=True)
         if "Start" in df.columns:
             df["start_bucket"] = pd.cut(pd.to_numeric(df["Start"], errors="coerce"), bins=[0, 5, 12, 24, 40], labels=["front", "upper_mid", "mid", "back"])
 
@@ -39,17 +58,145 @@ def build_features(df, mode="prequal"):
     return df
 
 
+def state_paths(out):
+    out = Path(out)
+    return out.with_name(f"{out.stem}_state.csv"), out.with_name(f"{out.stem}_state.json")
+
+
+def _code_hash(mode, windows, stats):
+    config = f"{mode}|{','.join(map(str, windows))}|{','.join(stats)}"
+    return hashlib.sha1(Path(__file__).read_bytes() + config.encode("utf-8")).hexdigest()
+
+
+def history_spans(df, mode, windows, stats):
+    """Rows per key the rolling state keeps for each feature family: its longest window."""
+    return [(cols, max(w for _, _, w, _, _ in specs)) for cols, specs in feature_groups(df, mode, windows, stats)]
+
+
+def _race_order(df):
+    races = df[["sked_id"] + ORDER_COLS].drop_duplicates("sked_id").copy()
+    races["race_date"] = pd.to_datetime(races["race_date"], errors="coerce")
+    return races.sort_values(ORDER_COLS, kind="stable")
+
+
+def _final_prefix(df):
+    # Races with results can be folded into the rolling state only if no provisional
+    # (entries-only) race sorts before them; otherwise their history would skip that race.
+    final = set(df.loc[pd.to_numeric(df["Finish"], errors="coerce").notna(), "sked_id"]) if "Finish" in df.columns else set()
+    prefix = []
+    for sked_id in _race_order(df)["sked_id"]:
+        if sked_id not in final:
+            break
+        prefix.append(int(sked_id))
+    return prefix
+
+
+def _tail(df, spans):
+    if df.empty:
+        return df
+    df = df.assign(_d=pd.to_datetime(df["race_date"], errors="coerce")).sort_values(["driver_id", "_d", "season_race_num"], kind="stable")
+    keep = np.zeros(len(df), dtype=bool)
+    for cols, n in spans:
+        keep |= df.groupby(cols, sort=False, observed=True, dropna=False).cumcount(ascending=False).to_numpy() < n
+    return df[keep].drop(columns=["_d"])
+
+
+def _sked_hashes(df):
+    cols = [c for c in STATE_COLS if c in df.columns]
+    return {str(int(k)): str(int(v)) for k, v in group_hashes(df[cols], "sked_id").items()}
+
+
+def save_state(history, fresh, known, out, mode, windows=DEFAULT_WINDOWS, stats=DEFAULT_STATS):
+    state_rows, meta_path = state_paths(out)
+    cols = [c for c in STATE_COLS if c in fresh.columns]
+    rows = concat_tables([history, fresh[cols]], ignore_index=True, sort=False)
+    final = _final_prefix(rows)
+    fresh_done = fresh[fresh["sked_id"].isin(final)]
+    kept = concat_tables([history, fresh_done[cols]], ignore_index=True, sort=False)
+    write_table(_tail(kept, history_spans(kept, mode, windows, stats)), state_rows, "raw")
+    last = _race_order(rows[rows["sked_id"].isin(final)]).tail(1)
+    meta = {
+        "mode": mode,
+        "code": _code_hash(mode, windows, stats),
+        "final_sked_hashes": {**(known or {}), **_sked_hashes(fresh_done)},
+        "last_race": [str(last["race_date"].iloc[0]), int(last["season_race_num"].iloc[0])] if not last.empty else None,
+    }
+    meta_path.write_text(json.dumps(meta, indent=1), encoding="utf-8")
+
+
+def build_features_incremental(raw, out, mode="prequal", windows=DEFAULT_WINDOWS, stats=DEFAULT_STATS):
+    state_rows, meta_path = state_paths(out)
+    if not (meta_path.exists() and exists(state_rows) and exists(out)):
+        return None, "no saved state"
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    if meta.get("code") != _code_hash(mode, windows, stats):
+        return None, "mode, windows/stats or featurizer code changed"
+    known = meta["final_sked_hashes"]
+    done = raw[raw["sked_id"].astype(str).isin(known)]
+    if _sked_hashes(done) != known:
+        return None, "history changed or races removed"
+    new = raw[~raw["sked_id"].astype(str).isin(known)]
+    if new.empty:
+        return None, "no new races"
+    order = _race_order(new)
+    if order["race_date"].isna().any():
+        return None, "new races without a parseable race_date"
+    if meta["last_race"] is not None:
+        last = (pd.Timestamp(meta["last_race"][0]), meta["last_race"][1])
+        first = tuple(order[ORDER_COLS].iloc[0])
+        if first <= last:
+            return None, "new races are not after the saved history"
+
+    history = read_table(state_rows, "raw")
+    feats = build_features(concat_tables([history, new], ignore_index=True, sort=False), mode, windows, stats)
+    feats = feats[feats["sked_id"].isin(new["sked_id"])]
+    existing = read_table(out, "featurized")
+    existing = existing[existing["sked_id"].astype(str).isin(known)]
+    merged = concat_tables([existing, feats], ignore_index=True, sort=False)
+    merged = merged.sort_values(["race_date", "year", "season_race_num", "driver_id"], kind="stable")
+    return (merged, (history, new, known)), f"featurized {new['sked_id'].nunique()} new races from saved state"
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--mode", choices=["prequal", "postqual"], default="prequal")
     ap.add_argument("--infile", default="data/raw/data.csv")
     ap.add_argument("--out", default="data/featurized/data_featurized.csv")
+    ap.add_argument("--incremental", action="store_true", help="featurize only races appended since the saved rolling state")
+    ap.add_argument("--windows", default=",".join(map(str, DEFAULT_WINDOWS)), help="comma-separated rolling window sizes")
+    ap.add_argument("--stats", default=",".join(DEFAULT_STATS), help=f"comma-separated subset of {','.join(FEATURE_FAMILIES)}")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
     args = ap.parse_args()
+    setup_profile(args, "featurizeData")
+    windows = tuple(int(w) for w in args.windows.split(",") if w.strip())
+    stats = tuple(s.strip() for s in args.stats.split(",") if s.strip())
+    unknown = [s for s in stats if s not in FEATURE_FAMILIES]
+    if unknown or not windows:
+        raise SystemExit(f"[ERROR] bad --windows/--stats: unknown stats {unknown}")
 
     Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    df = pd.read_csv(args.infile)
-    out = build_features(df, args.mode)
-    out.to_csv(args.out, index=False)
+    with stage("read") as st:
+        df = read_table(args.infile, "raw")
+        st["rows_out"] = df
+    result = None
+    if args.incremental:
+        with stage("rolling features", df) as st:
+            result, why = build_features_incremental(df, args.out, args.mode, windows, stats)
+            st["rows_out"] = result[0] if result is not None else 0
+        if result is None and why == "no new races":
+            print(f"[OK] {args.out} up to date; no new races")
+            return
+        print(f"[OK] incremental: {why}" if result is not None else f"[WARN] full rebuild: {why}")
+    if result is None:
+        with stage("rolling features", df) as st:
+            result = build_features(df, args.mode, windows, stats), (pd.DataFrame(), df, None)
+            st["rows_out"] = result[0]
+    out, state = result
+    with stage("write", out):
+        write_table(out, args.out, "featurized", csv=args.csv)
+    if not df.empty:
+        save_state(*state, args.out, args.mode, windows, stats)
     print("[OK] rolling features use shift(1) before rolling")
     print(f"[OK] wrote {args.out}")
 
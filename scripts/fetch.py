@@ -0,0 +1,168 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=1.0, min_rate=0.05):
+        self.base_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(min_rate, self.base_rate) if self.base_rate > 0 else 0.0
+        self.capacity = max(float(burst), 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waited = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.rate <= 0:
+                    return
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        return
+                    wait = (1.0 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+    def penalize(self, delay):
+        # 403/429 means the host is throttling us, not one request: stall every worker and halve the rate.
+        with self.lock:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + delay)
+            self.tokens = 0.0
+            self.updated = self.paused_until
+            if self.rate > 0:
+                self.rate = max(self.min_rate, self.rate / 2.0)
+
+    def reward(self):
+        with self.lock:
+            if 0 < self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1)
+
+
+class HostRateLimiter:
+    def __init__(self, rate, burst=1.0):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def acquire(self, url):
+        self.bucket(url).acquire()
+
+    def penalize(self, url, delay):
+        print(f"[WARN] throttled by {urlsplit(url).netloc}; pausing pool {delay:.1f}s")
+        self.bucket(url).penalize(delay)
+
+    def reward(self, url):
+        self.bucket(url).reward()
+
+    def waited(self):
+        with self.lock:
+            return sum(b.waited for b in self.buckets.values())
+
+
+class TimedSession:
+    """Session wrapper that times each HTTP round trip, so limiter waits and backoff stay out of the latencies."""
+
+    def __init__(self, session):
+        self.session = session
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return self.session.get(url, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            with self.lock:
+                self.latencies.append(dt)
+
+
+def make_session(workers):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max(workers, 1), pool_maxsize=max(workers, 1))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def retry_after_seconds(resp, default):
+    value = resp.headers.get("Retry-After") if getattr(resp, "headers", None) else None
+    try:
+        return max(float(value), default)
+    except (TypeError, ValueError):
+        return default
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def latency_summary(latencies):
+    ms = [v * 1000.0 for v in latencies]
+    return {
+        "count": len(ms),
+        "p50": percentile(ms, 50),
+        "p90": percentile(ms, 90),
+        "p99": percentile(ms, 99),
+        "max": max(ms) if ms else None,
+    }
+
+
+class FetchEngine:
+    def __init__(self, fetch_fn, workers=4, rate=2.0, burst=1.0, session=None):
+        self.fetch_fn = fetch_fn
+        self.workers = max(int(workers), 1)
+        self.limiter = HostRateLimiter(rate, burst)
+        self.session = TimedSession(session or make_session(self.workers))
+        self.elapsed = 0.0
+
+    def _run(self, job):
+        key, url, kwargs = job
+        html, mode = self.fetch_fn(url, session=self.session, limiter=self.limiter, **kwargs)
+        return key, html, mode
+
+    def fetch_many(self, jobs):
+        t0 = time.perf_counter()
+        out = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for key, html, mode in pool.map(self._run, jobs):
+                out[key] = (html, mode)
+        self.elapsed += time.perf_counter() - t0
+        return out
+
+    def stats(self, pages):
+        return {
+            "workers": self.workers,
+            "rate_per_host": self.limiter.rate,
+            "elapsed_s": round(self.elapsed, 3),
+            "throughput_pages_per_s": round(pages / self.elapsed, 3) if self.elapsed > 0 else None,
+            "fetch_latency_ms": latency_summary(self.session.latencies),
+            "limiter_wait_s": round(self.limiter.waited(), 3),
+        }
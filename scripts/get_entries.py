@@ -1,7 +1,16 @@
 import argparse
+import sys
 from pathlib import Path
+
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.identity import load_indexes  # noqa: E402
+from scripts.results_store import read_results  # noqa: E402
+from scripts.storage import add_csv_arg, exists, read_table, write_table  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
 
 def main():
     ap = argparse.ArgumentParser()
@@ -9,15 +18,19 @@ def main():
     ap.add_argument("--race", type=int, required=True)
     ap.add_argument("--manual_csv", default=None)
     ap.add_argument("--out", default="data/raw/entries.csv")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
     args = ap.parse_args()
+    setup_profile(args, "get_entries")
 
     out = Path(args.out)
     out.parent.mkdir(parents=True, exist_ok=True)
     sked_id = args.year * 100 + args.race
+    cols = ["Driver", "Team", "Make", "CarNumber", "season_race_num"]
+    base = pd.DataFrame() if args.manual_csv else read_results(columns=cols)
     if args.manual_csv:
         df_new = pd.read_csv(args.manual_csv)
-    elif Path("data/raw/data.csv").exists():
-        base = pd.read_csv("data/raw/data.csv")
+    elif not base.empty:
         sample = base[base["season_race_num"] == args.race].copy()
         if sample.empty:
             sample = base.head(8).copy()
@@ -34,17 +47,25 @@ def main():
     df_new["race_name"] = f"Race {args.race}"
     df_new["track_type"] = "intermediate_1p5"
     df_new["Start"] = pd.NA
-    df_new["driver_id"] = df_new["Driver"].astype(str).str.lower().str.replace(" ", "_", regex=False)
+    df_new["driver_id"] = pd.NA
 
     cols = ["sked_id", "year", "season_race_num", "race_date_text", "race_date", "track", "race_name_raw", "race_name", "track_type", "Driver", "Team", "Make", "CarNumber", "Start", "driver_id"]
     df_new = df_new[cols]
-    if out.exists():
-        df = pd.concat([pd.read_csv(out), df_new], ignore_index=True)
-    else:
-        df = df_new
-    df = df.drop_duplicates(["sked_id", "driver_id"], keep="last")
+    with stage("dedupe", df_new) as st:
+        if exists(out):
+            df = pd.concat([read_table(out, "entries"), df_new], ignore_index=True)
+        else:
+            df = df_new
+        # Ids come from the dim/alias tables normalize_ids keeps, so a re-fetch lines up with rows it already
+        # rewrote to driver_000N; drivers it has not seen yet keep a name slug until its next run.
+        driver_index = load_indexes()["driver"]
+        slug = df["Driver"].astype(str).str.lower().str.replace(" ", "_", regex=False)
+        df["driver_id"] = df["Driver"].astype(object).map(driver_index.lookup).fillna(df["driver_id"].astype(object)).fillna(slug)
+        df = df.drop_duplicates(["sked_id", "driver_id"], keep="last")
+        st["rows_out"] = df
     df = df.sort_values(["race_date", "year", "season_race_num", "driver_id"])
-    df.to_csv(out, index=False)
+    with stage("write", df):
+        write_table(df, out, "entries", csv=args.csv)
     print(f"[OK] wrote {out}")
 
 
@@ -1,21 +1,31 @@
 import argparse
+import sys
 from pathlib import Path
+
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.identity import load_indexes  # noqa: E402
+from scripts.storage import add_csv_arg, exists, read_table, write_table  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--year", type=int, required=True)
     ap.add_argument("--race", type=int, required=True)
     ap.add_argument("--out", default="data/raw/qualifying.csv")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
     args = ap.parse_args()
+    setup_profile(args, "get_qualifying")
 
     out = Path(args.out)
     out.parent.mkdir(parents=True, exist_ok=True)
     sked_id = args.year * 100 + args.race
-    if Path("data/raw/entries.csv").exists():
-        e = pd.read_csv("data/raw/entries.csv")
-        e = e[(e["sked_id"] == sked_id)].copy()
+    if exists("data/raw/entries.csv"):
+        e = read_table("data/raw/entries.csv", "entries", columns=["sked_id", "driver_id"], filters=[("sked_id", "==", sked_id)])
     else:
         e = pd.DataFrame({"driver_id": ["kyle_larson", "denny_hamlin"]})
     e = e.reset_index(drop=True)
@@ -29,12 +39,17 @@ def main():
     q["qual_speed"] = e["qual_speed"]
     q["pole_speed"] = e["pole_speed"]
     q["qual_round"] = e["qual_round"]
-    if out.exists():
-        df = pd.concat([pd.read_csv(out), q], ignore_index=True)
-    else:
-        df = q
-    df = df.drop_duplicates(["sked_id", "driver_id"], keep="last")
-    df.to_csv(out, index=False)
+    with stage("dedupe", q) as st:
+        if exists(out):
+            df = pd.concat([read_table(out, "qualifying"), q], ignore_index=True)
+        else:
+            df = q
+        # Rows fetched before normalize_ids last ran may still carry name slugs; map them onto the stable ids.
+        df["driver_id"] = load_indexes()["driver"].known_ids(df["driver_id"]).to_numpy()
+        df = df.drop_duplicates(["sked_id", "driver_id"], keep="last")
+        st["rows_out"] = df
+    with stage("write", df):
+        write_table(df, out, "qualifying", csv=args.csv)
     print(f"[OK] wrote {out}")
 
 
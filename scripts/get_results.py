@@ -1,11 +1,19 @@
 import argparse
 import json
+import sys
 import time
 from pathlib import Path
 
-import pandas as pd
 import requests
-from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.driveraverages import parse_driveraverages_html, parse_pages  # noqa: E402,F401
+from scripts.fetch import FetchEngine, retry_after_seconds  # noqa: E402
+from scripts.html_cache import HtmlCache  # noqa: E402
+from scripts.results_store import RESULTS_ROOT, ResultsStore  # noqa: E402
+from scripts.storage import add_csv_arg, exists  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
 
 BASE = Path('.')
 
@@ -15,76 +23,58 @@ def ensure_dirs():
         (BASE / p).mkdir(parents=True, exist_ok=True)
 
 
-def fetch_with_retry(url, cache_file, timeout=20, retries=3, backoff=2.0, sleep=1.0, no_cache=False, offline=False):
-    if cache_file.exists() and not no_cache:
-        return cache_file.read_text(encoding="utf-8", errors="ignore"), "cache"
+def fetch_with_retry(url, cache, key, timeout=20, retries=3, backoff=2.0, sleep=1.0, no_cache=False, offline=False, session=None, limiter=None, revalidate=False):
+    # no_cache re-downloads the page outright; revalidate asks the server with a conditional GET and accepts a 304.
+    entry = cache.entry(key)
+    if not (no_cache or revalidate):
+        if entry.get("status") == "ok":
+            html = cache.get(key)
+            if html is not None:
+                return html, "cache"
+        elif cache.is_negative(key):
+            return None, "negative"
+        elif not entry:
+            html = cache.get(key)
+            if html is not None:
+                return html, "cache"
     if offline:
         return None, "offline"
+    http = session or requests
+    headers = {} if no_cache else cache.conditional_headers(key)
     for i in range(retries):
         try:
-            resp = requests.get(url, timeout=timeout)
+            if limiter is not None:
+                limiter.acquire(url)
+            resp = http.get(url, timeout=timeout, headers=headers)
             if resp.status_code in (403, 429):
                 print(f"[WARN] {resp.status_code} for {url}; retrying")
-                time.sleep(sleep * (backoff ** i))
+                delay = retry_after_seconds(resp, sleep * (backoff ** i))
+                if limiter is not None:
+                    limiter.penalize(url, delay)
+                else:
+                    time.sleep(delay)
                 continue
+            if limiter is not None:
+                limiter.reward(url)
+            if resp.status_code == 304:
+                cache.touch(key)
+                return cache.get(key), "revalidated"
+            if resp.status_code == 404:
+                cache.mark(key, "failed")
+                return None, "failed"
             resp.raise_for_status()
-            cache_file.parent.mkdir(parents=True, exist_ok=True)
-            cache_file.write_text(resp.text, encoding="utf-8")
-            return resp.text, "fetched"
+            changed = cache.put(key, resp.text, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+            return resp.text, "fetched" if changed or no_cache else "revalidated"
         except Exception as exc:
             print(f"[WARN] fetch error ({i+1}/{retries}): {exc}")
             time.sleep(sleep * (backoff ** i))
+    if entry.get("status") == "ok":
+        print(f"[WARN] refetch failed for {url}; using cached copy")
+        return cache.get(key), "cache"
+    cache.mark(key, "failed")
     return None, "failed"
 
 
-def parse_driveraverages_html(html, sked_id, year, race_num, source_url):
-    soup = BeautifulSoup(html, "lxml")
-    text = soup.get_text(" ")
-    if f"Race {race_num} of {year}" not in text:
-        return []
-    table = soup.find("table")
-    if not table:
-        return []
-    rows = []
-    headers = [th.get_text(strip=True) for th in table.find_all("th")]
-    for tr in table.find_all("tr"):
-        cells = [td.get_text(strip=True) for td in tr.find_all("td")]
-        if len(cells) < 3:
-            continue
-        rec = dict(zip(headers[: len(cells)], cells)) if headers else {}
-        driver = rec.get("Driver") or cells[0]
-        start = rec.get("Start") or ""
-        finish = rec.get("Finish") or ""
-        car = rec.get("Car") or rec.get("Car #") or ""
-        rows.append(
-            {
-                "sked_id": sked_id,
-                "year": year,
-                "season_race_num": race_num,
-                "race_date_text": f"{year}-01-01",
-                "race_date": f"{year}-01-01",
-                "track": f"Track {race_num}",
-                "race_name_raw": f"Race {race_num}",
-                "race_name": f"Race {race_num}",
-                "track_type": "intermediate_1p5",
-                "Driver": driver,
-                "Team": rec.get("Team", "Unknown Team"),
-                "Make": rec.get("Make", "Unknown"),
-                "CarNumber": car,
-                "Start": pd.to_numeric(start, errors="coerce"),
-                "Finish": pd.to_numeric(finish, errors="coerce"),
-                "Pts": pd.to_numeric(rec.get("Pts"), errors="coerce"),
-                "Laps": pd.to_numeric(rec.get("Laps"), errors="coerce"),
-                "Led": pd.to_numeric(rec.get("Led"), errors="coerce"),
-                "Status": rec.get("Status", "Running"),
-                "source_name": "driveraverages",
-                "source_rank": 1,
-                "source_url": source_url,
-            }
-        )
-    return rows
-
-
 def synthetic_rows(year, race_num):
     drivers = ["Kyle Larson", "Denny Hamlin", "William Byron", "Ryan Blaney"]
     out = []
@@ -123,61 +113,90 @@ def main():
     ap.add_argument("--start_year", type=int, required=True)
     ap.add_argument("--end_year", type=int, required=True)
     ap.add_argument("--max_races", type=int, default=36)
-    ap.add_argument("--out", default="data/raw/data.csv")
     ap.add_argument("--timeout", type=int, default=20)
     ap.add_argument("--retries", type=int, default=3)
     ap.add_argument("--backoff", type=float, default=2.0)
     ap.add_argument("--sleep", type=float, default=1.0)
-    ap.add_argument("--no_cache", action="store_true")
+    ap.add_argument("--no_cache", action="store_true", help="re-download every page, ignoring the cache")
+    ap.add_argument("--revalidate", action="store_true", help="check every cached page with a conditional GET; unchanged pages are not transferred")
+    ap.add_argument("--negative_ttl_hours", type=float, default=24.0, help="skip re-fetching empty/failed races for this long")
     ap.add_argument("--offline", action="store_true")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--rate", type=float, default=2.0, help="max requests/sec per host (0 = unlimited)")
+    ap.add_argument("--burst", type=float, default=1.0)
+    ap.add_argument("--parser", choices=["lxml", "bs4"], default="lxml")
+    ap.add_argument("--parse_workers", type=int, default=1)
+    ap.add_argument("--store", default=RESULTS_ROOT, help="partitioned results store (year=/sked_id=); downstream scripts read it directly")
+    ap.add_argument("--batch_size", type=int, default=16, help="races fetched/parsed between checkpoints")
+    ap.add_argument("--refresh", action="store_true", help="re-process races already checkpointed in the store")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
     args = ap.parse_args()
+    setup_profile(args, "get_results")
 
     ensure_dirs()
-    out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-
-    records = []
-    summary = {"fetched": 0, "cached": 0, "failed": 0, "synthetic": 0}
-    for year in range(args.start_year, args.end_year + 1):
-        for race in range(1, args.max_races + 1):
+    store = ResultsStore(args.store, csv=args.csv)
+    # The flat results table older runs wrote next to the store (results.csv/.parquet) seeds it once.
+    if store.is_empty() and exists(args.store):
+        store.bootstrap(args.store)
+
+    races = [(year, race) for year in range(args.start_year, args.end_year + 1) for race in range(1, args.max_races + 1)]
+    resume = not (args.refresh or args.no_cache or args.revalidate)
+    todo = [(y, r) for y, r in races if not (resume and store.is_done(y * 100 + r))]
+    if len(todo) < len(races):
+        print(f"[OK] resuming: {len(races) - len(todo)} races already in {args.store}")
+    cache = HtmlCache("cache/html/driveraverages", negative_ttl=args.negative_ttl_hours * 3600)
+    fetch_kwargs = {"timeout": args.timeout, "retries": args.retries, "backoff": args.backoff, "sleep": args.sleep, "no_cache": args.no_cache, "revalidate": args.revalidate, "offline": args.offline}
+    engine = FetchEngine(fetch_with_retry, workers=args.workers, rate=args.rate, burst=args.burst)
+
+    summary = {"fetched": 0, "cached": 0, "revalidated": 0, "negative": 0, "failed": 0, "synthetic": 0, "resumed": len(races) - len(todo), "partitions_written": 0}
+    batch = max(args.batch_size, 1)
+    for lo in range(0, len(todo), batch):
+        chunk = todo[lo: lo + batch]
+        jobs = []
+        for year, race in chunk:
             sked_id = year * 100 + race
             url = f"https://www.driveraverages.com/nascar/race.php?sked_id={sked_id}"
-            cache_file = Path(f"cache/html/driveraverages/{sked_id}.html")
-            html, mode = fetch_with_retry(url, cache_file, args.timeout, args.retries, args.backoff, args.sleep, args.no_cache, args.offline)
+            jobs.append((sked_id, url, dict(fetch_kwargs, cache=cache, key=sked_id)))
+        with stage("fetch", jobs) as st:
+            pages = engine.fetch_many(jobs)
+            st["rows_out"] = pages
+        parse_input = [(pages[sked_id][0], sked_id, year, race, url) for (year, race), (sked_id, url, _) in zip(chunk, jobs)]
+        with stage("parse", parse_input) as st:
+            parsed = parse_pages(parse_input, engine=args.parser, workers=args.parse_workers)
+            st["rows_out"] = sum(len(rows) for rows in parsed)
+
+        for (year, race), (sked_id, url, _), rows in zip(chunk, jobs, parsed):
+            html, mode = pages[sked_id]
             if mode == "fetched":
                 summary["fetched"] += 1
             elif mode == "cache":
                 summary["cached"] += 1
+            elif mode == "revalidated":
+                summary["revalidated"] += 1
+            elif mode == "negative":
+                summary["negative"] += 1
             elif mode == "failed":
                 summary["failed"] += 1
-            rows = parse_driveraverages_html(html, sked_id, year, race, url) if html else []
+            if html and not rows:
+                cache.mark(sked_id, "empty")
+            elif rows and cache.entry(sked_id).get("status") != "ok":
+                cache.mark(sked_id, "ok")
+            status = "ok" if rows else "synthetic"
             if not rows:
                 rows = synthetic_rows(year, race)
                 summary["synthetic"] += 1
-            records.extend(rows)
-
-    new_df = pd.DataFrame(records)
-    if out_path.exists():
-        old = pd.read_csv(out_path)
-        old["_seen"] = 0
-        new_df["_seen"] = 1
-        df = pd.concat([old, new_df], ignore_index=True, sort=False)
-    else:
-        new_df["_seen"] = 1
-        df = new_df
-
-    if "driver_id" not in df.columns:
-        df["driver_id"] = df["Driver"].astype(str).str.lower().str.replace(" ", "_", regex=False)
-    df["_pk2"] = df["Driver"].astype(str) + "|" + df["CarNumber"].astype(str)
-    df = df.sort_values(["_seen"]).drop_duplicates(["sked_id", "driver_id"], keep="last")
-    df = df.sort_values(["_seen"]).drop_duplicates(["sked_id", "_pk2"], keep="last")
-    df = df.sort_values(["race_date", "year", "season_race_num", "driver_id"]).drop(columns=["_seen", "_pk2"], errors="ignore")
-    df.to_csv(out_path, index=False)
-    df.to_csv("data/raw/results.csv", index=False)
+            if store.write_partition(rows):
+                summary["partitions_written"] += 1
+            store.checkpoint(sked_id, status, mode)
+        cache.save()
+    summary.update(engine.stats(len(todo)))
+    summary["cache"] = cache.stats()
+
+    print(f"[OK] {args.store}: {summary['partitions_written']} partitions written, {len(store.manifest['partitions'])} races stored")
 
     ts = int(time.time())
     Path(f"reports/get_results_summary_{ts}.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
-    print(f"[OK] wrote {out_path} rows={len(df)}")
 
 
 if __name__ == "__main__":
@@ -1,21 +1,101 @@
 import argparse
 import json
+import sys
 from pathlib import Path
+
 import numpy as np
 import pandas as pd
-from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import roc_auc_score, brier_score_loss, log_loss
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.build_h2h_dataset import pair_features  # noqa: E402
+from scripts.storage import add_csv_arg, read_table, write_table  # noqa: E402
+from scripts.train_predict import have_catboost, make_model, tuned_params  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
+MODEL_DIR = Path("models_h2h")
+
+
+def choose_model(verbose=True, model_dir=MODEL_DIR):
+    family = "catboost" if have_catboost() else "scikit"
+    if verbose:
+        print("[OK] CatBoost H2H" if family == "catboost" else "[WARN] CatBoost missing; using LogisticRegression")
+    return make_model(family, "h2h", tuned_params(model_dir).get(family, {}).get("h2h")), family
+
+
+def save_artifacts(model, imp, fam, feats, model_dir=MODEL_DIR):
+    import joblib
+
+    model_dir = Path(model_dir)
+    model_dir.mkdir(exist_ok=True)
+    joblib.dump(model, model_dir / "h2h_model.pkl")
+    joblib.dump(imp, model_dir / "h2h_imputer.pkl")
+    (model_dir / "h2h_meta.json").write_text(json.dumps({"family": fam, "features": feats}, indent=2), encoding="utf-8")
+
+
+def load_artifacts(model_dir=MODEL_DIR):
+    import joblib
+
+    model_dir = Path(model_dir)
+    paths = [model_dir / n for n in ("h2h_model.pkl", "h2h_imputer.pkl", "h2h_meta.json")]
+    missing = [str(p) for p in paths if not p.exists()]
+    if missing:
+        raise FileNotFoundError(f"missing h2h artifacts {missing}; run h2h_predict.py --train first")
+    meta = json.loads(paths[2].read_text(encoding="utf-8"))
+    return joblib.load(paths[0]), joblib.load(paths[1]), meta["features"]
 
 
-def choose_model():
-    try:
-        from catboost import CatBoostClassifier  # type: ignore
-        print("[OK] CatBoost H2H")
-        return CatBoostClassifier(verbose=False, depth=6, iterations=200), "catboost"
-    except Exception:
-        print("[WARN] CatBoost missing; using LogisticRegression")
-        return LogisticRegression(max_iter=1000), "scikit"
+def pair_rows(sub, a_idx, b_idx, feats):
+    num_cols = [c[len("diff_"):] for c in feats if c.startswith("diff_")]
+    sub = sub.reindex(columns=list(sub.columns) + [c for c in num_cols if c not in sub.columns])
+    return pair_features(sub, a_idx, b_idx, num_cols)
+
+
+def pair_probs(pairs, model, imp, feats):
+    if pairs.empty:
+        return np.empty(0)
+    X = pairs[feats]
+    flipped = X.copy()
+    diff_cols = [c for c in feats if c.startswith("diff_")]
+    flipped[diff_cols] = -flipped[diff_cols]
+    # The model is not exactly antisymmetric, so average both orientations to keep P(a>b) + P(b>a) = 1.
+    p = model.predict_proba(imp.transform(pd.concat([X, flipped], ignore_index=True)))[:, 1]
+    return (p[: len(X)] + 1 - p[len(X):]) / 2
+
+
+def pair_prob(sub, driver_a, driver_b, model, imp, feats):
+    """P(driver_a finishes ahead of driver_b), scored like a matrix cell; None when either driver is not in `sub`."""
+    a = sub[sub["Driver"].str.lower() == driver_a.lower()]
+    b = sub[sub["Driver"].str.lower() == driver_b.lower()]
+    if a.empty or b.empty:
+        return None
+    pair = pd.concat([a.iloc[:1], b.iloc[:1]], ignore_index=True)
+    return float(pair_probs(pair_rows(pair, [0], [1], feats), model, imp, feats)[0])
+
+
+def pairwise_matrix(sub, model, imp, feats):
+    sub = sub.reset_index(drop=True)
+    n = len(sub)
+    a_idx, b_idx = np.triu_indices(n, 1)
+    p = pair_probs(pair_rows(sub, a_idx, b_idx, feats), model, imp, feats)
+    mat = np.full((n, n), np.nan)
+    mat[a_idx, b_idx] = p
+    mat[b_idx, a_idx] = 1 - p
+    names = sub["Driver"].astype(str).tolist()
+    return pd.DataFrame(mat, index=pd.Index(names, name="Driver"), columns=names)
+
+
+def write_matrix(args, model, imp, feats):
+    sub = read_table(args.featurized, "featurized", filters=[("year", "==", args.year), ("season_race_num", "==", args.race)])
+    if sub.empty:
+        print("No race rows found. Run get_entries/build_dataset/featurize first.")
+        return
+    with stage("predict", sub) as st:
+        mat = pairwise_matrix(sub, model, imp, feats)
+        st["rows_out"] = len(mat) * (len(mat) - 1) // 2
+    out = args.matrix_out or f"reports/h2h_matrix_{args.year}_{args.race}.csv"
+    write_table(mat.reset_index(), out, csv=args.csv)
+    print(f"[OK] wrote {out} drivers={len(mat)} pairs={len(mat) * (len(mat) - 1) // 2}")
 
 
 def main():
@@ -27,11 +107,29 @@ def main():
     ap.add_argument("--race", type=int)
     ap.add_argument("--driver_a")
     ap.add_argument("--driver_b")
+    ap.add_argument("--matrix", action="store_true", help="score every driver pair of --year/--race with the saved model")
+    ap.add_argument("--featurized", default="data/featurized/data_featurized.csv")
+    ap.add_argument("--matrix_out", help="default reports/h2h_matrix_{year}_{race}.csv")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
     args = ap.parse_args()
+    setup_profile(args, "h2h_predict")
+
+    if args.matrix and (args.year is None or args.race is None):
+        ap.error("--matrix needs --year and --race")
+    if args.matrix and not (args.train or args.predict):
+        try:
+            artifacts = load_artifacts()
+        except FileNotFoundError as e:
+            raise SystemExit(f"[ERROR] {e}")
+        write_matrix(args, *artifacts)
+        return
+
+    from sklearn.impute import SimpleImputer
+    from sklearn.metrics import roc_auc_score, brier_score_loss, log_loss
 
     model, fam = choose_model()
-    Path("models_h2h").mkdir(exist_ok=True)
-    h = pd.read_csv(args.infile)
+    h = read_table(args.infile, "h2h")
     feats = [c for c in h.columns if c.startswith("diff_") or c in ["same_team_flag", "same_make_flag"]]
     h = h.dropna(subset=["target_a_beats_b"])
     split = int(len(h) * 0.8) if len(h) > 1 else 1
@@ -40,36 +138,28 @@ def main():
     imp = SimpleImputer(strategy="median")
     Xtr = imp.fit_transform(tr[feats])
     Xte = imp.transform(te[feats]) if not te.empty else Xtr
-    model.fit(Xtr, tr["target_a_beats_b"])
+    with stage("fit", tr):
+        model.fit(Xtr, tr["target_a_beats_b"])
     p = model.predict_proba(Xte)[:, 1]
     if len(np.unique(te["target_a_beats_b"])) > 1:
         print(f"AUC={roc_auc_score(te['target_a_beats_b'], p):.3f} Brier={brier_score_loss(te['target_a_beats_b'], p):.3f} logloss={log_loss(te['target_a_beats_b'], p):.3f}")
 
     if args.train:
-        import joblib
-
-        joblib.dump(model, "models_h2h/h2h_model.pkl")
-        Path("models_h2h/h2h_meta.json").write_text(json.dumps({"family": fam, "features": feats}, indent=2), encoding="utf-8")
+        save_artifacts(model, imp, fam, feats)
         print("[OK] saved h2h model")
 
+    if args.matrix:
+        write_matrix(args, model, imp, feats)
+
     if args.predict:
-        d = pd.read_csv("data/featurized/data_featurized.csv")
-        sub = d[(d["year"] == args.year) & (d["season_race_num"] == args.race)]
+        sub = read_table(args.featurized, "featurized", filters=[("year", "==", args.year), ("season_race_num", "==", args.race)])
         if sub.empty:
             print("No race rows found. Run get_entries/build_dataset/featurize first.")
             return
-        a = sub[sub["Driver"].str.lower() == args.driver_a.lower()]
-        b = sub[sub["Driver"].str.lower() == args.driver_b.lower()]
-        if a.empty or b.empty:
+        pa = pair_prob(sub, args.driver_a, args.driver_b, model, imp, feats)
+        if pa is None:
             print("[WARN] one or both drivers not found for race")
             return
-        a = a.iloc[0]
-        b = b.iloc[0]
-        rec = {"same_team_flag": int(a.get("Team", "") == b.get("Team", "")), "same_make_flag": int(a.get("Make", "") == b.get("Make", ""))}
-        for c in [x.replace("diff_", "") for x in feats if x.startswith("diff_")]:
-            rec[f"diff_{c}"] = pd.to_numeric(a.get(c), errors="coerce") - pd.to_numeric(b.get(c), errors="coerce")
-        X = imp.transform(pd.DataFrame([rec])[feats])
-        pa = model.predict_proba(X)[:, 1][0]
         print(f"P({args.driver_a} ahead of {args.driver_b}) = {pa:.3f}")
         print(f"P({args.driver_b} ahead of {args.driver_a}) = {1-pa:.3f}")
 
@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+NEGATIVE = ("empty", "failed")
+
+
+class HtmlCache:
+    def __init__(self, root, negative_ttl=24 * 3600):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.root / "manifest.json"
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.manifest = {}
+        if self.manifest_path.exists():
+            try:
+                self.manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                print(f"[WARN] corrupt {self.manifest_path}; rebuilding cache index")
+
+    def path(self, key):
+        return self.root / f"{key}.html.gz"
+
+    def legacy_path(self, key):
+        return self.root / f"{key}.html"
+
+    def entry(self, key):
+        with self.lock:
+            return dict(self.manifest.get(str(key), {}))
+
+    def get(self, key):
+        p = self.path(key)
+        if p.exists() and str(key) in self.manifest:
+            with gzip.open(p, "rt", encoding="utf-8", errors="ignore") as fh:
+                return fh.read()
+        legacy = self.legacy_path(key)
+        if legacy.exists():
+            html = legacy.read_text(encoding="utf-8", errors="ignore")
+            self.put(key, html)
+            legacy.unlink()
+            return html
+        return None
+
+    def is_negative(self, key, now=None):
+        e = self.entry(key)
+        if e.get("status") not in NEGATIVE:
+            return False
+        now = time.time() if now is None else now
+        return now - e.get("checked_at", 0) < self.negative_ttl
+
+    def conditional_headers(self, key):
+        e = self.entry(key)
+        if not self.path(key).exists():
+            return {}
+        headers = {}
+        if e.get("etag"):
+            headers["If-None-Match"] = e["etag"]
+        if e.get("last_modified"):
+            headers["If-Modified-Since"] = e["last_modified"]
+        return headers
+
+    def put(self, key, html, etag=None, last_modified=None, status="ok"):
+        raw = html.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        prev = self.entry(key)
+        changed = prev.get("sha256") != digest or not self.path(key).exists()
+        if changed:
+            tmp = self.path(key).with_suffix(".tmp")
+            with gzip.open(tmp, "wb", compresslevel=6) as fh:
+                fh.write(raw)
+            os.replace(tmp, self.path(key))
+        now = time.time()
+        with self.lock:
+            self.manifest[str(key)] = {
+                "sha256": digest,
+                "size": len(raw),
+                "stored_size": self.path(key).stat().st_size,
+                "fetched_at": now if changed else prev.get("fetched_at", now),
+                "checked_at": now,
+                "etag": etag or prev.get("etag"),
+                "last_modified": last_modified or prev.get("last_modified"),
+                "status": status,
+            }
+        return changed
+
+    def touch(self, key):
+        with self.lock:
+            if str(key) in self.manifest:
+                self.manifest[str(key)]["checked_at"] = time.time()
+
+    def mark(self, key, status):
+        with self.lock:
+            e = self.manifest.setdefault(str(key), {})
+            e["status"] = status
+            e["checked_at"] = time.time()
+
+    def save(self):
+        with self.lock:
+            payload = json.dumps(self.manifest, indent=1, sort_keys=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    def stats(self):
+        with self.lock:
+            entries = list(self.manifest.values())
+        return {
+            "entries": len(entries),
+            "negative": sum(1 for e in entries if e.get("status") in NEGATIVE),
+            "raw_bytes": sum(e.get("size", 0) for e in entries),
+            "stored_bytes": sum(e.get("stored_size", 0) for e in entries),
+        }
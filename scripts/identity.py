@@ -0,0 +1,182 @@
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.storage import exists, read_table
+
+DIM_DIR = "data/dim"
+# kind -> (name column in raw/entries, canonical column in the dim table)
+KINDS = {"driver": ("Driver", "Driver_canonical"), "team": ("Team", "Team_canonical"), "track": ("track", "track_canonical")}
+SUFFIXES = {"jr", "sr", "ii", "iii", "iv"}
+_DROP = re.compile(r"[.']")
+_SPLIT = re.compile(r"[^a-z0-9]+")
+_SOUNDEX = str.maketrans("bfpvcgjkqsxzdtlmnr", "111122222222334556")
+_ID_NUM = re.compile(r"_(\d+)$")
+
+
+def normalize_name(name):
+    """Case, accents and punctuation folded away: "Martin Truex Jr." -> "martin truex jr"."""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").lower()
+    return _SPLIT.sub(" ", _DROP.sub("", text)).strip()
+
+
+def soundex(word):
+    word = re.sub(r"[^a-z]", "", word)
+    if not word:
+        return ""
+    codes = word.translate(_SOUNDEX)
+    out, last = word[0], codes[0]
+    for ch, code in zip(word[1:], codes[1:]):
+        if code.isdigit() and code != last:
+            out += code
+        if ch not in "hw":
+            last = code
+    return (out + "000")[:4]
+
+
+def suffixes(key):
+    return {t for t in key.split() if t in SUFFIXES}
+
+
+def block_keys(key, n=3):
+    padded = f" {key} "
+    keys = {padded[i:i + n] for i in range(len(padded) - n + 1)}
+    tokens = [t for t in key.split() if t not in SUFFIXES]
+    if tokens:
+        keys.add("#" + soundex(tokens[-1]))
+    return keys
+
+
+class IdentityIndex:
+    """Stable ids for one entity kind. Names resolve by exact alias, then normalized name, then a
+    fuzzy match scored only against candidates that share n-gram or surname-soundex blocks;
+    anything left gets the next id. Existing ids are never renumbered."""
+
+    def __init__(self, kind, canonical_col, threshold=0.92, max_candidates=20):
+        self.kind = kind
+        self.id_col = f"{kind}_id"
+        self.canonical_col = canonical_col
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.canonical = {}
+        self.aliases = {}
+        self.by_key = {}
+        self.blocks = defaultdict(set)
+        self.next_num = 1
+
+    @classmethod
+    def from_tables(cls, kind, canonical_col, dim=None, alias=None, **kwargs):
+        idx = cls(kind, canonical_col, **kwargs)
+        dim = dim if dim is not None else pd.DataFrame()
+        alias = alias if alias is not None else pd.DataFrame()
+        if {idx.id_col, canonical_col} <= set(dim.columns):
+            for ent_id, name in dim[[idx.id_col, canonical_col]].dropna().itertuples(index=False):
+                idx.add_entity(str(ent_id), str(name))
+        if {"alias_name", idx.id_col} <= set(alias.columns):
+            match = alias["match"] if "match" in alias.columns else pd.Series("loaded", index=alias.index)
+            score = alias["score"] if "score" in alias.columns else pd.Series(float("nan"), index=alias.index)
+            for name, ent_id, m, s in zip(alias["alias_name"], alias[idx.id_col], match, score):
+                if pd.notna(name) and pd.notna(ent_id) and str(ent_id) in idx.canonical:
+                    idx.add_alias(str(name), str(ent_id), m if pd.notna(m) else "loaded", s)
+        return idx
+
+    def _index(self, name, ent_id):
+        key = normalize_name(name)
+        if key and key not in self.by_key:
+            self.by_key[key] = ent_id
+            for b in block_keys(key):
+                self.blocks[b].add(key)
+
+    def add_entity(self, ent_id, name):
+        self.canonical[ent_id] = name
+        self._index(name, ent_id)
+        m = _ID_NUM.search(ent_id)
+        if m:
+            self.next_num = max(self.next_num, int(m.group(1)) + 1)
+
+    def add_alias(self, name, ent_id, match, score=float("nan")):
+        self.aliases[name] = (ent_id, match, score)
+        self._index(name, ent_id)
+
+    def candidates(self, key):
+        counts = Counter(k for b in block_keys(key) for k in self.blocks.get(b, ()))
+        # Ties broken by name so the result does not depend on set iteration order.
+        return [k for k, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[: self.max_candidates]]
+
+    def fuzzy(self, key):
+        best, best_score = None, 0.0
+        for cand in self.candidates(key):
+            # "Dale Earnhardt" and "Dale Earnhardt Jr." are different people however close the strings are.
+            if suffixes(cand) != suffixes(key):
+                continue
+            score = SequenceMatcher(None, key, cand).ratio()
+            if score > best_score:
+                best, best_score = cand, score
+        return (self.by_key[best], best_score) if best is not None and best_score >= self.threshold else None
+
+    def lookup(self, name):
+        """Id of an already known name (alias, normalized spelling or fuzzy match); None if unseen. Records nothing."""
+        name = str(name)
+        if name in self.aliases:
+            return self.aliases[name][0]
+        key = normalize_name(name)
+        if not key:
+            return None
+        if key in self.by_key:
+            return self.by_key[key]
+        hit = self.fuzzy(key)
+        return hit[0] if hit is not None else None
+
+    def known_ids(self, values):
+        """Map ids and id-like slugs ("kyle_larson") onto existing ids; values that are ids already or unknown pass through."""
+        values = pd.Series(values, dtype=object)
+        uniq = values.dropna().unique()
+        mapping = {v: v if v in self.canonical else (self.lookup(v) or v) for v in uniq}
+        return values.map(mapping)
+
+    def resolve(self, name):
+        name = str(name)
+        if name in self.aliases:
+            return self.aliases[name][0]
+        key = normalize_name(name)
+        if not key:
+            return None
+        if key in self.by_key:
+            ent_id, match, score = self.by_key[key], "normalized", 1.0
+        else:
+            hit = self.fuzzy(key)
+            if hit is not None:
+                (ent_id, score), match = hit, "fuzzy"
+            else:
+                ent_id, match, score = f"{self.kind}_{self.next_num:04d}", "new", float("nan")
+                self.add_entity(ent_id, name.strip())
+        self.add_alias(name, ent_id, match, score)
+        return ent_id
+
+    def resolve_all(self, names):
+        """{name: id} for every distinct non-blank name; new entities are numbered in sorted name order."""
+        uniq = sorted({str(n) for n in pd.Series(names, dtype=object).dropna() if str(n).strip()})
+        return {n: self.resolve(n) for n in uniq}
+
+    def dim(self):
+        return pd.DataFrame({self.id_col: list(self.canonical), self.canonical_col: list(self.canonical.values())})
+
+    def alias_table(self):
+        rows = [(name, ent_id, match, score) for name, (ent_id, match, score) in sorted(self.aliases.items())]
+        return pd.DataFrame(rows, columns=["alias_name", self.id_col, "match", "score"])
+
+
+def load_indexes(dim_dir=DIM_DIR, threshold=0.92):
+    """{kind: IdentityIndex} loaded from the dim and alias tables normalize_ids keeps."""
+    dim_dir = Path(dim_dir)
+    out = {}
+    for kind, (_, canonical_col) in KINDS.items():
+        dim_path, alias_path = dim_dir / f"{kind}_dim.csv", dim_dir / f"{kind}_alias.csv"
+        dim = read_table(dim_path, "dim") if exists(dim_path) else None
+        alias = read_table(alias_path, "dim") if exists(alias_path) else None
+        out[kind] = IdentityIndex.from_tables(kind, canonical_col, dim, alias, threshold=threshold)
+    return out
@@ -0,0 +1,121 @@
+import atexit
+import cProfile
+import json
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _rows(value):
+    return len(value) if hasattr(value, "__len__") else value
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.script = None
+        self.stages = []
+        self.cprofile = None
+        self.out_dir = Path("reports")
+        self.wall0 = self.cpu0 = 0.0
+        self.started = None
+
+    def start(self, script, cprofile=False, out_dir="reports"):
+        if self.enabled:
+            self.finish()
+        self.enabled = True
+        self.script = script
+        self.stages = []
+        self.out_dir = Path(out_dir)
+        self.wall0, self.cpu0 = time.perf_counter(), time.process_time()
+        self.started = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.cprofile = cProfile.Profile() if cprofile else None
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Time a named block; set rec["rows_out"] inside it. A no-op unless --profile was passed."""
+        rec = {"stage": name, "rows_in": _rows(rows_in), "rows_out": None}
+        if not self.enabled:
+            yield rec
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield rec
+        finally:
+            rec["rows_out"] = _rows(rec["rows_out"])
+            rec.update(wall_s=round(time.perf_counter() - wall, 4), cpu_s=round(time.process_time() - cpu, 4), peak_rss_mb=peak_rss_mb())
+            self.stages.append(rec)
+
+    def report(self):
+        totals = {}
+        for rec in self.stages:
+            t = totals.setdefault(rec["stage"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows_in": 0, "rows_out": 0})
+            t["calls"] += 1
+            t["wall_s"] = round(t["wall_s"] + rec["wall_s"], 4)
+            t["cpu_s"] = round(t["cpu_s"] + rec["cpu_s"], 4)
+            t["rows_in"] += rec["rows_in"] or 0
+            t["rows_out"] += rec["rows_out"] or 0
+        return {
+            "script": self.script,
+            "argv": sys.argv[1:],
+            "started": self.started,
+            "wall_s": round(time.perf_counter() - self.wall0, 4),
+            "cpu_s": round(time.process_time() - self.cpu0, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "stage_totals": totals,
+            "stages": self.stages,
+        }
+
+    def finish(self):
+        if not self.enabled:
+            return None
+        self.enabled = False
+        rep = self.report()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stem = self.out_dir / f"profile_{self.script}_{time.strftime('%Y%m%d_%H%M%S')}"
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(f"{stem}.prof")
+            st = pstats.Stats(self.cprofile)
+            top = sorted(st.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:30]
+            rep["cprofile"] = {
+                "file": f"{stem}.prof",
+                "top_cumulative": [{"func": f"{f}:{line}({fn})", "ncalls": nc, "tottime": round(tt, 4), "cumtime": round(ct, 4)} for (f, line, fn), (_, nc, tt, ct, _) in top],
+            }
+            self.cprofile = None
+        path = Path(f"{stem}.json")
+        path.write_text(json.dumps(rep, indent=2), encoding="utf-8")
+        print(f"[OK] profile written to {path}")
+        return path
+
+
+PROFILER = Profiler()
+stage = PROFILER.stage
+
+
+def add_profile_arg(ap):
+    ap.add_argument("--profile", action="store_true", help="record per-stage wall/CPU time, peak RSS and row counts to reports/profile_*.json")
+    ap.add_argument("--cprofile", action="store_true", help="with --profile, also capture cProfile output (.prof + top functions in the JSON)")
+
+
+def setup_profile(args, script):
+    if getattr(args, "profile", False) or getattr(args, "cprofile", False):
+        PROFILER.start(script, cprofile=getattr(args, "cprofile", False))
+        atexit.register(PROFILER.finish)
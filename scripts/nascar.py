@@ -0,0 +1,85 @@
+import importlib
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.instrument import PROFILER  # noqa: E402
+
+COMMANDS = {
+    "get_results": ("scripts.get_results", "download and parse race results"),
+    "get_entries": ("scripts.get_entries", "collect the entry list for a race"),
+    "get_qualifying": ("scripts.get_qualifying", "collect qualifying for a race"),
+    "normalize_ids": ("scripts.normalize_ids", "rebuild driver/team/track dimension tables"),
+    "enrich_track_meta": ("scripts.enrich_track_meta", "track metadata"),
+    "enrich_race_structure": ("scripts.enrich_race_structure", "race structure metadata"),
+    "enrich_weather": ("scripts.enrich_weather", "race weather"),
+    "build_dataset": ("scripts.build_dataset", "merge sources into data/raw/data.csv"),
+    "validate_data": ("scripts.validate_data", "data quality report"),
+    "featurize": ("scripts.featurizeData", "rolling driver features"),
+    "train_predict": ("scripts.train_predict", "train / predict finish, top10, DNF"),
+    "build_h2h_dataset": ("scripts.build_h2h_dataset", "sample head-to-head pairs"),
+    "h2h_predict": ("scripts.h2h_predict", "train / predict head-to-head"),
+    "backtest": ("scripts.backtest", "walk-forward backtest"),
+    "tune": ("scripts.tune", "hyperparameter search"),
+    "pipeline": ("scripts.pipeline", "run the whole pipeline"),
+    "serve": ("scripts.serve", "local prediction service"),
+    "synth": ("scripts.synth", "generate synthetic multi-season data"),
+}
+ALIASES = {"featurizeData": "featurize"}
+# Commands are imported only when they run, so the top-level help never loads pandas/sklearn;
+# chaining with "+" runs several commands in one process and pays the import cost once.
+USAGE = "usage: python scripts/nascar.py <command> [args...] [+ <command> [args...]]..."
+
+
+def usage():
+    lines = [USAGE, "", "commands:"]
+    lines += [f"  {name:<22}{desc}" for name, (_, desc) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def split_chain(argv):
+    chain, cur = [], []
+    for arg in argv:
+        if arg == "+":
+            chain.append(cur)
+            cur = []
+        else:
+            cur.append(arg)
+    chain.append(cur)
+    return [c for c in chain if c]
+
+
+def run(name, args):
+    name = ALIASES.get(name, name)
+    if name not in COMMANDS:
+        raise SystemExit(f"[ERROR] unknown command {name!r}\n\n{usage()}")
+    module = importlib.import_module(COMMANDS[name][0])
+    saved = sys.argv
+    sys.argv = [f"nascar {name}", *args]
+    try:
+        module.main()
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise
+    finally:
+        sys.argv = saved
+        PROFILER.finish()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    chain = split_chain(argv)
+    for name, *args in chain:
+        start = time.monotonic()
+        run(name, args)
+        if len(chain) > 1:
+            print(f"[OK] {name} {time.monotonic() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
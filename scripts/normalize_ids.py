@@ -1,50 +1,112 @@
 import argparse
+import sys
 from pathlib import Path
+
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.identity import DIM_DIR, KINDS, load_indexes  # noqa: E402
+from scripts.results_store import RESULTS_ROOT, ResultsStore, read_results  # noqa: E402
+from scripts.storage import add_csv_arg, apply_schema, exists, frame_hash, read_table, write_table  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
+# Flat tables whose ids are rewritten in place; results go back through the store.
+TABLES = {"data/raw/entries.csv": "entries", "data/raw/qualifying.csv": "qualifying"}
+
+
+def resolve(frames, indexes):
+    """{kind: {name: id}} over every name in the frames; unseen names become new entities."""
+    ids = {}
+    for kind, (name_col, _) in KINDS.items():
+        names = [f[name_col] for f in frames if name_col in f.columns]
+        ids[kind] = indexes[kind].resolve_all(pd.concat(names, ignore_index=True) if names else [])
+    return ids
+
 
-def mk_dim(values, prefix, canonical_col):
-    uniq = sorted({str(v).strip() for v in values if pd.notna(v) and str(v).strip()})
-    return pd.DataFrame({f"{prefix}_id": [f"{prefix}_{i+1:04d}" for i in range(len(uniq))], canonical_col: uniq})
+def driver_id_map(frames, ids):
+    # Qualifying rows carry no names, only the driver_id the entries had when they were fetched.
+    pairs = [
+        pd.DataFrame({"old": f["driver_id"].astype(object), "new": f["Driver"].astype(object).map(ids["driver"])})
+        for f in frames
+        if {"driver_id", "Driver"} <= set(f.columns)
+    ]
+    if not pairs:
+        return {}
+    pairs = pd.concat(pairs, ignore_index=True).dropna().drop_duplicates("old", keep="last")
+    return dict(zip(pairs["old"], pairs["new"]))
+
+
+def apply_ids(df, ids, driver_map, driver_index=None):
+    """Write resolved driver/team/track ids onto a raw, entries or qualifying frame."""
+    df = df.copy()
+    for kind, (name_col, _) in KINDS.items():
+        id_col = f"{kind}_id"
+        if name_col in df.columns:
+            new = df[name_col].astype(object).map(ids[kind])
+            df[id_col] = new.where(new.notna(), df[id_col].astype(object)) if id_col in df.columns else new
+    if "Driver" not in df.columns and "driver_id" in df.columns:
+        old = df["driver_id"].astype(object)
+        new = old.map(driver_map)
+        # A slug whose entries row was already rewritten on an earlier run is no longer in driver_map;
+        # resolve it against the index instead.
+        fallback = driver_index.known_ids(old) if driver_index is not None else old
+        df["driver_id"] = new.where(new.notna(), fallback)
+    return df
 
 
 def main():
-    argparse.ArgumentParser().parse_args()
-    dim_dir = Path("data/dim")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dim_dir", default=DIM_DIR)
+    ap.add_argument("--store", default=RESULTS_ROOT)
+    ap.add_argument("--threshold", type=float, default=0.92, help="minimum similarity for a fuzzy alias match")
+    ap.add_argument("--no_apply", action="store_true", help="only update the dim/alias tables; leave results/entries/qualifying as they are")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
+    args = ap.parse_args()
+    setup_profile(args, "normalize_ids")
+    dim_dir = Path(args.dim_dir)
     dim_dir.mkdir(parents=True, exist_ok=True)
 
-    raw = pd.read_csv("data/raw/data.csv") if Path("data/raw/data.csv").exists() else pd.DataFrame()
-    entries = pd.read_csv("data/raw/entries.csv") if Path("data/raw/entries.csv").exists() else pd.DataFrame()
-    src = pd.concat([raw, entries], ignore_index=True, sort=False)
-
-    driver_dim = mk_dim(src.get("Driver", pd.Series(dtype=str)), "driver", "Driver_canonical")
-    team_dim = mk_dim(src.get("Team", pd.Series(dtype=str)), "team", "Team_canonical")
-    track_dim = mk_dim(src.get("track", pd.Series(dtype=str)), "track", "track_canonical")
-
-    driver_dim.to_csv(dim_dir / "driver_dim.csv", index=False)
-    team_dim.to_csv(dim_dir / "team_dim.csv", index=False)
-    track_dim.to_csv(dim_dir / "track_dim.csv", index=False)
-
-    if not src.empty:
-        if "Driver" in src.columns and not driver_dim.empty:
-            alias = src[["Driver"]].dropna().drop_duplicates().merge(driver_dim, left_on="Driver", right_on="Driver_canonical", how="left")
-            alias[["Driver", "driver_id"]].rename(columns={"Driver": "alias_name"}).drop_duplicates().to_csv(dim_dir / "driver_alias.csv", index=False)
-        else:
-            pd.DataFrame(columns=["alias_name", "driver_id"]).to_csv(dim_dir / "driver_alias.csv", index=False)
-
-        if "Team" in src.columns and not team_dim.empty:
-            alias = src[["Team"]].dropna().drop_duplicates().merge(team_dim, left_on="Team", right_on="Team_canonical", how="left")
-            alias[["Team", "team_id"]].rename(columns={"Team": "alias_name"}).drop_duplicates().to_csv(dim_dir / "team_alias.csv", index=False)
-        else:
-            pd.DataFrame(columns=["alias_name", "team_id"]).to_csv(dim_dir / "team_alias.csv", index=False)
-
-        if "track" in src.columns and not track_dim.empty:
-            alias = src[["track"]].dropna().drop_duplicates().merge(track_dim, left_on="track", right_on="track_canonical", how="left")
-            alias[["track", "track_id"]].rename(columns={"track": "alias_name"}).drop_duplicates().to_csv(dim_dir / "track_alias.csv", index=False)
-        else:
-            pd.DataFrame(columns=["alias_name", "track_id"]).to_csv(dim_dir / "track_alias.csv", index=False)
+    with stage("read") as st:
+        results = read_results(args.store)
+        frames = {path: read_table(path, table) for path, table in TABLES.items() if exists(path)}
+        n_rows = len(results) + sum(len(df) for df in frames.values())
+        st["rows_out"] = n_rows
+
+    with stage("resolve", n_rows) as st:
+        indexes = load_indexes(dim_dir, args.threshold)
+        known = {kind: (len(idx.canonical), set(idx.aliases)) for kind, idx in indexes.items()}
+        ids = resolve([results, *frames.values()], indexes)
+        st["rows_out"] = sum(len(v) for v in ids.values())
+
+    for kind, idx in indexes.items():
+        n_known, known_aliases = known[kind]
+        added = {name: idx.aliases[name] for name in idx.aliases if name not in known_aliases}
+        print(f"[OK] {kind}: {len(idx.canonical)} ids ({len(idx.canonical) - n_known} new), {len(added)} new aliases")
+        for name, (ent_id, match, score) in sorted(added.items()):
+            if match == "fuzzy":
+                print(f"[INFO] fuzzy alias {name!r} -> {ent_id} ({idx.canonical[ent_id]!r}, score={score:.3f})")
+        write_table(idx.dim(), dim_dir / f"{kind}_dim.csv", "dim", csv=args.csv)
+        write_table(idx.alias_table(), dim_dir / f"{kind}_alias.csv", "dim", csv=args.csv)
     print("[OK] wrote dim tables")
 
+    if args.no_apply:
+        return
+    with stage("apply", n_rows):
+        driver_map = driver_id_map([results, *frames.values()], ids)
+        if not results.empty:
+            # The store only rewrites races whose content changed.
+            changed = ResultsStore(args.store, csv=args.csv).write_frame(apply_ids(results, ids, driver_map))
+            if changed:
+                print(f"[OK] applied ids to {changed} races in {args.store}")
+        for path, df in frames.items():
+            out = apply_schema(apply_ids(df, ids, driver_map, indexes["driver"]), TABLES[path])
+            # Unchanged tables are left alone so their digests (and downstream steps) stay put.
+            if frame_hash(out) != frame_hash(df):
+                write_table(out, path, TABLES[path], csv=args.csv)
+                print(f"[OK] applied ids to {path} rows={len(out)}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,245 @@
+import argparse
+import hashlib
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.cli_args import add_csv_arg  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
+SCRIPTS = Path(__file__).resolve().parent
+STATE_PATH = Path("data/pipeline_state.json")
+RESULTS_STORE = "data/raw/results"  # results_store.RESULTS_ROOT; not imported so --help stays free of pandas
+MODEL_FILES = ["models/finish_model.pkl", "models/top10_model.pkl", "models/dnf_model.pkl", "models/imputer.pkl", "models/feature_cols.json"]
+DIM_FILES = [f"data/dim/{name}.csv" for name in ("driver_dim", "team_dim", "track_dim", "driver_alias", "team_alias", "track_alias")]
+SOURCE_TABLES = [RESULTS_STORE, "data/raw/entries.csv", "data/raw/qualifying.csv"]
+IMPORT_RE = re.compile(r"^[ \t]*from scripts(?:\.(\w+))? import ([\w, ]+)", re.M)
+
+
+class Step:
+    def __init__(self, name, args=(), inputs=(), outputs=(), always=False, csv=True):
+        self.name = name
+        self.args = list(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.always = always
+        self.csv = csv
+
+    def command(self, csv=False):
+        return [sys.executable, str(SCRIPTS / f"{self.name}.py"), *self.args] + (["--csv"] if csv and self.csv else [])
+
+
+def build_steps(start_year, end_year, mode="prequal", h2h=False, entries_race=1, fetch=True):
+    steps = [
+        # Every output has one writer: get_results fills the results store and only build_dataset writes data.csv.
+        Step("get_results", ["--start_year", start_year, "--end_year", end_year], outputs=[RESULTS_STORE], always=True),
+        Step("enrich_race_structure", inputs=[RESULTS_STORE], outputs=["data/enrich/race_meta.csv"]),
+        Step("get_entries", ["--year", end_year, "--race", entries_race], inputs=[RESULTS_STORE, *DIM_FILES], outputs=["data/raw/entries.csv"]),
+        Step("get_qualifying", ["--year", end_year, "--race", entries_race], inputs=["data/raw/entries.csv", *DIM_FILES], outputs=["data/raw/qualifying.csv"]),
+        # Rewrites the ids in the raw tables it reads (in place), so it runs once all of them are fetched.
+        Step("normalize_ids", inputs=SOURCE_TABLES, outputs=DIM_FILES + SOURCE_TABLES),
+        Step("enrich_track_meta", inputs=["data/dim/track_dim.csv", RESULTS_STORE], outputs=["data/enrich/track_meta.csv"]),
+        Step(
+            "enrich_weather",
+            inputs=[RESULTS_STORE, "data/raw/entries.csv", "data/enrich/race_meta.csv", "data/enrich/track_meta.csv", "data/enrich/weather_archive.csv"],
+            outputs=["data/enrich/weather.csv"],
+        ),
+        Step(
+            "build_dataset",
+            inputs=[RESULTS_STORE, "data/raw/entries.csv", "data/raw/qualifying.csv", "data/enrich/race_meta.csv", "data/enrich/weather.csv", "data/enrich/track_meta.csv"],
+            outputs=["data/raw/data.csv"],
+        ),
+        Step("validate_data", inputs=["data/raw/data.csv"], outputs=["reports/data_quality_report.txt", "reports/data_quality_report.json"], csv=False),
+        Step("featurizeData", ["--mode", mode], inputs=["data/raw/data.csv"], outputs=["data/featurized/data_featurized.csv"]),
+        Step("train_predict", ["--train"], inputs=["data/featurized/data_featurized.csv", "models/tuned_params.json"], outputs=MODEL_FILES, csv=False),
+    ]
+    if h2h:
+        steps += [
+            Step("build_h2h_dataset", inputs=["data/featurized/data_featurized.csv"], outputs=["data/featurized/h2h.csv"]),
+            Step("h2h_predict", ["--train"], inputs=["data/featurized/h2h.csv", "models_h2h/tuned_params.json"], outputs=["models_h2h/h2h_model.pkl"], csv=False),
+        ]
+    if not fetch:
+        steps = steps[1:]
+    for step in steps:
+        step.args = [str(a) for a in step.args]
+    return steps
+
+
+def dependencies(steps):
+    """A step waits for earlier steps that write what it reads, and for earlier steps that read or
+    write what it writes. Declaration order decides which way a shared file (e.g. entries.csv) flows."""
+    deps = {}
+    for i, step in enumerate(steps):
+        deps[step.name] = {
+            prev.name for prev in steps[:i]
+            if set(prev.outputs) & set(step.inputs) or set(prev.inputs + prev.outputs) & set(step.outputs)
+        }
+    return deps
+
+
+def code_files(script, seen=None):
+    seen = set() if seen is None else seen
+    if script in seen or not script.exists():
+        return seen
+    seen.add(script)
+    for module, names in IMPORT_RE.findall(script.read_text(encoding="utf-8")):
+        for name in [module] if module else [n.strip() for n in names.split(",")]:
+            code_files(SCRIPTS / f"{name}.py", seen)
+    return seen
+
+
+def file_digest(path):
+    from scripts.storage import source_path
+
+    if Path(path).is_dir():
+        # A partitioned store: its manifest already carries a content hash per partition (checkpoint times excluded).
+        manifest = Path(path) / "_manifest.json"
+        if not manifest.exists():
+            return "missing"
+        parts = json.loads(manifest.read_text(encoding="utf-8"))["partitions"]
+        return hashlib.sha256(json.dumps({k: v["sha256"] for k, v in parts.items()}, sort_keys=True).encode("utf-8")).hexdigest()
+    p = source_path(path) if Path(path).suffix == ".csv" else Path(path)
+    if p is None or not p.exists():
+        return "missing"
+    h = hashlib.sha256()
+    with p.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def step_digest(step, csv=False):
+    h = hashlib.sha256(json.dumps(step.command(csv)[1:]).encode("utf-8"))
+    for path in sorted(code_files(SCRIPTS / f"{step.name}.py")) + [Path(p) for p in step.inputs]:
+        h.update(f"{path}={file_digest(path)}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def load_state(path=STATE_PATH):
+    return json.loads(Path(path).read_text(encoding="utf-8")) if Path(path).exists() else {}
+
+
+class Runner:
+    def __init__(self, steps, log_path, jobs=4, force=False, csv=False, state_path=STATE_PATH, profile=False):
+        self.steps = {s.name: s for s in steps}
+        self.order = [s.name for s in steps]
+        self.deps = dependencies(steps)
+        self.log_path = Path(log_path)
+        self.jobs = jobs
+        self.force = force
+        self.csv = csv
+        self.profile = profile
+        self.state_path = Path(state_path)
+        self.state = load_state(state_path)
+        self.lock = threading.Lock()
+        self.timings = {}
+
+    def log(self, text):
+        with self.lock:
+            print(text, flush=True)
+            with self.log_path.open("a", encoding="utf-8") as fh:
+                fh.write(text + "\n")
+
+    def save_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps(self.state, indent=2), encoding="utf-8")
+
+    def run_step(self, name):
+        from scripts.storage import exists
+
+        step = self.steps[name]
+        digest = step_digest(step, self.csv)
+        outputs_ok = all(exists(p) if p.endswith(".csv") else Path(p).exists() for p in step.outputs)
+        if not (self.force or step.always) and outputs_ok and self.state.get(name) == digest:
+            self.log(f"[SKIP] {name} (inputs and code unchanged)")
+            return "skipped", 0.0
+        cmd = step.command(self.csv) + (["--profile"] if self.profile else [])
+        self.log(f"[STATUS] {' '.join(cmd[1:])}")
+        start = time.monotonic()
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        elapsed = time.monotonic() - start
+        self.log(f"--- {name} output ---\n{proc.stdout.rstrip()}" if proc.stdout.strip() else f"--- {name}: no output ---")
+        if proc.returncode != 0:
+            self.log(f"[ERROR] {name} failed with exit code {proc.returncode} after {elapsed:.1f}s")
+            return "failed", elapsed
+        with self.lock:
+            # Record the digest taken before running so inputs changed mid-run trigger another run. A step that
+            # rewrites its own inputs (normalize_ids) records what it left behind instead, or it would never skip.
+            self.state[name] = step_digest(step, self.csv) if set(step.inputs) & set(step.outputs) else digest
+            self.save_state()
+        self.log(f"[OK] {name} {elapsed:.1f}s")
+        return "ran", elapsed
+
+    def refresh_rewritten(self, status):
+        """Steps that read a file a later step rewrote in place saw it before the rewrite; re-record them against
+        the rewritten file so the next run on unchanged data does not loop through them again."""
+        rewritten = {p for name, step in self.steps.items() if status.get(name) == "ran" for p in set(step.inputs) & set(step.outputs)}
+        stale = [name for name in self.order if status.get(name) == "ran" and rewritten & set(self.steps[name].inputs)]
+        for name in stale:
+            self.state[name] = step_digest(self.steps[name], self.csv)
+        if stale:
+            self.save_state()
+
+    def run(self):
+        status, running = {}, {}
+        failed = False
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while True:
+                if not failed:
+                    for name in self.order:
+                        if name not in status and name not in running.values() and self.deps[name] <= set(status):
+                            running[pool.submit(self.run_step, name)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    status[name], self.timings[name] = fut.result()
+                    failed = failed or status[name] == "failed"
+        self.refresh_rewritten(status)
+        self.log("\nstep                    status   seconds")
+        for name in self.order:
+            self.log(f"{name:<24}{status.get(name, 'not run'):<9}{self.timings.get(name, 0.0):>7.1f}")
+        return not failed and len(status) == len(self.order)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--start_year", type=int, default=2023)
+    ap.add_argument("--end_year", type=int, default=2024)
+    ap.add_argument("--mode", choices=["prequal", "postqual"], default="prequal")
+    ap.add_argument("--h2h", action="store_true", help="also build and train the H2H model")
+    ap.add_argument("--entries_race", type=int, default=1)
+    ap.add_argument("--no_fetch", action="store_true", help="skip get_results (offline / already collected)")
+    ap.add_argument("--jobs", type=int, default=4, help="steps run concurrently when their inputs are ready")
+    ap.add_argument("--force", action="store_true", help="rerun every step even if unchanged")
+    ap.add_argument("--dry_run", action="store_true", help="print the step graph and exit")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
+    args = ap.parse_args()
+    setup_profile(args, "pipeline")
+
+    for d in ["data/raw", "data/enrich", "data/featurized", "data/dim", "models", "models_h2h", "reports", "cache/html"]:
+        Path(d).mkdir(parents=True, exist_ok=True)
+    steps = build_steps(args.start_year, args.end_year, args.mode, args.h2h, args.entries_race, not args.no_fetch)
+    if args.dry_run:
+        for name, deps in dependencies(steps).items():
+            print(f"{name} <- {', '.join(sorted(deps)) or '(none)'}")
+        return
+    log_path = Path(f"reports/pipeline_{time.strftime('%Y%m%d_%H%M%S')}.log")
+    with stage("steps", len(steps)):
+        ok = Runner(steps, log_path, args.jobs, args.force, args.csv, profile=args.profile).run()
+    print(f"[OK] Pipeline complete. Log: {log_path}" if ok else f"[ERROR] Pipeline failed. Log: {log_path}")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# column -> finishing positions it covers
+POSITIONS = {"sim_win": 1, "sim_top5": 5, "sim_top10": 10, "sim_top20": 20}
+SCALES = np.geomspace(0.5, 20.0, 25)
+
+
+def chunk_size(n_drivers, workers=1, mem_mb=256):
+    """Simulations per chunk so `workers` chunks in flight fit in mem_mb: keys, DNF draws and two
+    argsorts (8 bytes per driver each) plus the driver x driver comparison (1 byte per pair)."""
+    per_sim = n_drivers * 8 * 4 + n_drivers * n_drivers
+    return max(1, int(mem_mb * 2**20 / (max(workers, 1) * per_sim)))
+
+
+def _simulate_chunk(log_w, prob_dnf, size, seed):
+    rng = np.random.default_rng(seed)
+    n = len(log_w)
+    # Log-weights plus Gumbel noise, sorted high to low, are exact Plackett-Luce finishing orders.
+    keys = log_w + rng.gumbel(size=(size, n))
+    dnf = rng.random((size, n)) < prob_dnf
+    # Non-finishers drop behind every finisher and keep their relative order among themselves.
+    keys = np.where(dnf, keys - 1e6, keys)
+    ranks = np.argsort(np.argsort(-keys, axis=1), axis=1)
+    positions = np.bincount((np.arange(n) * n + ranks).ravel(), minlength=n * n).reshape(n, n)
+    beats = (ranks[:, :, None] < ranks[:, None, :]).sum(axis=0)
+    return positions, beats, dnf.sum(axis=0)
+
+
+def simulate(log_w, prob_dnf, n_sims=100_000, seed=0, workers=None, mem_mb=256):
+    """Counts over n_sims races: finishing positions (driver x position, 0-based), pairwise
+    finishes-ahead (row ahead of column) and DNFs. The same seed, workers and mem_mb give the same counts."""
+    log_w = np.asarray(log_w, dtype=float)
+    prob_dnf = np.clip(np.nan_to_num(np.asarray(prob_dnf, dtype=float)), 0.0, 1.0)
+    n = len(log_w)
+    workers = max(int(workers or os.cpu_count() or 1), 1)
+    size = min(n_sims, chunk_size(n, workers, mem_mb))
+    sizes = [size] * (n_sims // size) + ([n_sims % size] if n_sims % size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    positions, beats, dnf = np.zeros((n, n), dtype=np.int64), np.zeros((n, n), dtype=np.int64), np.zeros(n, dtype=np.int64)
+    # NumPy's sorts and reductions release the GIL, so threads spread chunks over cores without copying inputs.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for p, b, d in pool.map(lambda job: _simulate_chunk(log_w, prob_dnf, *job), zip(sizes, seeds)):
+            positions += p
+            beats += b
+            dnf += d
+    return positions, beats, dnf
+
+
+def field_probabilities(pred_finish, prob_dnf, n_sims=100_000, scale=1.0, seed=0, workers=None, mem_mb=256):
+    """(per-driver sim_win/top5/top10/top20, sim_exp_finish, sim_dnf; driver x driver P(row ahead of column))."""
+    pred = np.asarray(pred_finish, dtype=float)
+    pred = np.where(np.isnan(pred), np.nanmax(pred) if np.isfinite(pred).any() else 0.0, pred)
+    positions, beats, dnf = simulate(-pred / scale, prob_dnf, n_sims, seed, workers, mem_mb)
+    n = len(pred)
+    probs = positions / n_sims
+    out = pd.DataFrame({col: probs[:, :min(k, n)].sum(axis=1) for col, k in POSITIONS.items()})
+    out["sim_exp_finish"] = probs @ np.arange(1, n + 1)
+    out["sim_dnf"] = dnf / n_sims
+    return out, beats / n_sims
+
+
+def fit_scale(pred_finish, prob_top10, prob_dnf, n_sims=4000, seed=0):
+    """Finish-position noise whose simulated top-10 rates best match the top-10 classifier, so the
+    simulated field agrees with the separately trained probabilities."""
+    target = np.nan_to_num(np.asarray(prob_top10, dtype=float))
+    errors = [np.mean((field_probabilities(pred_finish, prob_dnf, n_sims, s, seed, workers=1)[0]["sim_top10"].to_numpy() - target) ** 2) for s in SCALES]
+    return float(SCALES[int(np.argmin(errors))])
+
+
+def simulate_race(sub, n_sims=100_000, scale=None, seed=0, workers=None, mem_mb=256):
+    """score() output for one race -> (sub with sim_* columns, field H2H matrix labelled by Driver)."""
+    sub = sub.reset_index(drop=True)
+    if scale is None:
+        scale = fit_scale(sub["pred_finish"], sub["prob_top10"], sub["prob_dnf"], seed=seed)
+        print(f"[OK] simulation noise scale={scale:.2f} (fitted to prob_top10)")
+    table, h2h = field_probabilities(sub["pred_finish"], sub["prob_dnf"], n_sims, scale, seed, workers, mem_mb)
+    labels = (sub["Driver"] if "Driver" in sub.columns else sub["driver_id"]).astype(str).tolist()
+    return pd.concat([sub, table], axis=1), pd.DataFrame(h2h, index=labels, columns=labels)
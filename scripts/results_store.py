@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.storage import apply_schema, concat_tables, exists, filter_frame, frame_hash, read_table, write_table  # noqa: E402
+
+RESULTS_ROOT = "data/raw/results"
+SORT_COLS = ["race_date", "year", "season_race_num", "driver_id"]
+
+
+def dedupe_race(df):
+    df = df.copy()
+    slug = df["Driver"].astype(str).str.lower().str.replace(" ", "_", regex=False)
+    df["driver_id"] = df["driver_id"].astype(object).fillna(slug) if "driver_id" in df.columns else slug
+    df["_pk2"] = df["Driver"].astype(str) + "|" + df["CarNumber"].astype(str)
+    df = df.drop_duplicates(["sked_id", "driver_id"], keep="last")
+    df = df.drop_duplicates(["sked_id", "_pk2"], keep="last")
+    sort_cols = [c for c in SORT_COLS if c in df.columns]
+    return df.sort_values(sort_cols).drop(columns=["_pk2"]).reset_index(drop=True)
+
+
+class ResultsStore:
+    def __init__(self, root=RESULTS_ROOT, csv=False):
+        self.root = Path(root)
+        self.csv = csv
+        self.manifest_path = self.root / "_manifest.json"
+        self.manifest = {"partitions": {}, "done": {}}
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    def partition_path(self, year, sked_id):
+        # No suffix: write_table picks .parquet (or .csv without pyarrow) and read_table finds whichever exists.
+        return self.root / f"year={int(year)}" / f"sked_id={int(sked_id)}"
+
+    def is_empty(self):
+        return not self.manifest["partitions"]
+
+    def is_done(self, sked_id):
+        return self.manifest["done"].get(str(sked_id), {}).get("status") == "ok"
+
+    def write_partition(self, rows):
+        df = apply_schema(dedupe_race(pd.DataFrame(rows)), "raw")
+        sked_id = int(df["sked_id"].iloc[0])
+        year = int(df["year"].iloc[0])
+        digest = frame_hash(df)
+        prev = self.manifest["partitions"].get(str(sked_id), {})
+        path = self.partition_path(year, sked_id)
+        if prev.get("sha256") == digest and exists(path):
+            return False
+        write_table(df, path, "raw", csv=self.csv)
+        self.manifest["partitions"][str(sked_id)] = {
+            "path": path.relative_to(self.root).as_posix(),
+            "year": year,
+            "season_race_num": int(df["season_race_num"].iloc[0]),
+            "race_date": str(df["race_date"].min()),
+            "rows": len(df),
+            "sha256": digest,
+        }
+        return True
+
+    def write_frame(self, df):
+        """Write every race of `df` back into its partition; only races whose content changed touch disk."""
+        changed = sum(self.write_partition(race) for _, race in df.groupby("sked_id", sort=False))
+        self.save()
+        return changed
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.manifest, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    def checkpoint(self, sked_id, status, mode):
+        self.manifest["done"][str(sked_id)] = {"status": status, "mode": mode, "updated_at": time.time()}
+        self.save()
+
+    def bootstrap(self, csv_path):
+        old = read_table(csv_path, "raw")
+        for _, race in old.groupby("sked_id", sort=False):
+            self.write_partition(race)
+        self.save()
+        print(f"[OK] seeded {len(self.manifest['partitions'])} partitions from {csv_path}")
+
+    def ordered_partitions(self, filters=None):
+        parts = sorted(self.manifest["partitions"].items(), key=lambda kv: (kv[1]["race_date"], kv[1]["year"], kv[1]["season_race_num"]))
+        if not filters or not parts:
+            return [p for _, p in parts]
+        # Filters on the partition keys drop whole races before any file is opened.
+        meta = pd.DataFrame([{"sked_id": int(k), "year": p["year"], "season_race_num": p["season_race_num"]} for k, p in parts])
+        keep = set(filter_frame(meta, filters).index)
+        return [p for i, (_, p) in enumerate(parts) if i in keep]
+
+    def read_all(self, columns=None, filters=None):
+        frames = [read_table(self.root / p["path"], "raw", columns, filters) for p in self.ordered_partitions(filters)]
+        frames = [f for f in frames if not f.empty]
+        return concat_tables(frames, ignore_index=True, sort=False) if frames else pd.DataFrame(columns=columns or [])
+
+
+def read_results(root=RESULTS_ROOT, columns=None, filters=None):
+    """Every stored race in race order; an empty frame before anything has been ingested."""
+    return ResultsStore(root).read_all(columns, filters)
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# name template, value column, statistic, min_periods
+FEATURE_FAMILIES = {
+    "finish_mean": ("drv_finish_mean_{w}", "target_finish", "mean", 1),
+    "finish_std": ("drv_finish_std_{w}", "target_finish", "std", 2),
+    "top10_rate": ("drv_top10_rate_{w}", "target_top10", "mean", 1),
+    "dnf_rate": ("drv_dnf_rate_{w}", "target_dnf", "mean", 1),
+    "appearances": ("drv_appearances_{w}", "target_finish", "count", 0),
+}
+DEFAULT_WINDOWS = (5, 10, 20)
+DEFAULT_STATS = ("finish_mean", "finish_std", "top10_rate", "dnf_rate")
+# Driver x track / track type families: a driver sees each track only a few times a season.
+CONDITIONAL_WINDOWS = (5, 10)
+CONDITIONAL_STATS = ("finish_mean", "top10_rate", "dnf_rate")
+APPEARANCE_WINDOW = 50
+
+
+def make_specs(windows=DEFAULT_WINDOWS, stats=DEFAULT_STATS):
+    specs = []
+    for w in windows:
+        for stat in stats:
+            template, col, fn, min_periods = FEATURE_FAMILIES[stat]
+            specs.append((template.format(w=w), col, int(w), fn, min_periods))
+    return specs
+
+
+def conditional_specs(prefix, windows=CONDITIONAL_WINDOWS, stats=CONDITIONAL_STATS):
+    """make_specs for a driver x <key> family, renamed drv_finish_mean_5 -> drv_<prefix>_finish_mean_5, plus appearances."""
+    specs = make_specs(windows, stats) + make_specs((APPEARANCE_WINDOW,), ("appearances",))
+    return [(name.replace("drv_", f"drv_{prefix}_", 1), *rest) for name, *rest in specs]
+
+
+def group_codes(df, cols):
+    """One int code per distinct key tuple over `cols`; -1 where any key is missing."""
+    codes = np.zeros(len(df), dtype=np.int64)
+    missing = np.zeros(len(df), dtype=bool)
+    for col in cols:
+        c, uniq = pd.factorize(df[col], use_na_sentinel=True)
+        missing |= c < 0
+        codes = codes * max(len(uniq), 1) + c
+    return np.where(missing, -1, codes)
+
+
+def group_starts(keys):
+    keys, _ = pd.factorize(np.asarray(keys, dtype=object), use_na_sentinel=True)
+    return _starts(keys)
+
+
+def _starts(keys):
+    n = len(keys)
+    is_start = np.ones(n, dtype=bool)
+    if n > 1:
+        is_start[1:] = keys[1:] != keys[:-1]
+    return np.maximum.accumulate(np.where(is_start, np.arange(n), 0))
+
+
+def _prefix_sums(values, starts):
+    valid = ~np.isnan(values)
+    # Centre each group on its own mean so sums of squares stay small and the variance does not cancel badly.
+    x = np.where(valid, values, 0.0)
+    gcount = np.bincount(starts, weights=valid, minlength=len(values))
+    gsum = np.bincount(starts, weights=x, minlength=len(values))
+    center = np.divide(gsum, gcount, out=np.zeros_like(gsum), where=gcount > 0)[starts]
+    y = np.where(valid, values - center, 0.0)
+    zero = np.zeros(1)
+    n = np.concatenate([zero, np.cumsum(valid)])
+    s = np.concatenate([zero, np.cumsum(y)])
+    q = np.concatenate([zero, np.cumsum(y * y)])
+    return n, s, q, center
+
+
+def rolling_shifted(values, starts, windows_stats):
+    # Window for row i is rows [max(group start, i - w), i): the current row never sees itself.
+    n, s, q, center = _prefix_sums(values, starts)
+    idx = np.arange(len(values))
+    out = {}
+    for key, (w, fn, min_periods) in windows_stats.items():
+        lo = np.maximum(starts, idx - w)
+        cnt = n[idx] - n[lo]
+        tot = s[idx] - s[lo]
+        ok = cnt >= min_periods
+        safe = np.where(ok, cnt, 1.0)
+        if fn == "mean":
+            res = center + tot / safe
+        elif fn == "std":
+            sq = q[idx] - q[lo]
+            num = sq - tot * tot / safe
+            num = np.where(num < 1e-9 * np.maximum(sq, 1.0), 0.0, num)
+            res = np.sqrt(num / np.where(ok, cnt - 1.0, 1.0))
+        elif fn == "sum":
+            res = tot + center * cnt
+        elif fn == "count":
+            res = cnt.astype(float)
+        else:
+            raise ValueError(f"unknown rolling statistic: {fn}")
+        out[key] = np.where(ok, res, np.nan)
+    return out
+
+
+def rolling_features(df, group_col, specs, order=None):
+    # Rows must already be sorted by group then time: df itself, or df.iloc[order] when order is given.
+    codes = group_codes(df, [group_col] if isinstance(group_col, str) else group_col)
+    if order is not None:
+        codes = codes[order]
+    starts = _starts(codes)
+    missing_key = codes < 0
+    inverse = np.argsort(order) if order is not None else None
+    by_col = {}
+    for name, col, w, fn, min_periods in specs:
+        by_col.setdefault(col, {})[name] = (w, fn, min_periods)
+    cols = {}
+    for col, windows_stats in by_col.items():
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            res = rolling_shifted(values if order is None else values[order], starts, windows_stats)
+        else:
+            res = {name: np.full(len(df), np.nan) for name in windows_stats}
+        for name, arr in res.items():
+            arr[missing_key] = np.nan
+            if order is not None:
+                arr = arr[inverse]
+            cols[name] = arr
+    return pd.DataFrame({name: cols[name] for name, *_ in specs}, index=df.index)
+
+
+def grouped_rolling(df, groups):
+    """Rolling features for [(key columns, specs), ...] over a frame sorted by the first grouping's keys
+    then time. Later groupings extend that key (driver x track, ...) and reuse the time order: a stable
+    argsort of their integer key codes brings each group together without re-sorting the frame, and
+    every window and statistic of a grouping comes out of one prefix-sum pass."""
+    frames = []
+    for i, (cols, specs) in enumerate(groups):
+        order = None if i == 0 else np.argsort(group_codes(df, cols), kind="stable")
+        frames.append(rolling_features(df, cols, specs, order))
+    return pd.concat(frames, axis=1)
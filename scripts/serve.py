@@ -0,0 +1,267 @@
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts import h2h_predict, train_predict  # noqa: E402
+from scripts.storage import read_table, source_path  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
+H2H_ARTIFACTS = ["h2h_model.pkl", "h2h_imputer.pkl", "h2h_meta.json"]
+
+
+def _signature(paths):
+    sig = []
+    for p in paths:
+        st = p.stat() if p is not None and p.exists() else None
+        sig.append((str(p), st.st_mtime_ns, st.st_size) if st else None)
+    return tuple(sig)
+
+
+class ModelStore:
+    def __init__(self, model_dir=train_predict.MODEL_DIR, h2h_dir=h2h_predict.MODEL_DIR, featurized="data/featurized/data_featurized.csv", check_every=1.0):
+        self.model_dir = Path(model_dir)
+        self.h2h_dir = Path(h2h_dir)
+        self.featurized = featurized
+        self.check_every = check_every
+        self.lock = threading.Lock()
+        self.race = self.h2h = self.table = None
+        self.sigs = {}
+        self.checked = 0.0
+        self.reloads = 0
+        self.refresh(force=True)
+
+    def _reload(self, name, paths, loader):
+        sig = _signature(paths)
+        if self.sigs.get(name) == sig:
+            return False
+        try:
+            value = loader()
+        except FileNotFoundError as e:
+            print(f"[WARN] {e}")
+            value = None
+        setattr(self, name, value)
+        self.sigs[name] = sig
+        return True
+
+    def _load_table(self):
+        df = read_table(self.featurized, "featurized", columns=train_predict.model_columns(self.featurized))
+        return {key: g.reset_index(drop=True) for key, g in df.groupby(["year", "season_race_num"], sort=False)} if not df.empty else {}
+
+    def refresh(self, force=False):
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.checked < self.check_every:
+                return False
+            self.checked = now
+            changed = [
+                self._reload("race", [self.model_dir / n for n in train_predict.ARTIFACTS], lambda: train_predict.load_artifacts(self.model_dir)),
+                self._reload("h2h", [self.h2h_dir / n for n in H2H_ARTIFACTS], lambda: h2h_predict.load_artifacts(self.h2h_dir)),
+                self._reload("table", [source_path(self.featurized)], self._load_table),
+            ]
+            if any(changed):
+                self.reloads += 1
+                if not force:
+                    print(f"[OK] reloaded artifacts ({self.reloads})")
+            return any(changed)
+
+    def snapshot(self):
+        self.refresh()
+        with self.lock:
+            return self.race, self.h2h, self.table or {}
+
+
+class MicroBatcher:
+    def __init__(self, fn, max_batch=64, max_wait=0.005):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.q = queue.Queue()
+        self.batches = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, item):
+        fut = Future()
+        self.q.put((item, fut))
+        return fut
+
+    def _run(self):
+        while True:
+            batch = [self.q.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self.q.get(timeout=left))
+                except queue.Empty:
+                    break
+            self.batches += 1
+            try:
+                results = self.fn([item for item, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, fut), res in zip(batch, results):
+                if isinstance(res, Exception):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+
+
+class Predictor:
+    def __init__(self, store, max_batch=64, max_wait=0.005):
+        self.store = store
+        self.rank_batcher = MicroBatcher(self.rank_batch, max_batch, max_wait)
+        self.h2h_batcher = MicroBatcher(self.h2h_batch, max_batch, max_wait)
+
+    def rank_batch(self, items):
+        race_art, _, table = self.store.snapshot()
+        if race_art is None:
+            return [LookupError("no race models loaded; run train_predict.py --train")] * len(items)
+        keys = list(dict.fromkeys((it["year"], it["race"]) for it in items))
+        frames = [table[k] for k in keys if k in table]
+        scored = train_predict.score(pd.concat(frames, ignore_index=True), *race_art) if frames else pd.DataFrame()
+        by_race = {k: g for k, g in scored.groupby(["year", "season_race_num"], sort=False)} if frames else {}
+        out = []
+        for it in items:
+            sub = by_race.get((it["year"], it["race"]))
+            if sub is None:
+                out.append(LookupError(f"no rows for year={it['year']} race={it['race']}"))
+                continue
+            sub = sub.sort_values("pred_finish").head(it.get("top") or len(sub))
+            out.append(
+                {
+                    "year": it["year"],
+                    "race": it["race"],
+                    "drivers": [
+                        {"Driver": r.Driver, "pred_finish": float(r.pred_finish), "prob_top10": float(r.prob_top10), "prob_dnf": float(r.prob_dnf), "score": float(r.score)}
+                        for r in sub.itertuples()
+                    ],
+                }
+            )
+        return out
+
+    def h2h_batch(self, items):
+        _, h2h_art, table = self.store.snapshot()
+        if h2h_art is None:
+            return [LookupError("no h2h model loaded; run h2h_predict.py --train")] * len(items)
+        model, imp, feats = h2h_art
+        out, frames, slots = [None] * len(items), [], []
+        for i, it in enumerate(items):
+            sub = table.get((it["year"], it["race"]))
+            if sub is None:
+                out[i] = LookupError(f"no rows for year={it['year']} race={it['race']}")
+                continue
+            names = sub["Driver"].astype(str).str.lower()
+            a, b = np.flatnonzero(names == it["driver_a"].lower()), np.flatnonzero(names == it["driver_b"].lower())
+            if not len(a) or not len(b):
+                out[i] = LookupError("one or both drivers not found for race")
+                continue
+            frames.append(h2h_predict.pair_rows(sub, a[:1], b[:1], feats))
+            slots.append(i)
+        if frames:
+            probs = h2h_predict.pair_probs(pd.concat(frames, ignore_index=True), model, imp, feats)
+            for i, p in zip(slots, probs):
+                it = items[i]
+                out[i] = {"year": it["year"], "race": it["race"], "driver_a": it["driver_a"], "driver_b": it["driver_b"], "p_a_ahead": float(p), "p_b_ahead": float(1 - p)}
+        return out
+
+
+def _int(qs, name):
+    try:
+        return int(qs[name][0])
+    except (KeyError, ValueError):
+        raise ValueError(f"missing or invalid '{name}'") from None
+
+
+def make_handler(predictor, timeout=30.0):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            qs = parse_qs(url.query)
+            try:
+                if url.path == "/health":
+                    store = predictor.store
+                    store.refresh()
+                    self._send(200, {"race_model": store.race is not None, "h2h_model": store.h2h is not None, "races": len(store.table or {}), "reloads": store.reloads})
+                elif url.path == "/rank":
+                    item = {"year": _int(qs, "year"), "race": _int(qs, "race"), "top": int(qs.get("top", [0])[0])}
+                    self._send(200, predictor.rank_batcher.submit(item).result(timeout))
+                elif url.path == "/h2h":
+                    if "driver_a" not in qs or "driver_b" not in qs:
+                        raise ValueError("missing 'driver_a' or 'driver_b'")
+                    item = {"year": _int(qs, "year"), "race": _int(qs, "race"), "driver_a": qs["driver_a"][0], "driver_b": qs["driver_b"][0]}
+                    self._send(200, predictor.h2h_batcher.submit(item).result(timeout))
+                else:
+                    self._send(404, {"error": f"unknown path {url.path}"})
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+            except LookupError as e:
+                self._send(404, {"error": str(e)})
+            except Exception as e:
+                print(f"[ERROR] {self.path}: {e!r}")
+                self._send(500, {"error": repr(e)})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def make_server(host="127.0.0.1", port=8765, store=None, max_batch=64, max_wait=0.005):
+    predictor = Predictor(store or ModelStore(), max_batch, max_wait)
+    server = ThreadingHTTPServer((host, port), make_handler(predictor))
+    server.daemon_threads = True
+    server.predictor = predictor
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--featurized", default="data/featurized/data_featurized.csv")
+    ap.add_argument("--models", default=str(train_predict.MODEL_DIR))
+    ap.add_argument("--models_h2h", default=str(h2h_predict.MODEL_DIR))
+    ap.add_argument("--max_batch", type=int, default=64)
+    ap.add_argument("--max_wait_ms", type=float, default=5.0)
+    ap.add_argument("--reload_every", type=float, default=1.0, help="seconds between artifact mtime checks")
+    add_profile_arg(ap)
+    args = ap.parse_args()
+    setup_profile(args, "serve")
+
+    with stage("load") as st:
+        store = ModelStore(args.models, args.models_h2h, args.featurized, args.reload_every)
+        st["rows_out"] = sum(len(g) for g in (store.table or {}).values())
+    server = make_server(args.host, args.port, store, args.max_batch, args.max_wait_ms / 1000.0)
+    print(f"[OK] serving on http://{args.host}:{server.server_port} (GET /rank, /h2h, /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
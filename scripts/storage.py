@@ -0,0 +1,394 @@
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.errors import EmptyDataError
+
+from scripts.cli_args import add_csv_arg  # noqa: F401  re-exported; most scripts import it from here
+
+TEXT = "str"
+CAT = "category"
+INT = "int64"
+INT32 = "int32"
+INT16 = "int16"
+INT8 = "int8"
+NULL_INT16 = "Int16"
+NULL_INT8 = "Int8"
+FLOAT = "float64"
+FLOAT32 = "float32"
+DATE = "datetime64[ns]"
+
+# Compact dtypes: repeated labels are categoricals, keys/targets/flags small ints, model features
+# float32. Result columns that entries-only rows leave empty are always nullable, so a column's
+# dtype (and its row hashes) does not flip between runs as gaps come and go.
+_RACE_KEYS = {"sked_id": INT32, "year": INT16, "season_race_num": INT16}
+_RACE_LABELS = {
+    "race_date_text": TEXT,
+    "race_date": TEXT,
+    "track": CAT,
+    "race_name_raw": CAT,
+    "race_name": CAT,
+    "track_type": CAT,
+    "track_id": CAT,
+}
+_ENTRY = {"driver_id": CAT, "Driver": CAT, "team_id": CAT, "Team": CAT, "Make": CAT, "CarNumber": TEXT}
+_RESULT = {
+    "Start": NULL_INT16,
+    "Finish": NULL_INT16,
+    "Pts": NULL_INT16,
+    "Laps": NULL_INT16,
+    "Led": NULL_INT16,
+    "Status": CAT,
+    "source_name": CAT,
+    "source_rank": NULL_INT8,
+    "source_url": TEXT,
+}
+_QUAL = {"qual_speed": FLOAT, "pole_speed": FLOAT, "qual_round": CAT}
+
+SCHEMAS = {
+    "raw": {**_RACE_KEYS, **_RACE_LABELS, **_ENTRY, **_RESULT, **_QUAL},
+    "entries": {**_RACE_KEYS, **_RACE_LABELS, **_ENTRY, "Start": NULL_INT16},
+    "qualifying": {"sked_id": INT32, "driver_id": CAT, "Start": NULL_INT16, **_QUAL},
+    "race_meta": {
+        **_RACE_KEYS,
+        "rr_race_url": TEXT,
+        "laps_scheduled": FLOAT,
+        "distance_mi_scheduled": FLOAT,
+        "stage1_len": FLOAT,
+        "stage2_len": FLOAT,
+        "stage3_len": FLOAT,
+        "num_cars": FLOAT,
+        "cautions": FLOAT,
+        "caution_laps": FLOAT,
+        "scheduled_start_time_local": TEXT,
+    },
+    "weather": {
+        "sked_id": INT32,
+        "wx_temp_f": FLOAT,
+        "wx_wind_mph": FLOAT,
+        "wx_gust_mph": FLOAT,
+        "wx_precip_in": FLOAT,
+        "wx_precip_flag": FLOAT,
+        "wx_time_used": TEXT,
+        "wx_time_utc": TEXT,
+        "wx_source": TEXT,
+    },
+    "weather_cache": {
+        "source": TEXT,
+        "cell_lat": FLOAT,
+        "cell_lon": FLOAT,
+        "hour_utc": TEXT,
+        "wx_temp_f": FLOAT,
+        "wx_wind_mph": FLOAT,
+        "wx_gust_mph": FLOAT,
+        "wx_precip_in": FLOAT,
+    },
+    "track_meta": {
+        "track_id": TEXT,
+        "track_canonical": TEXT,
+        "rr_track_url": TEXT,
+        "track_length_mi": FLOAT,
+        "track_surface": TEXT,
+        "banking_turns_deg": FLOAT,
+        "banking_front_deg": FLOAT,
+        "banking_back_deg": FLOAT,
+        "layout_type": TEXT,
+        "track_lat": FLOAT,
+        "track_lon": FLOAT,
+        "track_timezone": TEXT,
+        "track_type": TEXT,
+    },
+    "dim": {
+        "driver_id": TEXT,
+        "team_id": TEXT,
+        "track_id": TEXT,
+        "Driver_canonical": TEXT,
+        "Team_canonical": TEXT,
+        "track_canonical": TEXT,
+        "alias_name": TEXT,
+        "match": TEXT,
+        "score": FLOAT,
+    },
+    "featurized": {
+        **_RACE_KEYS,
+        **_RACE_LABELS,
+        **_ENTRY,
+        **_RESULT,
+        **_QUAL,
+        "Start": FLOAT32,
+        "race_date": DATE,
+        "target_finish": FLOAT32,
+        "target_top10": INT8,
+        "target_top5": INT8,
+        "target_win": INT8,
+        "target_dnf": INT8,
+        "start_bucket": CAT,
+    },
+    "predictions": {
+        **_RACE_KEYS,
+        **_RACE_LABELS,
+        **_ENTRY,
+        "target_finish": FLOAT32,
+        "model_version": TEXT,
+        "feature_hash": TEXT,
+        "predicted_at": TEXT,
+    },
+    "h2h": {
+        **_RACE_KEYS,
+        "track_type": CAT,
+        "track_id": CAT,
+        "race_date": DATE,
+        "driver_a_id": CAT,
+        "driver_b_id": CAT,
+        "DriverA": CAT,
+        "DriverB": CAT,
+        "target_a_beats_b": INT8,
+        "target_finish_diff": FLOAT32,
+        "same_team_flag": INT8,
+        "same_make_flag": INT8,
+    },
+}
+
+PREFIX_DTYPES = {"featurized": {"drv_": FLOAT32}, "h2h": {"diff_": FLOAT32}, "predictions": {"pred_": FLOAT, "prob_": FLOAT, "sim_": FLOAT}}
+
+_HAVE_PARQUET = None
+
+
+def have_parquet():
+    global _HAVE_PARQUET
+    if _HAVE_PARQUET is None:
+        try:
+            import pyarrow.parquet  # noqa: F401
+
+            _HAVE_PARQUET = True
+        except ImportError:
+            print("[WARN] pyarrow missing; storage falls back to CSV")
+            _HAVE_PARQUET = False
+    return _HAVE_PARQUET
+
+
+def dtype_for(table, col):
+    schema = SCHEMAS.get(table, {})
+    if col in schema:
+        return schema[col]
+    for prefix, dtype in PREFIX_DTYPES.get(table, {}).items():
+        if col.startswith(prefix):
+            return dtype
+    return None
+
+
+def _is_int(dtype):
+    return dtype.lower().startswith("int")
+
+
+def _int(num, dtype):
+    vals = num.dropna()
+    info = np.iinfo(dtype.lower())
+    if not vals.empty and ((vals % 1 != 0).any() or vals.min() < info.min or vals.max() > info.max):
+        # Fractional or out-of-range values: keep them rather than truncate or wrap.
+        return num.astype(FLOAT)
+    return num.astype(dtype.capitalize()) if num.isna().any() else num.astype(dtype)
+
+
+def _matches(current, dtype):
+    # A plain int column that turns out to have gaps is stored as its nullable twin.
+    current = str(current)
+    return current == dtype or (_is_int(dtype) and current == dtype.capitalize())
+
+
+def _cast(s, dtype):
+    if dtype == TEXT:
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.astype(object)
+        return s.where(s.isna(), s.astype(str))
+    if dtype == CAT:
+        if not isinstance(s.dtype, pd.CategoricalDtype):
+            s = _cast(s, TEXT).astype(CAT)
+        s = s.cat.remove_unused_categories().cat.as_unordered()
+        # Sorted categories keep sort order and frame equality independent of how the frame was built.
+        return s.cat.reorder_categories(sorted(s.cat.categories))
+    if dtype == DATE:
+        return pd.to_datetime(s, errors="coerce")
+    num = pd.to_numeric(s, errors="coerce")
+    if _is_int(dtype):
+        return _int(num, dtype)
+    return num.astype(dtype)
+
+
+def apply_schema(df, table):
+    if table is None or df.empty:
+        return df
+    df = df.copy()
+    for col in df.columns:
+        dtype = dtype_for(table, col)
+        if dtype is not None and (dtype == CAT or not _matches(df[col].dtype, dtype)):
+            df[col] = _cast(df[col], dtype)
+    return df
+
+
+def concat_tables(frames, **kwargs):
+    """pd.concat that keeps shared categorical columns categorical; plain concat falls back to
+    object strings as soon as two frames have different category sets."""
+    frames = list(frames)
+    shared = set.intersection(*(set(f.columns) for f in frames)) if frames else set()
+    for col in shared:
+        if all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+            cats = sorted(set().union(*(f[col].cat.categories for f in frames)))
+            frames = [f.assign(**{col: f[col].cat.set_categories(cats)}) for f in frames]
+    return pd.concat(frames, **kwargs)
+
+
+def _paths(path):
+    p = Path(path)
+    return p.with_suffix(".parquet"), p.with_suffix(".csv")
+
+
+_STALE_WARNED = set()
+
+
+def source_path(path):
+    # write_table always writes Parquet when it can, so the Parquet file is the
+    # table; a CSV next to it is only an export. A CSV edited after the Parquet
+    # was written is reported rather than silently preferred.
+    pq_path, csv_path = _paths(path)
+    if have_parquet() and pq_path.exists():
+        if csv_path.exists() and csv_path.stat().st_mtime > pq_path.stat().st_mtime and pq_path not in _STALE_WARNED:
+            _STALE_WARNED.add(pq_path)
+            print(f"[WARN] {csv_path} is newer than {pq_path}; reading the Parquet file")
+        return pq_path
+    return csv_path if csv_path.exists() else None
+
+
+def exists(path):
+    return source_path(path) is not None
+
+
+def table_columns(path):
+    src = source_path(path)
+    if src is None:
+        return []
+    if src.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(src).names)
+    try:
+        return list(pd.read_csv(src, nrows=0).columns)
+    except EmptyDataError:
+        return []
+
+
+_OPS = {
+    "==": lambda s, v: s == v,
+    "=": lambda s, v: s == v,
+    "!=": lambda s, v: s != v,
+    "<": lambda s, v: s < v,
+    "<=": lambda s, v: s <= v,
+    ">": lambda s, v: s > v,
+    ">=": lambda s, v: s >= v,
+    "in": lambda s, v: s.isin(list(v)),
+    "not in": lambda s, v: ~s.isin(list(v)),
+}
+
+
+def filter_frame(df, filters):
+    if not filters or df.empty:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        if col in df.columns:
+            mask &= _OPS[op](df[col], value).fillna(False).astype(bool)
+    return df[mask]
+
+
+def _csv_usecols(cols, filters):
+    # CSV has no predicate pushdown, so filter columns are read alongside the
+    # projection and dropped again once the rows are filtered.
+    if cols is None:
+        return None
+    return cols + [f[0] for f in filters if f[0] not in cols]
+
+
+def read_table(path, table=None, columns=None, filters=None):
+    src = source_path(path)
+    if src is None:
+        return pd.DataFrame(columns=columns or [])
+    available = table_columns(src)
+    cols = [c for c in columns if c in available] if columns is not None else None
+    filters = [f for f in (filters or []) if f[0] in available]
+    if src.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        df = pq.read_table(src, columns=cols, filters=filters or None).to_pandas()
+    else:
+        usecols = _csv_usecols(cols, filters)
+        dtypes = {c: str for c in (usecols or available) if dtype_for(table, c) in (TEXT, CAT)}
+        try:
+            df = pd.read_csv(src, usecols=usecols, dtype=dtypes)
+        except EmptyDataError:
+            print(f"[WARN] {src} is empty; skipping")
+            return pd.DataFrame(columns=columns or [])
+        df = filter_frame(df, filters)
+        df = df if cols is None else df[cols]
+    return apply_schema(df.reset_index(drop=True), table)
+
+
+def iter_table(path, table=None, columns=None, filters=None, chunk_rows=100_000):
+    """read_table in chunks of about `chunk_rows` rows, so a pass over a large table holds one chunk at a time."""
+    src = source_path(path)
+    if src is None:
+        return
+    available = table_columns(src)
+    cols = [c for c in columns if c in available] if columns is not None else None
+    filters = [f for f in (filters or []) if f[0] in available]
+    if src.suffix == ".parquet":
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        expr = pq.filters_to_expression(filters) if filters else None
+        for batch in ds.dataset(src, format="parquet").to_batches(columns=cols, filter=expr, batch_size=chunk_rows):
+            if batch.num_rows:
+                yield apply_schema(batch.to_pandas(), table)
+        return
+    dtypes = {c: str for c in (cols or available) if dtype_for(table, c) in (TEXT, CAT)}
+    try:
+        for chunk in pd.read_csv(src, usecols=cols, dtype=dtypes, chunksize=chunk_rows):
+            chunk = filter_frame(chunk, filters)
+            if not chunk.empty:
+                yield apply_schema(chunk.reset_index(drop=True), table)
+    except EmptyDataError:
+        print(f"[WARN] {src} is empty; skipping")
+
+
+def write_table(df, path, table=None, csv=False):
+    pq_path, csv_path = _paths(path)
+    pq_path.parent.mkdir(parents=True, exist_ok=True)
+    df = apply_schema(df, table)
+    wrote = []
+    # CSV first so the Parquet file is the newer of the two and wins on read.
+    if csv or not have_parquet():
+        df.to_csv(csv_path, index=False)
+        wrote.append(csv_path)
+    if have_parquet():
+        tmp = pq_path.with_suffix(".parquet.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, pq_path)
+        wrote.append(pq_path)
+    return wrote
+
+
+def frame_hash(df):
+    h = hashlib.sha256("|".join(map(str, df.columns)).encode("utf-8"))
+    if not df.empty:
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def group_hashes(df, key):
+    if df.empty or key not in df.columns:
+        return pd.Series(dtype="uint64")
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy(dtype="uint64")
+    pos = df.groupby(key, sort=False).cumcount().to_numpy(dtype="uint64") + np.uint64(1)
+    # Position-weighted sum keeps the hash sensitive to row order, which keep="last" de-dupes depend on.
+    return pd.Series(rows * pos, index=df[key].to_numpy()).groupby(level=0).sum()
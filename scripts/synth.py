@@ -0,0 +1,138 @@
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.html_cache import HtmlCache  # noqa: E402
+from scripts.results_store import RESULTS_ROOT, ResultsStore  # noqa: E402
+from scripts.storage import add_csv_arg  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
+MAKES = ["Chevrolet", "Ford", "Toyota"]
+TRACK_TYPES = ["intermediate_1p5", "short", "superspeedway", "road", "intermediate_2m"]
+DNF_STATUS = np.array(["Accident", "Engine", "DNF"])
+PAGE_HEAD = "<tr><th>Driver</th><th>Start</th><th>Finish</th><th>Car #</th><th>Pts</th><th>Laps</th><th>Led</th><th>Status</th><th>Team</th><th>Make</th></tr>"
+
+
+def _rank(values):
+    return values.argsort(axis=1).argsort(axis=1) + 1
+
+
+def generate_results(seasons=1, races=36, field=40, turnover=0.1, dnf_rate=0.08, teams=16, tracks=24, laps=267, start_year=2000, seed=0):
+    """Multi-season results in the raw schema. Each car slot keeps its team; every season a
+    `turnover` share of slots gets a new driver. Finish order follows latent skill plus noise,
+    with DNFs classified behind running cars."""
+    rng = np.random.default_rng(seed)
+    names = np.array([f"Driver {i:04d}" for i in range(field)], dtype=object)
+    skill = rng.normal(0, 1, field)
+    next_id = field
+    slot_team = np.arange(field) % teams
+    frames = []
+    for s in range(seasons):
+        year = start_year + s
+        if s:
+            out = rng.choice(field, rng.binomial(field, turnover), replace=False)
+            names[out] = [f"Driver {next_id + k:04d}" for k in range(len(out))]
+            skill[out] = rng.normal(-0.3, 1, len(out))
+            next_id += len(out)
+        pace = skill + rng.normal(0, 1.2, (races, field))
+        dnf = rng.random((races, field)) < dnf_rate
+        laps_done = np.where(dnf, rng.integers(1, laps, (races, field)), laps)
+        finish = _rank(np.where(dnf, 1e6 - laps_done, -pace))
+        start = _rank(-(skill + rng.normal(0, 1.0, (races, field))))
+        race = np.arange(1, races + 1)
+        date = pd.Timestamp(f"{year}-02-15") + pd.to_timedelta((race - 1) * 7, unit="D")
+        track = (race - 1) % tracks
+        frames.append(pd.DataFrame({
+            "sked_id": np.repeat(year * 100 + race, field),
+            "year": year,
+            "season_race_num": np.repeat(race, field),
+            "race_date_text": np.repeat(date.strftime("%Y-%m-%d"), field),
+            "race_date": np.repeat(date.strftime("%Y-%m-%d"), field),
+            "track": np.repeat([f"Track {t + 1}" for t in track], field),
+            "race_name_raw": np.repeat([f"Race {r}" for r in race], field),
+            "race_name": np.repeat([f"Race {r}" for r in race], field),
+            "track_type": np.repeat([TRACK_TYPES[t % len(TRACK_TYPES)] for t in track], field),
+            "Driver": np.tile(names, races),
+            "Team": np.tile([f"Team {t + 1}" for t in slot_team], races),
+            "Make": np.tile([MAKES[t % len(MAKES)] for t in slot_team], races),
+            "CarNumber": np.tile([str(i + 1) for i in range(field)], races),
+            "Start": start.ravel(),
+            "Finish": finish.ravel(),
+            "Pts": np.maximum(1, field + 1 - finish).ravel(),
+            "Laps": laps_done.ravel(),
+            "Led": np.where(finish <= 5, rng.integers(0, 60, (races, field)), rng.integers(0, 3, (races, field))).ravel(),
+            "Status": np.where(dnf, DNF_STATUS[rng.integers(0, len(DNF_STATUS), (races, field))], "Running").ravel(),
+            "source_name": "synthetic",
+            "source_rank": 99,
+            "source_url": "local://synthetic",
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def generate_sources(results, seed=0):
+    """Entries and qualifying tables matching the results, keyed like build_dataset.load_sources()."""
+    rng = np.random.default_rng(seed)
+    driver_id = results["Driver"].astype(str).str.lower().str.replace(" ", "_", regex=False)
+    entries = results[["sked_id", "year", "season_race_num", "race_date_text", "race_date", "track", "race_name_raw", "race_name", "track_type", "Driver", "Team", "Make", "CarNumber"]].copy()
+    entries["driver_id"] = driver_id
+    qual = pd.DataFrame({"sked_id": results["sked_id"], "driver_id": driver_id, "Start": results["Start"]})
+    qual["qual_speed"] = 180 - qual["Start"] * 0.15 + rng.normal(0, 0.05, len(qual))
+    qual["pole_speed"] = qual.groupby("sked_id")["qual_speed"].transform("max")
+    qual["qual_round"] = "final"
+    empty = pd.DataFrame()
+    return {"results": results, "entries": entries, "qualifying": qual, "race_meta": empty, "weather": empty, "track_meta": empty}
+
+
+def render_page(race):
+    """One race as a driveraverages.com results page (same layout parse_driveraverages_html reads)."""
+    first = race.iloc[0]
+    cols = ["Driver", "Start", "Finish", "CarNumber", "Pts", "Laps", "Led", "Status", "Team", "Make"]
+    body = "".join("<tr>" + "".join(f"<td>{v}</td>" for v in row) + "</tr>" for row in race[cols].itertuples(index=False))
+    return f"<html><body><h1>Race {first['season_race_num']} of {first['year']}</h1><table>{PAGE_HEAD}{body}</table></body></html>"
+
+
+def render_pages(results):
+    return {int(sked_id): render_page(race) for sked_id, race in results.groupby("sked_id", sort=True)}
+
+
+def write_cache(results, root):
+    cache = HtmlCache(root)
+    for sked_id, html in render_pages(results).items():
+        cache.put(sked_id, html)
+    cache.save()
+    return cache
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seasons", type=int, default=3)
+    ap.add_argument("--races", type=int, default=36)
+    ap.add_argument("--field", type=int, default=40)
+    ap.add_argument("--turnover", type=float, default=0.1, help="share of car slots that get a new driver each season")
+    ap.add_argument("--dnf_rate", type=float, default=0.08)
+    ap.add_argument("--start_year", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--store", default=RESULTS_ROOT, help="results store the generated races are written into")
+    ap.add_argument("--cache_dir", help="also write driveraverages pages here (e.g. cache/html/driveraverages for get_results --offline)")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
+    args = ap.parse_args()
+    setup_profile(args, "synth")
+
+    with stage("generate") as st:
+        df = generate_results(args.seasons, args.races, args.field, args.turnover, args.dnf_rate, start_year=args.start_year, seed=args.seed)
+        st["rows_out"] = df
+    changed = ResultsStore(args.store, csv=args.csv).write_frame(df)
+    print(f"[OK] wrote {changed} races to {args.store} rows={len(df)} drivers={df['Driver'].nunique()}")
+    if args.cache_dir:
+        write_cache(df, args.cache_dir)
+        print(f"[OK] wrote {df['sked_id'].nunique()} pages to {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
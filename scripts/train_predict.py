@@ -1,37 +1,70 @@
 import argparse
+import hashlib
 import json
+import sys
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LogisticRegression
-from sklearn.dummy import DummyClassifier
-from sklearn.impute import SimpleImputer
-from sklearn.metrics import mean_absolute_error, roc_auc_score, brier_score_loss
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-def choose_models():
+from scripts.storage import add_csv_arg, concat_tables, filter_frame, group_hashes, read_table, table_columns, write_table  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
+ID_COLS = ["sked_id", "year", "season_race_num", "race_date", "driver_id", "Driver", "Team", "Make", "CarNumber", "track", "track_type"]
+TARGET_COLS = ["target_finish", "target_top10", "target_dnf"]
+MODEL_DIR = Path("models")
+TUNED_PARAMS = "tuned_params.json"
+ARTIFACTS = ["finish_model.pkl", "top10_model.pkl", "dnf_model.pkl", "imputer.pkl", "feature_cols.json"]
+PRED_COLS = ["pred_finish", "prob_top10", "prob_dnf", "score"]
+PRED_ROOT = "data/predictions"
+
+
+def model_columns(path):
+    return [c for c in table_columns(path) if c in ID_COLS or c in TARGET_COLS or c.startswith("drv_") or c in ["Start", "qual_speed"]]
+
+
+def tuned_params(model_dir=MODEL_DIR):
+    path = Path(model_dir) / TUNED_PARAMS
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+def have_catboost():
     try:
-        from catboost import CatBoostRegressor, CatBoostClassifier  # type: ignore
-        print("[OK] using CatBoost")
-        return (
-            CatBoostRegressor(verbose=False, depth=6, iterations=200),
-            CatBoostClassifier(verbose=False, depth=6, iterations=200),
-            CatBoostClassifier(verbose=False, depth=6, iterations=200),
-            "catboost",
-        )
+        import catboost  # type: ignore  # noqa: F401
+        return True
     except Exception:
-        print("[WARN] CatBoost missing; using scikit fallback")
-        return (
-            RandomForestRegressor(n_estimators=200, random_state=42),
-            LogisticRegression(max_iter=1000),
-            LogisticRegression(max_iter=1000),
-            "scikit",
-        )
+        return False
+
+
+def make_model(family, target, params=None):
+    params = params or {}
+    if family == "catboost":
+        from catboost import CatBoostRegressor, CatBoostClassifier  # type: ignore
+        cls = CatBoostRegressor if target == "finish" else CatBoostClassifier
+        return cls(verbose=False, **{"depth": 6, "iterations": 200, **params})
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import LogisticRegression
+
+    if target == "finish":
+        return RandomForestRegressor(**{"n_estimators": 200, "random_state": 42, **params})
+    return LogisticRegression(**{"max_iter": 1000, **params})
+
+
+def choose_models(verbose=True, model_dir=MODEL_DIR):
+    family = "catboost" if have_catboost() else "scikit"
+    if verbose:
+        print("[OK] using CatBoost" if family == "catboost" else "[WARN] CatBoost missing; using scikit fallback")
+    tuned = tuned_params(model_dir).get(family, {})
+    if verbose and tuned:
+        print(f"[OK] using tuned params from {Path(model_dir) / TUNED_PARAMS}")
+    return tuple(make_model(family, t, tuned.get(t)) for t in ("finish", "top10", "dnf")) + (family,)
 
 
 def prep(df):
+    from sklearn.impute import SimpleImputer
+
     features = [c for c in df.columns if c.startswith("drv_") or c in ["Start", "qual_speed"]]
     X = df[features].apply(pd.to_numeric, errors="coerce")
     all_missing = [c for c in X.columns if X[c].notna().sum() == 0]
@@ -47,6 +80,8 @@ def prep(df):
 
 
 def fit_binary_model(model, X, y, label):
+    from sklearn.dummy import DummyClassifier
+
     unique = pd.Series(y).dropna().unique()
     if len(unique) < 2:
         constant = int(unique[0]) if len(unique) else 0
@@ -66,23 +101,122 @@ def prob_of_one(model, X):
     return np.zeros(len(X), dtype=float)
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--infile", default="data/featurized/data_featurized.csv")
-    ap.add_argument("--train", action="store_true")
-    ap.add_argument("--predict", action="store_true")
-    ap.add_argument("--predict_future", action="store_true")
-    ap.add_argument("--compare_actual", action="store_true")
-    ap.add_argument("--year", type=int)
-    ap.add_argument("--race", type=int)
-    ap.add_argument("--top", type=int, default=20)
-    ap.add_argument("--save_csv", default=None)
-    args = ap.parse_args()
+def save_artifacts(reg, clf_top10, clf_dnf, imp, family, feats, model_dir=MODEL_DIR):
+    import joblib
+
+    model_dir = Path(model_dir)
+    model_dir.mkdir(exist_ok=True)
+    joblib.dump(reg, model_dir / "finish_model.pkl")
+    joblib.dump(clf_top10, model_dir / "top10_model.pkl")
+    joblib.dump(clf_dnf, model_dir / "dnf_model.pkl")
+    joblib.dump(imp, model_dir / "imputer.pkl")
+    (model_dir / "meta.json").write_text(json.dumps({"family": family}, indent=2), encoding="utf-8")
+    (model_dir / "feature_cols.json").write_text(json.dumps(feats, indent=2), encoding="utf-8")
+
+
+def have_artifacts(model_dir=MODEL_DIR):
+    return all((Path(model_dir) / name).exists() for name in ARTIFACTS)
+
+
+def load_artifacts(model_dir=MODEL_DIR):
+    import joblib
+
+    model_dir = Path(model_dir)
+    if not have_artifacts(model_dir):
+        raise FileNotFoundError(f"missing model artifacts in {model_dir}; run train_predict.py --train first")
+    reg, clf_top10, clf_dnf, imp = (joblib.load(model_dir / name) for name in ARTIFACTS[:4])
+    feats = json.loads((model_dir / "feature_cols.json").read_text(encoding="utf-8"))
+    return reg, clf_top10, clf_dnf, imp, feats
+
 
-    Path("models").mkdir(exist_ok=True)
-    df = pd.read_csv(args.infile)
-    df["race_date"] = pd.to_datetime(df["race_date"], errors="coerce")
-    df = df.sort_values(["race_date", "year", "season_race_num"])
+def score(sub, reg, clf_top10, clf_dnf, imp, feats):
+    sub = sub.copy()
+    Xs = imp.transform(sub.reindex(columns=feats).apply(pd.to_numeric, errors="coerce"))
+    sub["pred_finish"] = reg.predict(Xs)
+    sub["prob_top10"] = prob_of_one(clf_top10, Xs)
+    sub["prob_dnf"] = prob_of_one(clf_dnf, Xs)
+    sub["score"] = sub["prob_top10"] - sub["prob_dnf"]
+    return sub
+
+
+def parse_races(spec):
+    """"1-10,12" -> [1, ..., 10, 12]."""
+    out = []
+    for part in (spec or "").split(","):
+        lo, _, hi = part.strip().partition("-")
+        if lo:
+            out += list(range(int(lo), int(hi or lo) + 1))
+    return out
+
+
+def target_filters(year=None, race=None, races=None, season=None, sked_ids=None):
+    """One storage filter selecting every target race, or None when no race was asked for."""
+    if sked_ids:
+        return [("sked_id", "in", sked_ids)]
+    if season is not None:
+        return [("year", "==", season)]
+    if year is not None and races:
+        return [("year", "==", year), ("season_race_num", "in", races)]
+    if year is not None and race is not None:
+        return [("year", "==", year), ("season_race_num", "==", race)]
+    return None
+
+
+def read_races(path, filters):
+    return read_table(path, "featurized", columns=model_columns(path), filters=filters)
+
+
+def model_version(model_dir=MODEL_DIR):
+    h = hashlib.sha1()
+    for name in ARTIFACTS:
+        h.update((Path(model_dir) / name).read_bytes())
+    return h.hexdigest()[:12]
+
+
+def predict_batch(rows, artifacts, version):
+    """Score every target race in one matrix call; tag rows with the model version and a per-race hash
+    of the feature rows they were scored from."""
+    sub = score(rows, *artifacts)
+    feats = artifacts[4]
+    hashes = group_hashes(rows[[c for c in ["sked_id", "driver_id", *feats] if c in rows.columns]], "sked_id")
+    sub["model_version"] = version
+    sub["feature_hash"] = sub["sked_id"].map(hashes).map(lambda h: f"{int(h):016x}")
+    sub["predicted_at"] = pd.Timestamp.now(tz="UTC").isoformat(timespec="seconds")
+    if "race_date" in sub.columns:
+        sub["race_date"] = pd.to_datetime(sub["race_date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    return sub
+
+
+def prediction_path(root, year, sked_id):
+    # Laid out like the results store; write_table picks .parquet (or .csv without pyarrow).
+    return Path(root) / f"year={int(year)}" / f"sked_id={int(sked_id)}"
+
+
+def write_predictions(sub, root=PRED_ROOT, csv=False):
+    """Write one file per scored race under `root`; other races' files are left untouched."""
+    cols = [c for c in ID_COLS + ["target_finish"] if c in sub.columns] + [c for c in sub.columns if c in PRED_COLS or c.startswith("sim_")]
+    cols += ["model_version", "feature_hash", "predicted_at"]
+    paths = []
+    for sked_id, g in sub[cols].groupby("sked_id", sort=False):
+        year = g["year"].iloc[0] if "year" in g.columns else int(sked_id) // 100
+        path = prediction_path(root, year, sked_id)
+        write_table(g.sort_values("pred_finish", kind="stable"), path, "predictions", csv=csv)
+        paths.append(path)
+    return paths
+
+
+def read_predictions(root=PRED_ROOT, filters=None):
+    """Every stored race's predictions in race order; an empty frame when nothing was written yet."""
+    stems = sorted({p.with_suffix("") for p in Path(root).glob("year=*/sked_id=*.*")})
+    frames = [read_table(p, "predictions", filters=filters) for p in stems]
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    return concat_tables(frames, ignore_index=True, sort=False).sort_values(["race_date", "sked_id", "pred_finish"], kind="stable", ignore_index=True)
+
+
+def train_models(df):
+    from sklearn.metrics import mean_absolute_error, roc_auc_score, brier_score_loss
 
     reg, clf_top10, clf_dnf, family = choose_models()
     train_df = df[df["target_finish"].notna()].copy()
@@ -95,51 +229,123 @@ def main():
     Xtr, feats, imp = prep(tr)
     Xte = imp.transform(te[feats].apply(pd.to_numeric, errors="coerce"))
 
-    reg.fit(Xtr, tr["target_finish"])
-    clf_top10 = fit_binary_model(clf_top10, Xtr, tr["target_top10"], "target_top10")
-    clf_dnf = fit_binary_model(clf_dnf, Xtr, tr["target_dnf"], "target_dnf")
+    with stage("fit", tr):
+        reg.fit(Xtr, tr["target_finish"])
+        clf_top10 = fit_binary_model(clf_top10, Xtr, tr["target_top10"], "target_top10")
+        clf_dnf = fit_binary_model(clf_dnf, Xtr, tr["target_dnf"], "target_dnf")
 
     pred_finish = reg.predict(Xte)
     prob_top10 = prob_of_one(clf_top10, Xte)
-    prob_dnf = prob_of_one(clf_dnf, Xte)
     print(f"MAE={mean_absolute_error(te['target_finish'], pred_finish):.3f}")
     if len(np.unique(te["target_top10"])) > 1:
         print(f"AUC_top10={roc_auc_score(te['target_top10'], prob_top10):.3f} Brier={brier_score_loss(te['target_top10'], prob_top10):.3f}")
+    return (reg, clf_top10, clf_dnf, imp, feats), family
 
-    if args.train:
-        import joblib
 
-        joblib.dump(reg, "models/finish_model.pkl")
-        joblib.dump(clf_top10, "models/top10_model.pkl")
-        joblib.dump(clf_dnf, "models/dnf_model.pkl")
-        Path("models/meta.json").write_text(json.dumps({"family": family}, indent=2), encoding="utf-8")
-        Path("models/feature_cols.json").write_text(json.dumps(feats, indent=2), encoding="utf-8")
-        print("[OK] models saved to models/")
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--infile", default="data/featurized/data_featurized.csv")
+    ap.add_argument("--train", action="store_true")
+    ap.add_argument("--predict", action="store_true")
+    ap.add_argument("--predict_future", action="store_true")
+    ap.add_argument("--compare_actual", action="store_true")
+    ap.add_argument("--retrain", action="store_true", help="refit before predicting instead of loading models/")
+    ap.add_argument("--year", type=int)
+    ap.add_argument("--race", type=int)
+    ap.add_argument("--races", default=None, help="batch: race numbers of --year, e.g. 1-10,12")
+    ap.add_argument("--season", type=int, default=None, help="batch: every race of a season")
+    ap.add_argument("--sked_ids", default=None, help="batch: comma-separated sked_ids")
+    ap.add_argument("--pred_dir", default=PRED_ROOT, help="batch output: one file per race, replaced race by race")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--save_csv", default=None)
+    ap.add_argument("--simulate", type=int, default=0, metavar="N", help="with --predict, simulate N finishing orders (e.g. 100000)")
+    ap.add_argument("--sim_scale", type=float, default=None, help="finish-position noise; fitted to prob_top10 when omitted")
+    ap.add_argument("--sim_workers", type=int, default=None, help="threads for simulation chunks (default: all cores)")
+    ap.add_argument("--sim_mem_mb", type=int, default=256, help="memory budget for simulation chunks in flight")
+    ap.add_argument("--sim_h2h_csv", default=None, help="write the field's P(row finishes ahead of column)")
+    add_csv_arg(ap)
+    add_profile_arg(ap)
+    args = ap.parse_args()
+    setup_profile(args, "train_predict")
+    if args.season is not None and (args.year is not None or args.race is not None or args.races or args.sked_ids):
+        ap.error("--season selects a whole season; drop --year/--race/--races/--sked_ids")
+    if args.sked_ids and (args.year is not None or args.race is not None or args.races):
+        ap.error("--sked_ids cannot be combined with --year/--race/--races")
+    if args.races and (args.year is None or args.race is not None):
+        ap.error("--races needs --year and replaces --race")
+    sked_ids = [int(s) for s in args.sked_ids.split(",") if s.strip()] if args.sked_ids else None
+    batch = bool(args.races or sked_ids) or args.season is not None
+    filters = target_filters(args.year, args.race, parse_races(args.races), args.season, sked_ids)
+
+    if args.train or args.retrain or not have_artifacts():
+        if not args.train and not args.retrain:
+            print(f"[WARN] no saved models in {MODEL_DIR}/; training before predicting (run --train once to skip this)")
+        with stage("read") as st:
+            df = read_table(args.infile, "featurized", columns=model_columns(args.infile))
+            st["rows_out"] = df
+        df["race_date"] = pd.to_datetime(df["race_date"], errors="coerce")
+        df = df.sort_values(["race_date", "year", "season_race_num"])
+        artifacts, family = train_models(df)
+        if args.train:
+            save_artifacts(*artifacts[:4], family, artifacts[4])
+            print(f"[OK] models saved to {MODEL_DIR}/")
+        race = filter_frame(df, filters) if filters else df.iloc[0:0]
+    else:
+        artifacts = load_artifacts()
+        race = read_races(args.infile, filters) if filters else pd.DataFrame()
 
-    if args.predict or args.predict_future:
-        sub = df[(df["year"] == args.year) & (df["season_race_num"] == args.race)].copy()
-        if sub.empty:
+    if batch:
+        if race.empty:
+            print(f"[WARN] no rows match {filters}")
+            return
+        version = model_version() if have_artifacts() and (args.train or not args.retrain) else "unsaved"
+        with stage("predict", race) as st:
+            sub = predict_batch(race, artifacts, version)
+            st["rows_out"] = sub
+        if args.simulate > 0:
+            from scripts.race_sim import simulate_race
+
+            with stage("simulate", sub) as st:
+                sub = concat_tables([simulate_race(g, args.simulate, args.sim_scale, workers=args.sim_workers, mem_mb=args.sim_mem_mb)[0] for _, g in sub.groupby("sked_id", sort=False)], ignore_index=True)
+                st["rows_out"] = sub
+        for sked_id, g in sub.groupby("sked_id", sort=False):
+            best = g.sort_values("pred_finish").iloc[0]
+            print(f"[OK] {sked_id}: {len(g)} drivers; best pred_finish {best.get('Driver', best.get('driver_id'))} ({best['pred_finish']:.1f})")
+        paths = write_predictions(sub, args.pred_dir, csv=args.csv)
+        print(f"[OK] wrote {len(paths)} races to {args.pred_dir} (model {version})")
+    elif args.predict or args.predict_future:
+        if race.empty:
             print(f"No rows found for year={args.year} race={args.race}. Run get_entries/build_dataset first.")
             return
-        Xs = imp.transform(sub[feats].apply(pd.to_numeric, errors="coerce"))
-        sub["pred_finish"] = reg.predict(Xs)
-        sub["prob_top10"] = prob_of_one(clf_top10, Xs)
-        sub["prob_dnf"] = prob_of_one(clf_dnf, Xs)
-        sub["score"] = sub["prob_top10"] - sub["prob_dnf"]
+        with stage("predict", race) as st:
+            sub = score(race, *artifacts)
+            st["rows_out"] = sub
         print("\nBest predicted finish")
         print(sub.sort_values("pred_finish")[["Driver", "pred_finish", "prob_top10", "prob_dnf"]].head(args.top).to_string(index=False))
         print("\nBest prob_top10 - prob_dnf")
         print(sub.sort_values("score", ascending=False)[["Driver", "score", "prob_top10", "prob_dnf"]].head(args.top).to_string(index=False))
+        if args.simulate > 0:
+            from scripts.race_sim import simulate_race
+
+            with stage("simulate", sub) as st:
+                sub, h2h = simulate_race(sub, args.simulate, args.sim_scale, workers=args.sim_workers, mem_mb=args.sim_mem_mb)
+                st["rows_out"] = sub
+            print(f"\nSimulated finishing distribution ({args.simulate} races)")
+            print(sub.sort_values("sim_exp_finish")[["Driver", "sim_win", "sim_top5", "sim_top10", "sim_top20", "sim_exp_finish", "sim_dnf"]].head(args.top).to_string(index=False))
+            if args.sim_h2h_csv:
+                h2h.to_csv(args.sim_h2h_csv)
+                print(f"[OK] wrote {args.sim_h2h_csv}")
         if args.save_csv:
             sub.to_csv(args.save_csv, index=False)
 
     if args.compare_actual:
-        sub = train_df[(train_df["year"] == args.year) & (train_df["season_race_num"] == args.race)].copy()
-        if sub.empty:
+        actual = race[race["target_finish"].notna()] if "target_finish" in race.columns else race.iloc[0:0]
+        if actual.empty:
             print("[WARN] no actual rows for compare")
             return
-        Xs = imp.transform(sub[feats].apply(pd.to_numeric, errors="coerce"))
-        sub["pred_finish"] = reg.predict(Xs)
+        from sklearn.metrics import mean_absolute_error
+
+        sub = score(actual, *artifacts)
         print(f"Actual comparison MAE={mean_absolute_error(sub['target_finish'], sub['pred_finish']):.3f}")
 
 
@@ -0,0 +1,222 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error, brier_score_loss
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts import h2h_predict, train_predict  # noqa: E402
+from scripts.backtest import build_matrix, impute_split  # noqa: E402
+from scripts.storage import read_table, table_columns  # noqa: E402
+from scripts.train_predict import fit_binary_model, have_catboost, make_model, prob_of_one  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
+TARGETS = ["finish", "top10", "dnf"]
+DEFAULT_SPACE = {
+    "catboost": {
+        "finish": {"depth": [4, 6, 8], "iterations": [200, 400], "learning_rate": [0.03, 0.1]},
+        "top10": {"depth": [4, 6, 8], "iterations": [200, 400], "learning_rate": [0.03, 0.1]},
+        "dnf": {"depth": [4, 6], "iterations": [200, 400], "l2_leaf_reg": [3, 10]},
+        "h2h": {"depth": [4, 6, 8], "iterations": [200, 400]},
+    },
+    "scikit": {
+        "finish": {"n_estimators": [100, 200, 400], "max_depth": [None, 8, 16], "min_samples_leaf": [1, 5, 20]},
+        "top10": {"C": [0.01, 0.1, 1.0, 10.0]},
+        "dnf": {"C": [0.01, 0.1, 1.0, 10.0]},
+        "h2h": {"C": [0.01, 0.1, 1.0, 10.0]},
+    },
+}
+
+# Set once per worker process by _init_worker so trials share one copy of the feature matrix.
+_SHARED = {}
+
+
+def time_folds(n_races, n_folds):
+    # Expanding window: fold k trains on every race before lo and validates on races [lo, hi).
+    block = n_races // (n_folds + 1)
+    if block < 1:
+        raise SystemExit(f"[ERROR] {n_races} races is too few for {n_folds} folds")
+    return [((k + 1) * block, n_races if k == n_folds - 1 else (k + 2) * block) for k in range(n_folds)]
+
+
+def candidates(space, trials, rng):
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+    if trials >= len(grid):
+        return grid
+    return [grid[i] for i in sorted(rng.choice(len(grid), trials, replace=False))]
+
+
+def data_key(shared):
+    h = hashlib.sha1()
+    for name in sorted(shared):
+        h.update(name.encode())
+        h.update(np.ascontiguousarray(shared[name]).tobytes())
+    return h.hexdigest()[:16]
+
+
+def trial_key(family, target, params, fold, folds, data):
+    return json.dumps({"family": family, "target": target, "params": params, "fold": fold, "folds": folds, "data": data}, sort_keys=True)
+
+
+def load_cache(path):
+    cache = {}
+    if path.exists():
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                rec = json.loads(line)
+                cache[rec["key"]] = rec["score"]
+    return cache
+
+
+def _init_worker(shared):
+    _SHARED.clear()
+    _SHARED.update(shared)
+
+
+def score_trial(job):
+    family, target, params, (lo, hi) = job
+    s = _SHARED
+    if target == "h2h":
+        race, X, y = s["h2h_race"], s["h2h_X"], s["h2h_y"]
+    else:
+        race, X, y = s["race"], s["X"], s["y"][:, TARGETS.index(target)]
+    tr, va = race < lo, (race >= lo) & (race < hi)
+    Xtr, Xva = impute_split(X[tr], X[va])
+    model = make_model(family, target, params)
+    if target == "finish":
+        model.fit(Xtr, y[tr])
+        return float(mean_absolute_error(y[va], model.predict(Xva)))
+    model = fit_binary_model(model, Xtr, y[tr].astype(int), target)
+    return float(brier_score_loss(y[va].astype(int), prob_of_one(model, Xva), pos_label=1))
+
+
+def _map(pool, todo):
+    if pool is None:
+        for key, job in todo:
+            yield key, score_trial(job)
+        return
+    futures = {pool.submit(score_trial, job): key for key, job in todo}
+    for fut in as_completed(futures):
+        yield futures[fut], fut.result()
+
+
+def search(shared, family, space, folds, trials=20, keep=0.5, workers=1, cache_path=None, time_budget=None, seed=42):
+    """Successive halving over time-ordered folds: every trial scores fold 1, the best `keep`
+    fraction moves on to fold 2, and so on. Returns {target: (params, mean score, folds scored)}."""
+    start = time.monotonic()
+    rng = np.random.default_rng(seed)
+    cache_path = Path(cache_path) if cache_path else None
+    cache = load_cache(cache_path) if cache_path else {}
+    data = data_key(shared)
+    trials_by_target = {t: candidates(space[t], trials, rng) for t in space}
+    scores = {t: [[] for _ in trials_by_target[t]] for t in space}
+    alive = {t: set(range(len(trials_by_target[t]))) for t in space}
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared,)) if workers > 1 else None
+    if pool is None:
+        _init_worker(shared)
+    try:
+        for f, fold in enumerate(folds):
+            todo, index = [], {}
+            for t in space:
+                for i in sorted(alive[t]):
+                    key = trial_key(family, t, trials_by_target[t][i], f, folds, data)
+                    if key in cache:
+                        scores[t][i].append(cache[key])
+                    else:
+                        index[key] = (t, i)
+                        todo.append((key, (family, t, trials_by_target[t][i], fold)))
+            for key, value in _map(pool, todo):
+                t, i = index[key]
+                scores[t][i].append(value)
+                cache[key] = value
+                if cache_path:
+                    with cache_path.open("a", encoding="utf-8") as fh:
+                        fh.write(json.dumps({"key": key, "score": value}) + "\n")
+            for t in space:
+                ranked = sorted(alive[t], key=lambda i: np.mean(scores[t][i]))
+                n_keep = max(1, int(np.ceil(len(ranked) * keep)))
+                print(f"[INFO] {t} fold {f + 1}/{len(folds)}: best={np.mean(scores[t][ranked[0]]):.4f} pruned={len(ranked) - n_keep}")
+                alive[t] = set(ranked[:n_keep])
+            if time_budget is not None and time.monotonic() - start > time_budget and f + 1 < len(folds):
+                print(f"[WARN] time budget of {time_budget}s reached after fold {f + 1}; keeping the best so far")
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    best = {}
+    for t in space:
+        i = min(alive[t], key=lambda i: np.mean(scores[t][i]))
+        best[t] = (trials_by_target[t][i], float(np.mean(scores[t][i])), len(scores[t][i]))
+    return best
+
+
+def write_best(best, family, model_dir):
+    path = Path(model_dir) / train_predict.TUNED_PARAMS
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tuned = train_predict.tuned_params(model_dir)
+    tuned.setdefault(family, {}).update({t: params for t, (params, _, _) in best.items()})
+    path.write_text(json.dumps(tuned, indent=2), encoding="utf-8")
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--infile", default="data/featurized/data_featurized.csv")
+    ap.add_argument("--targets", default="finish,top10,dnf", help="comma list of finish,top10,dnf,h2h")
+    ap.add_argument("--space", help="JSON file {family: {target: {param: [values]}}}; default is the built-in grid")
+    ap.add_argument("--trials", type=int, default=20, help="configurations sampled per target")
+    ap.add_argument("--folds", type=int, default=4)
+    ap.add_argument("--keep", type=float, default=0.5, help="fraction of trials kept after each fold")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--time_budget", type=float, help="seconds; stop after the current fold once exceeded")
+    ap.add_argument("--cache", default="models/tune_trials.jsonl", help="finished trials; a rerun resumes from here")
+    ap.add_argument("--pairs_per_race", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=42)
+    add_profile_arg(ap)
+    args = ap.parse_args()
+    setup_profile(args, "tune")
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = [t for t in targets if t not in TARGETS + ["h2h"]]
+    if unknown:
+        ap.error(f"unknown targets: {', '.join(unknown)}")
+    family = "catboost" if have_catboost() else "scikit"
+    space = json.loads(Path(args.space).read_text(encoding="utf-8")) if args.space else DEFAULT_SPACE
+    space = {t: space[family][t] for t in targets if t in space.get(family, {})}
+    if not space:
+        raise SystemExit(f"[ERROR] search space has nothing for family={family} targets={targets}")
+
+    cols = train_predict.model_columns(args.infile)
+    if "h2h" in space:
+        cols += [c for c in table_columns(args.infile) if c in ["Team", "Make", "track_id"] and c not in cols]
+    with stage("feature matrix") as st:
+        shared, keys = build_matrix(read_table(args.infile, "featurized", columns=cols), "h2h" in space, args.pairs_per_race, args.seed)
+        st["rows_out"] = len(shared["X"])
+    folds = time_folds(len(keys), args.folds)
+    Path(args.cache).parent.mkdir(parents=True, exist_ok=True)
+    print(f"[INFO] tuning family={family} targets={','.join(space)} races={len(keys)} folds={folds} workers={args.workers}")
+    with stage("fit"):
+        best = search(shared, family, space, folds, args.trials, args.keep, args.workers, args.cache, args.time_budget, args.seed)
+
+    for t, (params, value, depth) in best.items():
+        metric = "MAE" if t == "finish" else "Brier"
+        print(f"[OK] {t}: {params} CV {metric}={value:.4f} over {depth} folds")
+    main_best = {t: v for t, v in best.items() if t != "h2h"}
+    if main_best:
+        print(f"[OK] wrote {write_best(main_best, family, train_predict.MODEL_DIR)}")
+    if "h2h" in best:
+        print(f"[OK] wrote {write_best({'h2h': best['h2h']}, family, h2h_predict.MODEL_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
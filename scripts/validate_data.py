@@ -1,46 +1,196 @@
+import argparse
 import json
+import sys
 from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.build_dataset import build_state_path  # noqa: E402
+from scripts.storage import dtype_for, exists, iter_table, source_path, table_columns  # noqa: E402
+from scripts.instrument import add_profile_arg, setup_profile, stage  # noqa: E402
+
 
 REQ = ["sked_id", "driver_id", "year", "season_race_num", "race_date", "race_name_raw", "race_name"]
+KEYS = ["sked_id", "driver_id"]
+RANGES = {"Finish": [1, 50], "Start": [1, 50], "Laps": [0, 1000]}
+REPORT_TXT = Path("reports/data_quality_report.txt")
+REPORT_JSON = Path("reports/data_quality_report.json")
+SCHEMA_PATH = Path("reports/schema.json")
+STATE_PATH = Path("reports/validate_state.json")
+
+
+class KeyTracker:
+    """Keys seen so far as a sorted array of 64-bit hashes: 8 bytes a row instead of the key columns."""
+
+    def __init__(self):
+        self.seen = np.empty(0, dtype=np.uint64)
+
+    def duplicates(self, keys):
+        h = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        dup = pd.Series(h).duplicated().to_numpy() | np.isin(h, self.seen)
+        self.seen = np.union1d(self.seen, h)
+        return dup
+
+
+def column_kind(s):
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return "category"
+    if pd.api.types.is_bool_dtype(s.dtype):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return "datetime"
+    return "string"
+
+
+def chunk_stats(chunk, tracker):
+    """Per-race counts for one chunk: rows, repeated keys, unparseable dates, out-of-range values, missing cells."""
+    flags = {"rows": np.ones(len(chunk), dtype=np.int64)}
+    if all(k in chunk.columns for k in KEYS):
+        flags["dup_keys"] = tracker.duplicates(chunk[KEYS])
+    if "race_date" in chunk.columns:
+        flags["bad_dates"] = pd.to_datetime(chunk["race_date"], errors="coerce").isna().to_numpy()
+    for col, (lo, hi) in RANGES.items():
+        if col in chunk.columns:
+            v = pd.to_numeric(chunk[col], errors="coerce")
+            flags[f"range:{col}"] = ((v < lo) | (v > hi)).fillna(False).to_numpy(dtype=bool)
+    stats = pd.concat([pd.DataFrame(flags, index=chunk.index), chunk.isna().add_prefix("missing:")], axis=1)
+    race = chunk["sked_id"].astype(str) if "sked_id" in chunk.columns else pd.Series("all", index=chunk.index)
+    return stats.groupby(race.to_numpy()).sum()
+
+
+def _config():
+    return {"keys": KEYS, "ranges": RANGES}
+
+
+def plan(infile, state, incremental):
+    """(sked_ids to scan or None for all, carried-over per-race stats, build state, note).
+    Changed races come from build_dataset's partition hashes, trusted only if it wrote the file last."""
+    build_path = build_state_path(infile)
+    src = source_path(infile)
+    build = json.loads(build_path.read_text(encoding="utf-8")) if build_path.exists() else {}
+    if build and src.stat().st_mtime > build_path.stat().st_mtime:
+        build = {}
+    if not incremental:
+        return None, {}, build, "full"
+    if not build:
+        return None, {}, build, "full: no build_dataset state for the current file"
+    if not state or state.get("global") != build.get("global") or state.get("config") != _config() or state.get("columns") != table_columns(infile):
+        return None, {}, build, "full: no usable validation state (first run, config or column change)"
+    parts, old = build.get("partitions", {}), state.get("partitions", {})
+    changed = sorted(int(k) for k, v in parts.items() if old.get(k) != v)
+    carried = {k: v for k, v in state.get("races", {}).items() if k in parts and int(k) not in changed}
+    return changed, carried, build, f"incremental: changed={len(changed)} unchanged={len(carried)}"
+
+
+def scan(infile, sked_ids=None, chunk_rows=100_000):
+    filters = [("sked_id", "in", sked_ids)] if sked_ids is not None else None
+    tracker, races, kinds = KeyTracker(), None, {}
+    if sked_ids is None or sked_ids:
+        for chunk in iter_table(infile, "raw", filters=filters, chunk_rows=chunk_rows):
+            stats = chunk_stats(chunk, tracker)
+            races = stats if races is None else races.add(stats, fill_value=0)
+            for col in chunk.columns:
+                if col not in kinds and chunk[col].notna().any():
+                    kinds[col] = dtype_for("raw", col) or column_kind(chunk[col])
+    return (races if races is not None else pd.DataFrame()), kinds
+
+
+def schema_drift(previous, columns):
+    old = previous.get("columns", {})
+    if not old:
+        return {"added": [], "removed": [], "changed": {}}
+    return {
+        "added": sorted(c for c in columns if c not in old),
+        "removed": sorted(c for c in old if c not in columns),
+        "changed": {c: [old[c], kind] for c, kind in sorted(columns.items()) if c in old and old[c] != kind and "empty" not in (old[c], kind)},
+    }
+
+
+def build_report(races, columns, drift, infile, note):
+    total = races.sum() if not races.empty else pd.Series(dtype="int64")
+    rows = int(total.get("rows", 0))
+    missing = {c: round(float(total.get(f"missing:{c}", 0)) / rows, 4) if rows else 0.0 for c in columns}
+    issue_cols = [c for c in ["dup_keys", "bad_dates", *[f"range:{c}" for c in RANGES]] if c in races.columns]
+    flagged = races[issue_cols].astype("int64")
+    flagged = flagged[flagged.sum(axis=1) > 0]
+    report = {
+        "file": str(infile),
+        "mode": note,
+        "rows": rows,
+        "races": len(races),
+        "missing_columns": [c for c in REQ if c not in columns],
+        "duplicate_keys": int(total["dup_keys"]) if "dup_keys" in total else None,
+        "bad_dates": int(total["bad_dates"]) if "bad_dates" in total else None,
+        "missing_pct": dict(sorted(missing.items(), key=lambda kv: -kv[1])),
+        "range_violations": {c: int(total[f"range:{c}"]) for c in RANGES if f"range:{c}" in total},
+        "ranges": RANGES,
+        "schema_drift": drift,
+        "races_with_issues": {k: {c: int(v) for c, v in row.items() if v} for k, row in flagged.iterrows()},
+        "leakage_check": "rolling_features_present_shift_required" if any("drv_finish_mean" in c for c in columns) else None,
+    }
+    report["critical"] = bool(report["missing_columns"] or report["duplicate_keys"])
+    return report
+
+
+def report_lines(report):
+    lines = []
+    if report["missing_columns"]:
+        lines.append(f"missing critical columns: {report['missing_columns']}")
+    if report["duplicate_keys"] is not None:
+        lines.append(f"duplicate_keys={report['duplicate_keys']}")
+    if report["bad_dates"] is not None:
+        lines.append(f"bad_dates={report['bad_dates']}")
+    lines.append("top_missing_pct=" + ", ".join(f"{k}:{v:.2f}" for k, v in list(report["missing_pct"].items())[:10]))
+    lines.append("range_violations=" + ", ".join(f"{k}:{v}" for k, v in report["range_violations"].items()))
+    drift = report["schema_drift"]
+    lines.append(f"schema_drift=added:{drift['added']} removed:{drift['removed']} changed:{sorted(drift['changed'])}")
+    if report["leakage_check"]:
+        lines.append(f"leakage_check={report['leakage_check']}")
+    return lines
 
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--infile", default="data/raw/data.csv")
+    ap.add_argument("--incremental", action="store_true", help="re-check only sked_ids whose build_dataset partitions changed")
+    ap.add_argument("--chunk_rows", type=int, default=100_000, help="rows per chunk; memory stays flat as history grows")
+    add_profile_arg(ap)
+    args = ap.parse_args()
+    setup_profile(args, "validate_data")
     Path("reports").mkdir(exist_ok=True)
-    p = Path("data/raw/data.csv")
-    if not p.exists():
-        raise SystemExit("[ERROR] missing data/raw/data.csv")
-    df = pd.read_csv(p)
-    issues = []
-    critical = False
-
-    miss = [c for c in REQ if c not in df.columns]
-    if miss:
-        issues.append(f"missing critical columns: {miss}")
-        critical = True
-
-    if all(c in df.columns for c in ["sked_id", "driver_id"]):
-        dup = int(df.duplicated(["sked_id", "driver_id"]).sum())
-        issues.append(f"duplicate_keys={dup}")
-        if dup > 0:
-            critical = True
-
-    if "race_date" in df.columns:
-        parsed = pd.to_datetime(df["race_date"], errors="coerce")
-        issues.append(f"bad_dates={int(parsed.isna().sum())}")
-
-    miss_pct = df.isna().mean().sort_values(ascending=False).head(10)
-    issues.append("top_missing_pct=" + ", ".join([f"{k}:{v:.2f}" for k, v in miss_pct.items()]))
-
-    leak_cols = [c for c in df.columns if "drv_finish_mean" in c]
-    if leak_cols:
-        issues.append("leakage_check=rolling_features_present_shift_required")
-
-    Path("reports/data_quality_report.txt").write_text("\n".join(issues), encoding="utf-8")
-    Path("reports/schema.json").write_text(json.dumps({"required_columns": REQ}, indent=2), encoding="utf-8")
-    print("[OK] wrote reports/data_quality_report.txt")
-    if critical:
+    if not exists(args.infile):
+        raise SystemExit(f"[ERROR] missing {args.infile}")
+
+    state = json.loads(STATE_PATH.read_text(encoding="utf-8")) if STATE_PATH.exists() else {}
+    sked_ids, carried, build, note = plan(args.infile, state, args.incremental)
+    print(f"[OK] {note}")
+    with stage("scan") as st:
+        fresh, kinds = scan(args.infile, sked_ids, args.chunk_rows)
+        st["rows_out"] = int(fresh["rows"].sum()) if not fresh.empty else 0
+    races = pd.concat([pd.DataFrame.from_dict(carried, orient="index"), fresh]).fillna(0) if carried else fresh
+    columns = table_columns(args.infile)
+    kinds = {c: kinds.get(c) or state.get("kinds", {}).get(c) or "empty" for c in columns}
+
+    previous = json.loads(SCHEMA_PATH.read_text(encoding="utf-8")) if SCHEMA_PATH.exists() else {}
+    report = build_report(races, columns, schema_drift(previous, kinds), args.infile, note)
+    REPORT_JSON.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    REPORT_TXT.write_text("\n".join(report_lines(report)), encoding="utf-8")
+    SCHEMA_PATH.write_text(json.dumps({"required_columns": REQ, "columns": kinds}, indent=2), encoding="utf-8")
+    STATE_PATH.write_text(json.dumps({
+        "global": build.get("global"),
+        "partitions": build.get("partitions", {}),
+        "config": _config(),
+        "columns": columns,
+        "kinds": kinds,
+        "races": {str(k): {c: int(v) for c, v in row.items()} for k, row in races.iterrows()},
+    }), encoding="utf-8")
+    print(f"[OK] wrote {REPORT_TXT} and {REPORT_JSON}")
+    if report["critical"]:
         raise SystemExit(1)
 
 
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+import requests
+
+from scripts.storage import apply_schema, concat_tables, exists, read_table, write_table
+
+WX_COLS = ["wx_temp_f", "wx_wind_mph", "wx_gust_mph", "wx_precip_in"]
+# provider field -> weather column
+FIELDS = {"temp_f": "wx_temp_f", "wind_mph": "wx_wind_mph", "gust_mph": "wx_gust_mph", "precip_in": "wx_precip_in"}
+CELL = ["cell_lat", "cell_lon", "hour_utc"]
+GRID = 0.1
+DEFAULT_START = "14:00"
+
+
+def _empty(cols):
+    return pd.DataFrame({c: pd.Series(dtype=object if c in ("source", "hour_utc") else float) for c in cols})
+
+
+def to_cells(lat, lon, when, grid=GRID):
+    """Cache keys: lat/lon snapped to a `grid`-degree grid, time to the UTC hour ("2024-02-18T19:00")."""
+    when = pd.Series(pd.to_datetime(when, utc=True)).reset_index(drop=True)
+    return pd.DataFrame({
+        "cell_lat": (np.round(np.asarray(lat, dtype=float) / grid) * grid).round(4),
+        "cell_lon": (np.round(np.asarray(lon, dtype=float) / grid) * grid).round(4),
+        "hour_utc": when.dt.floor("h").dt.strftime("%Y-%m-%dT%H:00").to_numpy(dtype=object),
+    })
+
+
+def start_local(races):
+    start = races["scheduled_start_time_local"] if "scheduled_start_time_local" in races.columns else pd.Series(DEFAULT_START, index=races.index)
+    return start.fillna(DEFAULT_START).astype(str)
+
+
+def start_times_utc(races):
+    """Scheduled start of each race in UTC; NaT where the date or the track's timezone is unknown."""
+    local = pd.to_datetime(races["race_date"].astype(str) + " " + start_local(races), errors="coerce")
+    out = pd.Series(pd.NaT, index=races.index, dtype="datetime64[ns, UTC]")
+    # One localize per timezone, not per race.
+    for tz, idx in races.groupby(races["track_timezone"].astype(object)).groups.items():
+        out.loc[idx] = local.loc[idx].dt.tz_localize(tz, ambiguous="NaT", nonexistent="shift_forward").dt.tz_convert("UTC")
+    return out
+
+
+def _normalize(df, grid):
+    """Provider rows (lat, lon, time, temp_f, ...) as one averaged row per cache cell."""
+    if df.empty:
+        return _empty(CELL + WX_COLS)
+    out = to_cells(df["lat"], df["lon"], df["time"], grid)
+    for field, col in FIELDS.items():
+        out[col] = pd.to_numeric(df[field], errors="coerce").to_numpy() if field in df.columns else np.nan
+    return out.dropna(subset=CELL).groupby(CELL, as_index=False)[WX_COLS].mean()
+
+
+class ArchiveProvider:
+    """Hourly observations from a table with lat, lon, time (UTC) and temp_f/wind_mph/gust_mph/precip_in."""
+
+    name = "archive"
+
+    def __init__(self, path, grid=GRID):
+        self.path = path
+        self.grid = grid
+        self.source = f"archive:{path}"
+        self._cells = None
+
+    def fetch(self, cells):
+        if self._cells is None:
+            if not exists(self.path):
+                print(f"[WARN] missing weather archive {self.path}")
+            self._cells = _normalize(read_table(self.path) if exists(self.path) else pd.DataFrame(), self.grid)
+        return cells.merge(self._cells, on=CELL, how="inner")
+
+
+class HttpProvider:
+    """A bulk JSON endpoint: POST {"points": [{lat, lon, time}, ...]} -> {"results": [{lat, lon, time, temp_f, ...}]}."""
+
+    name = "http"
+
+    def __init__(self, url, grid=GRID, batch_size=200, session=None, timeout=30):
+        self.url = url
+        self.grid = grid
+        self.source = url
+        self.batch_size = max(int(batch_size), 1)
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def fetch(self, cells):
+        rows = []
+        for start in range(0, len(cells), self.batch_size):
+            batch = cells.iloc[start:start + self.batch_size]
+            points = [{"lat": lat, "lon": lon, "time": t} for lat, lon, t in batch[CELL].itertuples(index=False)]
+            resp = self.session.post(self.url, json={"points": points}, timeout=self.timeout)
+            resp.raise_for_status()
+            rows.extend(resp.json().get("results", []))
+        return _normalize(pd.DataFrame(rows), self.grid)
+
+
+PROVIDERS = {"archive": ArchiveProvider, "http": HttpProvider}
+
+
+def make_provider(spec, grid=GRID, **kwargs):
+    """"archive:<path>" or an http(s) URL."""
+    if spec.startswith(("http://", "https://")):
+        return HttpProvider(spec, grid=grid, **kwargs)
+    kind, _, arg = spec.partition(":")
+    if kind not in PROVIDERS or not arg:
+        raise ValueError(f"unknown weather provider {spec!r}; expected archive:<path> or a URL")
+    return PROVIDERS[kind](arg, grid=grid)
+
+
+class WeatherCache:
+    """Provider answers keyed by (source, grid cell, UTC hour), so a venue/hour is looked up once.
+    Misses are not stored: a race the provider has no data for yet is asked about again next run."""
+
+    def __init__(self, path):
+        self.path = path
+        table = read_table(path, "weather_cache") if exists(path) else pd.DataFrame()
+        self.table = table if not table.empty else _empty(["source", *CELL, *WX_COLS])
+        self.added = 0
+
+    def get(self, source):
+        return self.table.loc[self.table["source"] == source, CELL + WX_COLS]
+
+    def missing(self, cells, source):
+        m = cells.merge(self.get(source)[CELL], on=CELL, how="left", indicator=True)
+        return m.loc[m["_merge"] == "left_only", CELL].reset_index(drop=True)
+
+    def add(self, found, source):
+        if found.empty:
+            return
+        rows = found[CELL + WX_COLS].assign(source=source)
+        self.table = apply_schema(concat_tables([self.table, rows], ignore_index=True), "weather_cache")
+        self.added += len(rows)
+
+    def save(self, csv=False):
+        if self.added:
+            write_table(self.table, self.path, "weather_cache", csv=csv)
+
+
+def lookup(races, provider, cache):
+    """Weather at each race's scheduled start. Cells the cache lacks go to the provider in one bulk call.
+    Returns (weather frame, cells requested from the provider)."""
+    cells = apply_schema(to_cells(races["track_lat"], races["track_lon"], start_times_utc(races), provider.grid), "weather_cache")
+    wanted = cells.dropna().drop_duplicates()
+    todo = cache.missing(wanted, provider.source)
+    if not todo.empty:
+        cache.add(provider.fetch(todo), provider.source)
+    wx = cells.merge(cache.get(provider.source), on=CELL, how="left")
+    out = pd.DataFrame({"sked_id": races["sked_id"].to_numpy()})
+    for col in WX_COLS:
+        out[col] = wx[col].to_numpy()
+    out["wx_precip_flag"] = (out["wx_precip_in"] > 0).astype(float).where(out["wx_precip_in"].notna())
+    out["wx_time_used"] = start_local(races).to_numpy()
+    out["wx_time_utc"] = cells["hour_utc"].to_numpy()
+    out["wx_source"] = np.where(out[WX_COLS].notna().any(axis=1), provider.name, "missing")
+    return out, len(todo)
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from scripts.backtest import build_matrix, run_backtest, summarize
+
+
+def test_walk_forward_trains_only_on_earlier_races():
+    rng = np.random.default_rng(4)
+    n = 160
+    finish = rng.integers(1, 21, n).astype(float)
+    races = np.repeat(np.arange(1, 9), 20)
+    df = pd.DataFrame({
+        "sked_id": races, "year": 2024, "season_race_num": races[::-1], "race_date": pd.to_datetime("2024-02-01") + pd.to_timedelta(races * 7, unit="D"),
+        "Driver": [f"D{i % 20}" for i in range(n)], "Team": "t", "Make": "m", "drv_finish_mean_5": finish + rng.normal(0, 2, n),
+        "target_finish": finish, "target_top10": (finish <= 10).astype(int), "target_dnf": (finish > 18).astype(int),
+    })
+    shared, keys = build_matrix(df, h2h=True, pairs_per_race=20)
+    assert keys["season_race_num"].tolist() == list(range(8, 0, -1))
+
+    serial = run_backtest(shared, [3, 5, 7], workers=1)
+    parallel = run_backtest(shared, [3, 5, 7], workers=2)
+    assert [r[1] for r in serial] == [60, 100, 140]
+    for (_, _, a), (_, _, b) in zip(serial, parallel):
+        np.testing.assert_allclose(a["finish"][1], b["finish"][1])
+
+    per_race, summary = summarize(serial, keys)
+    assert per_race["season_race_num"].tolist() == [5, 3, 1]
+    assert {"mae_finish", "auc_top10", "brier_dnf", "auc_h2h"} <= set(per_race.columns)
+    assert summary["races"] == 3 and summary["pooled"]["mae_finish"] > 0
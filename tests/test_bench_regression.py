@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+from benchmarks.bench_pipeline import BASELINE, load_baseline, regressions, run_suite
+
+
+@pytest.mark.skipif(not os.environ.get("NASCAR_BENCH") or not BASELINE.exists(), reason="set NASCAR_BENCH=1 and save a baseline with bench_pipeline.py --save_baseline")
+def test_pipeline_stages_have_not_regressed():
+    scales = [int(s) for s in os.environ.get("NASCAR_BENCH_SCALES", "1").split(",")]
+    found = regressions(run_suite(scales), load_baseline(), float(os.environ.get("NASCAR_BENCH_TOLERANCE", "0.5")))
+    assert not found, "\n".join(found)
+
+
+def test_regressions_ignore_noise_and_flag_slowdowns():
+    base = {"1x": {"seconds": {"parse": 1.0, "fit": 0.01}}}
+    assert regressions({"1x": {"seconds": {"parse": 1.4, "fit": 0.04}}}, base) == []
+    assert regressions({"1x": {"seconds": {"parse": 1.6, "predict": 9.0}}}, base) == ["parse@1x: 1.600s vs baseline 1.000s (+60%)"]
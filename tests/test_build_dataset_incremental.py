@@ -0,0 +1,60 @@
+import sys
+
+import pandas as pd
+
+from scripts import build_dataset
+from scripts.get_results import synthetic_rows
+from scripts.results_store import ResultsStore
+from scripts.storage import apply_schema, read_table, write_table
+
+
+def _run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["build_dataset.py", *argv])
+    build_dataset.main()
+    return read_table("data/raw/data.csv", "raw")
+
+
+def test_incremental_matches_full_rebuild(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    results = pd.DataFrame([r for race in (1, 2, 3) for r in synthetic_rows(2024, race)])
+    results["driver_id"] = results["Driver"].str.lower().str.replace(" ", "_")
+    ResultsStore().write_frame(results)
+    entries = results[results["season_race_num"] == 3][["sked_id", "year", "season_race_num", "race_date", "Driver", "Team", "Make", "CarNumber", "driver_id"]]
+    write_table(entries, "data/raw/entries.csv", "entries")
+    _run(monkeypatch, "--incremental")
+
+    entries.loc[entries["Driver"] == "Kyle Larson", "Team"] = "New Team"
+    write_table(entries, "data/raw/entries.csv", "entries")
+    inc = _run(monkeypatch, "--incremental")
+    assert "changed=1 removed=0" in capsys.readouterr().out
+
+    full = apply_schema(build_dataset.build(build_dataset.load_sources()), "raw").reset_index(drop=True)
+    assert inc.loc[inc["Driver"].eq("Kyle Larson") & inc["sked_id"].eq(202403), "Team"].item() == "New Team"
+    pd.testing.assert_frame_equal(inc.reset_index(drop=True), full, check_like=True)
+
+
+def test_unchanged_sources_skip_loading(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    ResultsStore().write_frame(pd.DataFrame(synthetic_rows(2024, 1)))
+    _run(monkeypatch, "--incremental")
+
+    def fail():
+        raise AssertionError("sources loaded on a no-change run")
+
+    monkeypatch.setattr(build_dataset, "load_sources", fail)
+    _run(monkeypatch, "--incremental")
+    assert "up to date; no source changed" in capsys.readouterr().out
+
+
+def test_track_meta_change_rebuilds_only_races_at_that_track(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    ResultsStore().write_frame(pd.DataFrame([r for race in (1, 2, 3) for r in synthetic_rows(2024, race)]))
+    tracks = pd.DataFrame({"track_id": ["track_0001", "track_0002", "track_0003"], "track_canonical": ["Track 1", "Track 2", "Track 3"], "track_length_mi": [1.5, 1.5, 1.5]})
+    write_table(tracks, "data/enrich/track_meta.csv", "track_meta")
+    _run(monkeypatch, "--incremental")
+
+    tracks.loc[1, "track_length_mi"] = 2.5
+    write_table(tracks, "data/enrich/track_meta.csv", "track_meta")
+    out = _run(monkeypatch, "--incremental")
+    assert "changed=1 removed=0" in capsys.readouterr().out
+    assert out.loc[out["sked_id"].eq(202402), "track_length_mi"].eq(2.5).all()
@@ -8,3 +8,19 @@ def test_driveraverages_parse_fixture():
     assert len(rows) == 2
     assert rows[0]["Driver"] == "Kyle Larson"
     assert int(rows[1]["Finish"]) == 1
+
+
+def test_lxml_and_bs4_parsers_agree():
+    html = Path("tests/fixtures/driveraverages_sample.html").read_text(encoding="utf-8")
+    fast = parse_driveraverages_html(html, 202401, 2024, 1, "http://x", engine="lxml")
+    slow = parse_driveraverages_html(html, 202401, 2024, 1, "http://x", engine="bs4")
+    assert fast == slow
+    assert parse_driveraverages_html(html, 202402, 2024, 2, "http://x", engine="lxml") == []
+
+
+def test_parsers_agree_on_a_marker_split_across_elements():
+    html = Path("tests/fixtures/driveraverages_sample.html").read_text(encoding="utf-8")
+    for marker in ("Race <b>1</b> of 2024", "Race<b>1</b>of 2024", "<span>Race 1</span>\n of <i>2024</i>"):
+        split = html.replace("Race 1 of 2024", marker)
+        fast = parse_driveraverages_html(split, 202401, 2024, 1, "http://x", engine="lxml")
+        assert len(fast) == 2 and fast == parse_driveraverages_html(split, 202401, 2024, 1, "http://x", engine="bs4")
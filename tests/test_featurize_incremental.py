@@ -0,0 +1,53 @@
+import sys
+
+import pandas as pd
+
+from scripts import featurizeData
+from scripts.storage import read_table, write_table
+
+
+def _history(n_races):
+    rows = []
+    for race in range(1, n_races + 1):
+        for i, d in enumerate(["a", "b", "c", "d"]):
+            finish = (i + race) % 4 + 1 if race < n_races else None
+            rows.append(
+                {
+                    "sked_id": 202400 + race,
+                    "year": 2024,
+                    "season_race_num": race,
+                    "race_date": f"2024-{1 + race // 28:02d}-{race % 28 + 1:02d}",
+                    "driver_id": d,
+                    "Driver": d.upper(),
+                    "track": f"Track {race % 4}",
+                    "track_type": "superspeedway" if race % 4 == 0 else "intermediate_1p5",
+                    "Finish": finish,
+                    "Status": "Accident" if (race + i) % 7 == 0 else "Running",
+                    "Start": i + 1,
+                    "qual_speed": 180.0 - i,
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def _run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["featurizeData.py", "--mode", "postqual", *argv])
+    featurizeData.main()
+    return read_table("out/f.csv", "featurized")
+
+
+def test_incremental_featurize_matches_full_build(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    args = ("--infile", "raw.csv", "--out", "out/f.csv", "--incremental")
+    write_table(_history(25), "raw.csv", "raw")
+    _run(monkeypatch, *args)
+
+    write_table(_history(30), "raw.csv", "raw")
+    inc = _run(monkeypatch, *args)
+    assert "featurized 6 new races from saved state" in capsys.readouterr().out
+
+    write_table(featurizeData.build_features(read_table("raw.csv", "raw"), "postqual"), "out/full.csv", "featurized")
+    full = read_table("out/full.csv", "featurized")
+    pd.testing.assert_frame_equal(inc.reset_index(drop=True), full.reset_index(drop=True), check_like=True, rtol=1e-9)
+    assert inc.loc[inc["sked_id"] == 202430, "drv_finish_mean_5"].notna().all()
+    assert inc.loc[inc["sked_id"] == 202428, "drv_trk_appearances_50"].tolist() == [6.0] * 4
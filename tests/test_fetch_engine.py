@@ -0,0 +1,77 @@
+import threading
+import time
+
+from scripts.fetch import FetchEngine, TokenBucket
+from scripts.get_results import fetch_with_retry
+from scripts.html_cache import HtmlCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    def __init__(self, throttle_first=1, retry_after="0"):
+        self.calls = []
+        self.times = []
+        self.throttle_first = throttle_first
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+
+    def get(self, url, timeout=None, headers=None):
+        with self.lock:
+            self.calls.append(url)
+            self.times.append(time.monotonic())
+            n = len(self.calls)
+        if n <= self.throttle_first:
+            return FakeResponse(429, headers={"Retry-After": self.retry_after})
+        return FakeResponse(200, text=f"<html>{url}</html>")
+
+
+def test_engine_fetches_concurrently_and_backs_off_pool_wide(tmp_path):
+    session = FakeSession(throttle_first=1)
+    engine = FetchEngine(fetch_with_retry, workers=3, rate=0, session=session)
+    cache = HtmlCache(tmp_path)
+    jobs = [(k, f"http://x/{k}", {"cache": cache, "key": k, "retries": 3, "sleep": 0.01, "backoff": 1.0}) for k in range(6)]
+    pages = engine.fetch_many(jobs)
+    assert sorted(pages) == list(range(6))
+    assert all(mode == "fetched" for _, mode in pages.values())
+    assert cache.get(5) == "<html>http://x/5</html>"
+    stats = engine.stats(len(jobs))
+    assert stats["fetch_latency_ms"]["count"] == 7  # every HTTP round trip, the 429 included
+    assert stats["throughput_pages_per_s"] > 0
+
+    cached = FetchEngine(fetch_with_retry, workers=2, rate=0, session=FakeSession(throttle_first=99)).fetch_many(jobs)
+    assert all(mode == "cache" for _, mode in cached.values())
+
+
+def test_rate_limit_and_retry_after_pace_the_whole_pool(tmp_path):
+    session = FakeSession(throttle_first=1, retry_after="0.3")
+    engine = FetchEngine(fetch_with_retry, workers=3, rate=20.0, session=session)
+    cache = HtmlCache(tmp_path)
+    jobs = [(k, f"http://x/{k}", {"cache": cache, "key": k, "retries": 3, "sleep": 0.01, "backoff": 1.0}) for k in range(5)]
+    pages = engine.fetch_many(jobs)
+    assert all(mode == "fetched" for _, mode in pages.values())
+
+    gaps = [b - a for a, b in zip(session.times, session.times[1:])]
+    # The 429 pauses every worker for Retry-After, and the halved rate spaces the rest at least 1/20 s apart.
+    assert gaps[0] >= 0.3 - 0.01
+    assert min(gaps) >= 1 / 20 - 0.01
+    stats = engine.stats(len(jobs))
+    assert stats["limiter_wait_s"] >= 0.3
+    assert stats["fetch_latency_ms"]["max"] < 100
+
+
+def test_token_bucket_penalty_halves_rate():
+    bucket = TokenBucket(rate=10.0)
+    bucket.penalize(0.0)
+    assert bucket.rate == 5.0
+    bucket.reward()
+    assert bucket.rate == 6.0
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+
+from scripts.h2h_predict import load_artifacts, pair_prob, pair_rows, pairwise_matrix, save_artifacts
+
+
+def test_matrix_matches_single_pair_scoring(tmp_path):
+    rng = np.random.default_rng(3)
+    feats = ["diff_drv_finish_mean_5", "same_team_flag", "same_make_flag"]
+    X = pd.DataFrame({"diff_drv_finish_mean_5": rng.normal(size=200), "same_team_flag": rng.integers(0, 2, 200), "same_make_flag": rng.integers(0, 2, 200)})
+    y = (X["diff_drv_finish_mean_5"] < 0).astype(int)
+    imp = SimpleImputer(strategy="median").fit(X[feats])
+    save_artifacts(LogisticRegression().fit(imp.transform(X[feats]), y), imp, "scikit", feats, tmp_path)
+    model, imp, feats = load_artifacts(tmp_path)
+
+    sub = pd.DataFrame({"Driver": ["A", "B", "C", "D"], "Team": ["t1", "t1", "t2", None], "Make": "m", "drv_finish_mean_5": [3.0, 9.0, np.nan, 14.0]})
+    mat = pairwise_matrix(sub, model, imp, feats)
+    assert mat.shape == (4, 4) and np.isnan(np.diag(mat)).all()
+    np.testing.assert_allclose(mat.to_numpy() + mat.to_numpy().T, np.where(np.eye(4) == 1, np.nan, 1.0))
+    ab, ba = (model.predict_proba(imp.transform(pair_rows(sub, [i], [j], feats)[feats]))[0, 1] for i, j in ((1, 3), (3, 1)))
+    assert np.isclose(mat.loc["B", "D"], (ab + 1 - ba) / 2)
+    assert mat.loc["A", "D"] > 0.5
+    # --predict scores a single pair the same way, so it agrees with the matrix and is symmetric under a swap.
+    assert np.isclose(pair_prob(sub, "b", "D", model, imp, feats), mat.loc["B", "D"])
+    assert np.isclose(pair_prob(sub, "D", "B", model, imp, feats), 1 - mat.loc["B", "D"])
+    assert pair_prob(sub, "B", "Z", model, imp, feats) is None
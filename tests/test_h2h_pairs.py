@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from scripts.build_h2h_dataset import build_pairs
+
+
+def _race_frame():
+    rng = np.random.default_rng(1)
+    rows = []
+    for sked_id, n in ((10, 12), (11, 6), (12, 1)):
+        for i in range(n):
+            rows.append({
+                "sked_id": sked_id, "year": 2024, "season_race_num": sked_id - 9, "driver_id": f"d{i}", "Driver": f"D {i}",
+                "Team": f"t{i % 3}", "Make": None if i == 0 else "chev", "target_finish": float(i + 1),
+                "target_dnf": int(i == n - 1 and n > 2), "drv_finish_mean_5": rng.normal(), "drv_dnf_rate_5": np.nan if i == 2 else rng.random(),
+            })
+    return pd.DataFrame(rows)
+
+
+def test_pairs_are_seeded_and_match_row_wise_diffs():
+    df = _race_frame()
+    a = build_pairs(df, pairs_per_race=20, seed=7)
+    pd.testing.assert_frame_equal(a, build_pairs(df, pairs_per_race=20, seed=7))
+    assert a.groupby("sked_id").size().to_dict() == {10: 20, 11: 10}
+    assert not a.duplicated(["sked_id", "driver_a_id", "driver_b_id"]).any()
+
+    by_id = df.set_index(["sked_id", "driver_id"])
+    for r in a.itertuples():
+        x, y = by_id.loc[(r.sked_id, r.driver_a_id)], by_id.loc[(r.sked_id, r.driver_b_id)]
+        assert r.target_a_beats_b == int(x.target_finish < y.target_finish)
+        assert r.target_finish_diff == y.target_finish - x.target_finish
+        assert r.same_team_flag == int(x.Team == y.Team)
+        assert r.same_make_flag == int(pd.notna(x.Make) and x.Make == y.Make)
+        np.testing.assert_equal(r.diff_drv_dnf_rate_5, x.drv_dnf_rate_5 - y.drv_dnf_rate_5)
+
+
+def test_all_pairs_enumerates_every_combination():
+    out = build_pairs(_race_frame(), all_pairs=True, include_dnfs=True)
+    assert out.groupby("sked_id").size().to_dict() == {10: 66, 11: 15}
@@ -0,0 +1,55 @@
+from scripts.get_results import fetch_with_retry
+from scripts.html_cache import HtmlCache
+
+
+class Resp:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class ConditionalSession:
+    def __init__(self):
+        self.sent = []
+
+    def get(self, url, timeout=None, headers=None):
+        self.sent.append(dict(headers or {}))
+        if (headers or {}).get("If-None-Match") == '"v1"':
+            return Resp(304)
+        return Resp(200, "<html>Race 1 of 2024</html>", {"ETag": '"v1"'})
+
+
+def test_cache_compresses_indexes_and_revalidates(tmp_path):
+    cache = HtmlCache(tmp_path)
+    session = ConditionalSession()
+    html, mode = fetch_with_retry("http://x/1", cache, 202401, session=session)
+    assert mode == "fetched"
+    assert (tmp_path / "202401.html.gz").exists()
+    assert not (tmp_path / "202401.html").exists()
+    cache.save()
+
+    reopened = HtmlCache(tmp_path)
+    entry = reopened.entry(202401)
+    assert entry["etag"] == '"v1"' and entry["status"] == "ok" and entry["size"] == len(html)
+    assert fetch_with_retry("http://x/1", reopened, 202401, session=session) == (html, "cache")
+    assert fetch_with_retry("http://x/1", reopened, 202401, session=session, revalidate=True) == (html, "revalidated")
+    assert session.sent[-1]["If-None-Match"] == '"v1"'
+    # --no_cache keeps its old meaning: a full download with no conditional headers.
+    assert fetch_with_retry("http://x/1", reopened, 202401, session=session, no_cache=True) == (html, "fetched")
+    assert session.sent[-1] == {}
+
+
+def test_negative_cache_and_legacy_migration(tmp_path):
+    (tmp_path / "202402.html").write_text("<html>legacy</html>", encoding="utf-8")
+    cache = HtmlCache(tmp_path, negative_ttl=3600)
+    assert cache.get(202402) == "<html>legacy</html>"
+    assert not (tmp_path / "202402.html").exists()
+
+    cache.mark(202403, "empty")
+    assert fetch_with_retry("http://x/3", cache, 202403, session=ConditionalSession()) == (None, "negative")
+    assert not HtmlCache(tmp_path, negative_ttl=0).is_negative(202403)
@@ -0,0 +1,72 @@
+import sys
+
+import pandas as pd
+
+from scripts import get_entries, get_qualifying, normalize_ids
+from scripts.identity import IdentityIndex, normalize_name
+from scripts.results_store import ResultsStore, read_results
+from scripts.storage import read_table, write_table
+
+
+def test_variants_share_an_id_and_existing_ids_never_move():
+    dim = pd.DataFrame({"driver_id": ["driver_0001", "driver_0002"], "Driver_canonical": ["Kyle Larson", "Martin Truex Jr."]})
+    idx = IdentityIndex.from_tables("driver", "Driver_canonical", dim)
+    names = ["Kyle Larson", "Martin Truex Jr", "A.J. Allmendinger", "AJ Allmendinger", "Chase Elliot", "Chase Elliott", "Dale Earnhardt", "Dale Earnhardt Jr.", "Kurt Busch", "Kyle Busch"]
+    ids = idx.resolve_all(names)
+
+    assert ids["Kyle Larson"] == "driver_0001" and ids["Martin Truex Jr"] == "driver_0002"
+    assert ids["A.J. Allmendinger"] == ids["AJ Allmendinger"] == "driver_0003"
+    assert ids["Chase Elliot"] == ids["Chase Elliott"] == "driver_0004"
+    assert len({ids["Dale Earnhardt"], ids["Dale Earnhardt Jr."], ids["Kurt Busch"], ids["Kyle Busch"]}) == 4
+    aliases = idx.alias_table().set_index("alias_name")
+    assert aliases.loc["Chase Elliott", "match"] == "fuzzy" and aliases.loc["Martin Truex Jr", "match"] == "normalized"
+    assert "chase elliot" in idx.candidates(normalize_name("Chase Elliott"))
+
+    reloaded = IdentityIndex.from_tables("driver", "Driver_canonical", idx.dim(), idx.alias_table())
+    assert reloaded.resolve_all(["Aaron Newcomer", "Chase Elliott"]) == {"Aaron Newcomer": "driver_0009", "Chase Elliott": "driver_0004"}
+
+
+def _run(monkeypatch, module=normalize_ids, *argv):
+    monkeypatch.setattr(sys, "argv", [f"{module.__name__}.py", *argv])
+    module.main()
+    return [read_results(), read_table("data/raw/entries.csv", "entries"), read_table("data/raw/qualifying.csv", "qualifying")]
+
+
+def test_normalize_ids_writes_stable_ids_back(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    results = pd.DataFrame({
+        "sked_id": [202401, 202401], "year": 2024, "season_race_num": 1, "race_date": "2024-02-18", "track": "Daytona", "Finish": [1, 2], "CarNumber": ["5", "19"], "Make": ["Chevrolet", "Toyota"],
+        "Driver": ["Kyle Larson", "Martin Truex Jr."], "Team": ["Hendrick Motorsports", "Joe Gibbs Racing"], "driver_id": ["kyle_larson", "martin_truex_jr."],
+    })
+    entries = pd.DataFrame({
+        "sked_id": [202402, 202402], "year": 2024, "season_race_num": 2, "track": "Atlanta",
+        "Driver": ["Martin Truex Jr", "Bubba Wallace"], "Team": ["Joe Gibbs Racing", "23XI Racing"], "driver_id": ["martin_truex_jr", "bubba_wallace"],
+    })
+    ResultsStore().write_frame(results)
+    write_table(entries, "data/raw/entries.csv", "entries")
+    write_table(pd.DataFrame({"sked_id": [202402, 202402], "driver_id": ["martin_truex_jr", "bubba_wallace"], "Start": [3, 1]}), "data/raw/qualifying.csv", "qualifying")
+
+    res, ent, qual = _run(monkeypatch)
+    assert res["driver_id"].tolist() == ["driver_0002", "driver_0003"]
+    assert ent["driver_id"].tolist() == qual["driver_id"].tolist() == ["driver_0003", "driver_0001"]
+    assert ent["team_id"].tolist()[0] == res["team_id"].tolist()[1] and res["track_id"].notna().all()
+
+    # A newcomer whose name sorts first gets the next id instead of renumbering everyone.
+    entries.loc[len(entries)] = {"sked_id": 202402, "year": 2024, "season_race_num": 2, "track": "Atlanta", "Driver": "Austin Cindric", "Team": "Team Penske", "driver_id": "austin_cindric"}
+    write_table(entries, "data/raw/entries.csv", "entries")
+    res, ent, qual = _run(monkeypatch)
+    assert res["driver_id"].tolist() == ["driver_0002", "driver_0003"]
+    assert ent["driver_id"].tolist() == ["driver_0003", "driver_0001", "driver_0004"]
+    assert qual["driver_id"].tolist() == ["driver_0003", "driver_0001"]
+
+    # Re-fetching entries and qualifying after the ids were rewritten lines up with the stored rows.
+    res, ent, qual = _run(monkeypatch, get_entries, "--year", "2024", "--race", "2")
+    res, ent, qual = _run(monkeypatch, get_qualifying, "--year", "2024", "--race", "2")
+    assert not ent.duplicated(["sked_id", "driver_id"]).any() and not qual.duplicated(["sked_id", "driver_id"]).any()
+    assert ent.loc[ent["sked_id"].eq(202402), "driver_id"].str.startswith("driver_").all()
+    assert set(qual["driver_id"]) == set(ent.loc[ent["sked_id"].eq(202402), "driver_id"])
+
+    # A qualifying row still carrying a name slug maps onto the stable id even though no entries row has that slug any more.
+    write_table(pd.concat([qual, pd.DataFrame({"sked_id": [202401], "driver_id": ["kyle_larson"], "Start": [2]})], ignore_index=True), "data/raw/qualifying.csv", "qualifying")
+    res, ent, qual = _run(monkeypatch)
+    assert qual.loc[qual["sked_id"].eq(202401), "driver_id"].tolist() == ["driver_0002"]
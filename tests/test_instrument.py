@@ -0,0 +1,26 @@
+import json
+
+from scripts.instrument import Profiler
+
+
+def test_stages_are_recorded_only_when_enabled(tmp_path):
+    prof = Profiler()
+    with prof.stage("parse", [1, 2, 3]) as st:
+        st["rows_out"] = [1]
+    assert prof.stages == []
+
+    prof.start("unit", cprofile=True, out_dir=tmp_path)
+    for _ in range(2):
+        with prof.stage("parse", [1, 2, 3]) as st:
+            sum(range(10000))
+            st["rows_out"] = [1, 2]
+    with prof.stage("write", 5):
+        pass
+    path = prof.finish()
+    assert prof.finish() is None
+
+    rep = json.loads(path.read_text())
+    assert rep["script"] == "unit" and rep["wall_s"] >= 0 and "peak_rss_mb" in rep
+    assert rep["stage_totals"]["parse"] == {"calls": 2, "wall_s": rep["stage_totals"]["parse"]["wall_s"], "cpu_s": rep["stage_totals"]["parse"]["cpu_s"], "rows_in": 6, "rows_out": 4}
+    assert [s["stage"] for s in rep["stages"]] == ["parse", "parse", "write"] and rep["stages"][2]["rows_in"] == 5
+    assert rep["cprofile"]["top_cumulative"] and (tmp_path / rep["cprofile"]["file"].split("/")[-1]).exists()
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from scripts.nascar import main, split_chain
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_help_does_not_import_heavy_dependencies():
+    code = "import sys; from scripts.nascar import main; main(['--help']); assert not {'pandas', 'sklearn', 'numpy'} & set(sys.modules)"
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+
+
+def test_pipeline_help_does_not_import_pandas():
+    code = "import sys; from scripts.nascar import main; main(['pipeline', '--help']); assert 'pandas' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+
+
+def test_chain_splits_on_plus_and_rejects_unknown_commands():
+    assert split_chain(["normalize_ids", "+", "featurize", "--mode", "postqual", "+"]) == [["normalize_ids"], ["featurize", "--mode", "postqual"]]
+    with pytest.raises(SystemExit, match="unknown command"):
+        main(["nope"])
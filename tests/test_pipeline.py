@@ -0,0 +1,49 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from scripts.pipeline import SCRIPTS, Runner, build_steps, code_files, dependencies, step_digest
+
+
+def test_step_graph_runs_independent_stages_together():
+    deps = dependencies(build_steps(2023, 2024, h2h=True))
+    assert deps["enrich_track_meta"] == {"get_results", "normalize_ids"}
+    assert deps["enrich_race_structure"] == {"get_results"}
+    assert {"enrich_race_structure", "enrich_track_meta", "normalize_ids"} <= deps["enrich_weather"]
+    # normalize_ids rewrites the ids in results, entries and qualifying, so it waits for all three.
+    assert {"get_results", "get_entries", "get_qualifying"} <= deps["normalize_ids"]
+    assert deps["build_h2h_dataset"] == {"featurizeData"} and "build_h2h_dataset" not in deps["train_predict"]
+    assert {"get_qualifying", "enrich_weather", "normalize_ids"} <= deps["build_dataset"]
+
+
+def test_digest_tracks_inputs_args_and_imported_code(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert SCRIPTS / "storage.py" in code_files(SCRIPTS / "featurizeData.py")
+    lazy = tmp_path / "lazy.py"
+    lazy.write_text("def main():\n    from scripts.results_store import read_results\n")
+    assert SCRIPTS / "results_store.py" in code_files(lazy)
+    step = next(s for s in build_steps(2023, 2024) if s.name == "featurizeData")
+    before = step_digest(step)
+    Path("data/raw").mkdir(parents=True)
+    Path("data/raw/data.csv").write_text("sked_id\n1\n")
+    changed = step_digest(step)
+    assert changed != before and step_digest(step) == changed
+    step.args = ["--mode", "postqual"]
+    assert step_digest(step) != changed
+
+
+def test_second_run_on_unchanged_data_skips_every_step(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    subprocess.run([sys.executable, str(SCRIPTS / "get_results.py"), "--start_year", "2024", "--end_year", "2024", "--max_races", "3", "--offline"], check=True)
+    writers = {}
+    for step in build_steps(2024, 2024, h2h=True):
+        # A step that rewrites a table in place is not a second producer of it.
+        for path in set(step.outputs) - set(step.inputs):
+            writers.setdefault(path, []).append(step.name)
+    assert writers["data/raw/data.csv"] == ["build_dataset"] and all(len(names) == 1 for names in writers.values())
+
+    steps = build_steps(2024, 2024, fetch=False)
+    assert Runner(steps, "first.log", jobs=2).run()
+    assert Runner(steps, "second.log", jobs=2).run()
+    lines = [line for line in Path("second.log").read_text(encoding="utf-8").splitlines() if line.startswith("[")]
+    assert sorted(lines) == sorted(f"[SKIP] {step.name} (inputs and code unchanged)" for step in steps)
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from scripts.race_sim import field_probabilities, simulate, simulate_race
+
+
+def test_plackett_luce_win_rates_and_consistent_field():
+    weights = np.array([4.0, 2.0, 1.0, 1.0])
+    positions, beats, dnf = simulate(np.log(weights), np.zeros(4), n_sims=200_000, seed=1, workers=2, mem_mb=1)
+    np.testing.assert_allclose(positions[:, 0] / 200_000, weights / weights.sum(), atol=0.005)
+    assert (positions.sum(axis=0) == 200_000).all() and (positions.sum(axis=1) == 200_000).all() and dnf.sum() == 0
+    assert (beats + beats.T + np.eye(4, dtype=int) * 200_000 == 200_000).all()
+
+    again = simulate(np.log(weights), np.zeros(4), n_sims=200_000, seed=1, workers=2, mem_mb=1)
+    assert all((a == b).all() for a, b in zip(again, (positions, beats, dnf)))
+
+
+def test_field_probabilities_add_up_and_dnf_goes_last():
+    pred = np.arange(1.0, 25.0)
+    prob_dnf = np.full(24, 0.05)
+    prob_dnf[0] = 1.0
+    table, h2h = field_probabilities(pred, prob_dnf, n_sims=20_000, scale=3.0, seed=0)
+    np.testing.assert_allclose(table[["sim_win", "sim_top5", "sim_top10", "sim_top20"]].sum().to_numpy(), [1, 5, 10, 20])
+    np.testing.assert_allclose(table["sim_exp_finish"].sum(), 24 * 25 / 2)
+    # The fastest car always retires: behind every finisher, ahead of the other retirements.
+    assert table.loc[0, "sim_dnf"] == 1.0 and table.loc[0, "sim_win"] == 0.0 and table.loc[0, "sim_exp_finish"] > 21
+    assert table.loc[1, "sim_win"] > table.loc[10, "sim_win"] > table.loc[23, "sim_win"]
+    np.testing.assert_allclose(h2h + h2h.T + np.eye(24), 1.0)
+
+
+def test_simulate_race_fits_scale_and_labels_h2h(capsys):
+    sub = pd.DataFrame({"Driver": list("ABCDEFGHIJKL"), "pred_finish": np.linspace(3, 30, 12), "prob_top10": np.linspace(0.9, 0.2, 12), "prob_dnf": 0.1})
+    out, h2h = simulate_race(sub, n_sims=5000, seed=0)
+    assert "noise scale=" in capsys.readouterr().out
+    assert list(h2h.index) == list("ABCDEFGHIJKL") and h2h.loc["A", "L"] > 0.5
+    assert out["sim_exp_finish"].is_monotonic_increasing
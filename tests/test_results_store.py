@@ -0,0 +1,37 @@
+import pandas as pd
+
+from scripts.get_results import synthetic_rows
+from scripts.results_store import ResultsStore, read_results
+from scripts.storage import exists
+
+
+def test_partitions_checkpoint_and_resume(tmp_path):
+    store = ResultsStore(tmp_path / "results")
+    for race in (2, 1):
+        assert store.write_partition(synthetic_rows(2024, race))
+        store.checkpoint(202400 + race, "ok", "fetched")
+
+    reopened = ResultsStore(tmp_path / "results")
+    assert reopened.is_done(202401) and not reopened.is_done(202403)
+    assert exists(tmp_path / "results" / "year=2024" / "sked_id=202402.csv")
+    assert not reopened.write_partition(synthetic_rows(2024, 1))
+
+    df = reopened.read_all()
+    assert list(df["sked_id"].drop_duplicates()) == [202401, 202402]
+    assert df.duplicated(["sked_id", "driver_id"]).sum() == 0
+
+
+def test_write_frame_rewrites_only_changed_races(tmp_path):
+    root = tmp_path / "results"
+    assert read_results(root).empty and not root.exists()
+    store = ResultsStore(root)
+    store.write_frame(pd.DataFrame(synthetic_rows(2024, 1) + synthetic_rows(2024, 2)))
+    first = next((root / "year=2024").glob("sked_id=202401.*"))
+    stamp = first.stat().st_mtime_ns
+
+    df = read_results(root)
+    df["Team"] = df["Team"].cat.add_categories(["Renamed"])
+    df.loc[df["sked_id"] == 202402, "Team"] = "Renamed"
+    assert ResultsStore(root).write_frame(df) == 1
+    assert first.stat().st_mtime_ns == stamp
+    assert set(read_results(root).query("sked_id == 202402")["Team"]) == {"Renamed"}
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from scripts.rolling import grouped_rolling, rolling_features
+
+
+def test_rolling_engine_matches_groupby_rolling():
+    rng = np.random.default_rng(0)
+    n = 600
+    df = pd.DataFrame({"g": np.sort(rng.choice(list("abcdefg"), n)), "v": rng.integers(1, 40, n).astype(float)})
+    df.loc[rng.choice(n, 60, replace=False), "v"] = np.nan
+    df.loc[df["g"] == "c", "v"] = 7.0
+    specs = [(f"{fn}_{w}", "v", w, fn, mp) for w in (3, 5, 20) for fn, mp in (("mean", 1), ("std", 2))]
+    got = rolling_features(df, "g", specs)
+
+    shifted = df.groupby("g")["v"].shift(1)
+    for w in (3, 5, 20):
+        exp_mean = shifted.groupby(df["g"]).rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
+        exp_std = shifted.groupby(df["g"]).rolling(w, min_periods=2).std().reset_index(level=0, drop=True)
+        np.testing.assert_allclose(got[f"mean_{w}"], exp_mean.sort_index(), rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(got[f"std_{w}"], exp_std.sort_index(), rtol=1e-9, atol=1e-9)
+    assert (got.loc[df["g"] == "c", "std_5"].dropna() == 0).all()
+
+
+def test_grouped_pass_matches_per_key_groupby():
+    rng = np.random.default_rng(1)
+    n = 500
+    df = pd.DataFrame({"d": rng.choice(list("abcde"), n), "t": rng.choice(["oval", "road", None], n), "v": rng.integers(1, 40, n).astype(float)})
+    df = df.sort_values("d", kind="stable")
+    specs = [("mean_3", "v", 3, "mean", 1), ("n_50", "v", 50, "count", 0)]
+    got = grouped_rolling(df, [(["d"], specs[:1]), (["d", "t"], [(f"dt_{name}", *rest) for name, *rest in specs])])
+
+    sub = df[df["t"].notna()]
+    shifted = sub.groupby(["d", "t"])["v"].shift(1)
+    exp_mean = shifted.groupby([sub["d"], sub["t"]]).rolling(3, min_periods=1).mean().reset_index(level=[0, 1], drop=True)
+    np.testing.assert_allclose(got.loc[sub.index, "dt_mean_3"], exp_mean.reindex(sub.index), rtol=1e-9)
+    np.testing.assert_array_equal(got.loc[sub.index, "dt_n_50"], sub.groupby(["d", "t"]).cumcount().astype(float))
+    assert got.loc[df["t"].isna(), "dt_mean_3"].isna().all() and got["mean_3"].notna().sum() > got["dt_mean_3"].notna().sum()
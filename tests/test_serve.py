@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.dummy import DummyClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+
+from scripts import h2h_predict, train_predict
+from scripts.serve import ModelStore, make_server
+from scripts.storage import write_table
+
+
+def _get(port, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=10) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_service_batches_requests_and_reloads_models(tmp_path):
+    rng = np.random.default_rng(2)
+    n = 200
+    finish = rng.integers(1, 21, n).astype(float)
+    df = pd.DataFrame({
+        "sked_id": np.repeat(np.arange(10), 20), "year": 2024, "season_race_num": np.repeat(np.arange(1, 11), 20),
+        "Driver": [f"D{i % 20}" for i in range(n)], "Team": "t", "Make": "m", "drv_finish_mean_5": finish + rng.normal(0, 2, n),
+        "target_finish": finish, "target_top10": (finish <= 10).astype(int), "target_dnf": (finish > 18).astype(int),
+    })
+    featurized = tmp_path / "data_featurized.csv"
+    write_table(df, featurized, "featurized")
+    artifacts, family = train_predict.train_models(df)
+    train_predict.save_artifacts(*artifacts[:4], family, artifacts[4], tmp_path / "models")
+    feats = ["diff_drv_finish_mean_5", "same_team_flag", "same_make_flag"]
+    X = pd.DataFrame({"diff_drv_finish_mean_5": rng.normal(size=100), "same_team_flag": 1, "same_make_flag": 1})
+    imp = SimpleImputer(strategy="median").fit(X)
+    h2h_predict.save_artifacts(LogisticRegression().fit(imp.transform(X), X["diff_drv_finish_mean_5"] < 0), imp, "scikit", feats, tmp_path / "models_h2h")
+
+    store = ModelStore(tmp_path / "models", tmp_path / "models_h2h", featurized, check_every=0)
+    server = make_server(port=0, store=store, max_wait=0.05)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            ranks = list(pool.map(lambda r: _get(port, f"/rank?year=2024&race={r}&top=5"), range(1, 11)))
+        assert all(code == 200 and len(body["drivers"]) == 5 for code, body in ranks)
+        assert server.predictor.rank_batcher.batches < 10
+        expected = train_predict.score(df[df["season_race_num"] == 3], *artifacts).sort_values("pred_finish")
+        assert [d["Driver"] for d in ranks[2][1]["drivers"]] == expected["Driver"].head(5).tolist()
+
+        code, body = _get(port, "/h2h?year=2024&race=1&driver_a=d0&driver_b=D1")
+        assert code == 200 and abs(body["p_a_ahead"] + body["p_b_ahead"] - 1) < 1e-9
+        assert _get(port, "/rank?year=2024&race=99")[0] == 404
+        assert _get(port, "/rank?year=x&race=1")[0] == 400
+
+        always_top10 = DummyClassifier(strategy="constant", constant=1).fit([[0]] * 2, [0, 1])
+        train_predict.save_artifacts(artifacts[0], always_top10, *artifacts[2:4], family, artifacts[4], tmp_path / "models")
+        for name in train_predict.ARTIFACTS:
+            p = tmp_path / "models" / name
+            os.utime(p, ns=(p.stat().st_atime_ns, p.stat().st_mtime_ns + 10**9))
+        code, body = _get(port, "/rank?year=2024&race=1")
+        assert code == 200 and all(d["prob_top10"] == 1.0 for d in body["drivers"])
+        assert _get(port, "/health")[1]["reloads"] >= 2
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,13 +1,22 @@
 import subprocess
+import sys
 from pathlib import Path
 
+from scripts.storage import exists
+
+SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "get_results.py"
+
 
 def test_smoke_pipeline_outputs(tmp_path):
     subprocess.run(
         [
-            "python", "scripts/get_results.py", "--start_year", "2024", "--end_year", "2024", "--max_races", "2", "--offline",
-            "--out", str(tmp_path / "data.csv"),
+            sys.executable, str(SCRIPT), "--start_year", "2024", "--end_year", "2024", "--max_races", "2", "--offline",
+            "--store", str(tmp_path / "results"),
         ],
         check=True,
+        cwd=tmp_path,
     )
-    assert (tmp_path / "data.csv").exists()
+    assert (tmp_path / "results" / "_manifest.json").exists()
+    assert exists(tmp_path / "results" / "year=2024" / "sked_id=202401") and exists(tmp_path / "results" / "year=2024" / "sked_id=202402")
+    # The store is the only output: no compacted flat copy is rewritten next to it.
+    assert not (tmp_path / "results.csv").exists()
@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+
+from benchmarks.bench_memory import memory_report, tables
+from scripts.storage import concat_tables, read_table, table_columns, write_table
+
+
+def test_write_read_with_projection_and_filters(tmp_path):
+    df = pd.DataFrame(
+        {
+            "sked_id": [202301, 202401, 202402],
+            "year": [2023, 2024, 2024],
+            "season_race_num": [1, 1, 2],
+            "Driver": ["A", "B", "C"],
+            "CarNumber": ["05", "11", "5"],
+            "Finish": ["1", "2", None],
+        }
+    )
+    path = tmp_path / "data.csv"
+    write_table(df, path, "raw", csv=True)
+    assert path.exists()
+    assert set(table_columns(path)) == set(df.columns)
+
+    out = read_table(path, "raw", columns=["sked_id", "CarNumber", "Finish", "missing_col"], filters=[("year", "==", 2024)])
+    assert list(out.columns) == ["sked_id", "CarNumber", "Finish"]
+    assert out["sked_id"].tolist() == [202401, 202402]
+    assert out["CarNumber"].tolist() == ["11", "5"]
+    assert out["Finish"].dtype == "Int16"
+    assert read_table(tmp_path / "absent.csv", "raw").empty
+
+
+def test_csv_only_table_filters_on_columns_outside_the_projection(tmp_path):
+    path = tmp_path / "d.csv"
+    pd.DataFrame({"sked_id": [202301, 202401], "year": [2023, 2024], "Driver": ["A", "B"]}).to_csv(path, index=False)
+    out = read_table(path, "raw", columns=["sked_id", "Driver"], filters=[("year", "==", 2024)])
+    assert list(out.columns) == ["sked_id", "Driver"]
+    assert out["Driver"].tolist() == ["B"]
+
+
+def test_parquet_stays_the_source_when_the_csv_export_is_newer(tmp_path, capsys):
+    path = tmp_path / "d.csv"
+    write_table(pd.DataFrame({"sked_id": [1], "Driver": ["A"]}), path, "raw", csv=True)
+    pd.DataFrame({"sked_id": [1], "Driver": ["edited"]}).to_csv(path, index=False)
+    os.utime(path.with_suffix(".parquet"), (1, 1))
+    assert read_table(path, "raw")["Driver"].tolist() == ["A"]
+    assert "is newer than" in capsys.readouterr().out
+
+
+def test_compact_schema_round_trip(tmp_path):
+    df = pd.DataFrame(
+        {
+            "sked_id": [202401, 202401, 202402],
+            "year": [2024, 2024, 2024],
+            "season_race_num": [1, 1, 2],
+            "driver_id": ["b", "a", "a"],
+            "Status": ["Running", "Accident", None],
+            "Laps": [267, 120.0, None],
+            "Led": [3, 0, 1],
+        }
+    )
+    path = tmp_path / "data.csv"
+    write_table(df, path, "raw")
+    out = read_table(path, "raw")
+    assert str(out["sked_id"].dtype) == "int32" and str(out["season_race_num"].dtype) == "int16"
+    assert list(out["driver_id"].cat.categories) == ["a", "b"]
+    assert out["Status"].isna().tolist() == [False, False, True]
+    assert str(out["Laps"].dtype) == "Int16" and str(out["Led"].dtype) == "Int16"
+
+    a, b = read_table(path, "raw", filters=[("season_race_num", "==", 1)]), read_table(path, "raw", filters=[("season_race_num", "==", 2)])
+    both = concat_tables([a, b.assign(driver_id=b["driver_id"].cat.rename_categories({"a": "c"}))], ignore_index=True)
+    assert list(both["driver_id"].cat.categories) == ["a", "b", "c"]
+
+
+def test_compact_tables_are_smaller():
+    report = memory_report(tables(seasons=1)).set_index("table")
+    assert (report["after_mb"] < report["before_mb"]).all()
+    assert report.loc["raw", "ratio"] < 0.5
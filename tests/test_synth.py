@@ -0,0 +1,26 @@
+import numpy as np
+
+from scripts.driveraverages import parse_driveraverages_html
+from scripts.html_cache import HtmlCache
+from scripts.synth import generate_results, render_page, write_cache
+
+
+def test_generator_is_realistic_and_round_trips_through_the_parser(tmp_path):
+    df = generate_results(seasons=3, races=10, field=30, turnover=0.2, dnf_rate=0.1, start_year=2020, seed=1)
+    assert len(df) == 3 * 10 * 30
+    for _, race in df.groupby("sked_id"):
+        assert sorted(race["Finish"]) == list(range(1, 31)) and race["Driver"].is_unique
+        running = race[race["Status"] == "Running"]
+        dnf = race.loc[race["Status"] != "Running", "Finish"]
+        assert dnf.empty or running["Finish"].max() < dnf.min()
+    assert 0.05 < (df["Status"] != "Running").mean() < 0.15
+    assert df["Driver"].nunique() > 30  # turnover brings in new drivers
+    assert df.groupby("Driver")["Team"].nunique().max() == 1
+
+    race = df[df["sked_id"] == 202103]
+    rows = parse_driveraverages_html(render_page(race), 202103, 2021, 3, "x")
+    assert [r["Driver"] for r in rows] == race["Driver"].tolist()
+    assert np.array_equal([r["Finish"] for r in rows], race["Finish"].to_numpy())
+
+    write_cache(df, tmp_path)
+    assert "Race 3 of 2021" in HtmlCache(tmp_path).get(202103)
@@ -0,0 +1,79 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.storage import write_table
+from scripts.train_predict import PRED_ROOT, load_artifacts, main, model_version, prediction_path, read_predictions, save_artifacts, score, train_models
+
+
+def test_saved_artifacts_score_without_retraining(tmp_path):
+    rng = np.random.default_rng(5)
+    n = 240
+    finish = rng.integers(1, 37, n).astype(float)
+    df = pd.DataFrame({
+        "year": 2024, "season_race_num": np.repeat(np.arange(1, 13), 20), "Driver": [f"D{i % 20}" for i in range(n)],
+        "drv_finish_mean_5": finish + rng.normal(0, 3, n), "drv_dnf_rate_5": np.where(rng.random(n) < 0.2, np.nan, rng.random(n)),
+        "target_finish": finish, "target_top10": (finish <= 10).astype(int), "target_dnf": (finish > 33).astype(int),
+    })
+    artifacts, family = train_models(df)
+    save_artifacts(*artifacts[:4], family, artifacts[4], tmp_path)
+
+    race = df[df["season_race_num"] == 12].drop(columns=["drv_dnf_rate_5"])
+    fresh = score(race, *artifacts)
+    loaded = score(race, *load_artifacts(tmp_path))
+    pd.testing.assert_frame_equal(fresh, loaded)
+    assert loaded["prob_top10"].between(0, 1).all()
+
+
+def test_batch_predicts_a_season_in_one_pass_and_replaces_races(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(6)
+    n = 240
+    finish = rng.integers(1, 37, n).astype(float)
+    races = np.repeat(np.arange(1, 13), 20)
+    df = pd.DataFrame({
+        "sked_id": 202400 + races, "year": 2024, "season_race_num": races, "race_date": [f"2024-03-{r:02d}" for r in races],
+        "driver_id": [f"d{i % 20}" for i in range(n)], "Driver": [f"D{i % 20}" for i in range(n)],
+        "drv_finish_mean_5": finish + rng.normal(0, 3, n), "target_finish": finish, "target_top10": (finish <= 10).astype(int), "target_dnf": (finish > 33).astype(int),
+    })
+    write_table(df, "feats.csv", "featurized")
+
+    monkeypatch.setattr(sys, "argv", ["train_predict.py", "--infile", "feats.csv", "--train", "--season", "2024"])
+    main()
+    season = read_predictions()
+    assert season["sked_id"].nunique() == 12 and len(season) == n
+    assert season["model_version"].unique().tolist() == [model_version()] and season["feature_hash"].nunique() == 12
+    assert "[OK] wrote 12 races" in capsys.readouterr().out
+    mtimes = {k: _mtime(k) for k in season["sked_id"].unique()}
+
+    df.loc[df["sked_id"] == 202403, "drv_finish_mean_5"] += 5
+    write_table(df, "feats.csv", "featurized")
+    monkeypatch.setattr(sys, "argv", ["train_predict.py", "--infile", "feats.csv", "--sked_ids", "202403"])
+    main()
+    again = read_predictions()
+    changed = again.groupby("sked_id")["feature_hash"].first() != season.groupby("sked_id")["feature_hash"].first()
+    assert len(again) == n and changed[changed].index.tolist() == [202403]
+    # One file per race: re-predicting 202403 only rewrote its own partition.
+    files = {p.with_suffix("") for p in (tmp_path / PRED_ROOT).glob("year=*/sked_id=*.*")}
+    assert len(files) == 12 and prediction_path(tmp_path / PRED_ROOT, 2024, 202403) in files
+    assert all(mtimes[k] == _mtime(k) for k in mtimes if k != 202403)
+
+
+def _mtime(sked_id):
+    return next(prediction_path(PRED_ROOT, 2024, sked_id).parent.glob(f"sked_id={sked_id}.*")).stat().st_mtime_ns
+
+
+@pytest.mark.parametrize("argv", [
+    ["--season", "2024", "--year", "2024"],
+    ["--season", "2024", "--sked_ids", "202401"],
+    ["--sked_ids", "202401", "--year", "2024", "--races", "1-3"],
+    ["--races", "1-3"],
+    ["--year", "2024", "--race", "1", "--races", "1-3"],
+])
+def test_conflicting_race_selectors_are_rejected(monkeypatch, argv):
+    monkeypatch.setattr(sys, "argv", ["train_predict.py", *argv])
+    with pytest.raises(SystemExit) as exc:
+        main()
+    assert exc.value.code == 2
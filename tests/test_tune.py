@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from scripts import train_predict
+from scripts.backtest import build_matrix
+from scripts.tune import search, time_folds, write_best
+
+
+def test_search_resumes_from_cache_and_feeds_choose_models(tmp_path):
+    assert time_folds(10, 3) == [(2, 4), (4, 6), (6, 10)]
+
+    rng = np.random.default_rng(6)
+    n = 200
+    finish = rng.integers(1, 21, n).astype(float)
+    races = np.repeat(np.arange(1, 11), 20)
+    df = pd.DataFrame({
+        "sked_id": races, "year": 2024, "season_race_num": races, "race_date": pd.to_datetime("2024-02-01") + pd.to_timedelta(races * 7, unit="D"),
+        "Driver": [f"D{i % 20}" for i in range(n)], "drv_finish_mean_5": finish + rng.normal(0, 2, n),
+        "target_finish": finish, "target_top10": (finish <= 10).astype(int), "target_dnf": (finish > 18).astype(int),
+    })
+    shared, keys = build_matrix(df)
+    space = {"top10": {"C": [0.001, 0.1, 10.0]}, "dnf": {"C": [0.1, 1.0]}}
+    cache = tmp_path / "trials.jsonl"
+    best = search(shared, "scikit", space, time_folds(len(keys), 3), trials=10, keep=0.5, cache_path=cache)
+    assert best["top10"][2] == 3
+    evaluated = len(cache.read_text().splitlines())
+    assert evaluated < 3 * 3 + 2 * 3  # pruned trials skip later folds
+
+    again = search(shared, "scikit", space, time_folds(len(keys), 3), trials=10, keep=0.5, cache_path=cache)
+    assert again == best and len(cache.read_text().splitlines()) == evaluated
+
+    path = write_best(best, "scikit", tmp_path)
+    assert json.loads(path.read_text())["scikit"]["top10"] == best["top10"][0]
+    _, clf_top10, _, family = train_predict.choose_models(verbose=False, model_dir=tmp_path)
+    if family == "scikit":
+        assert clf_top10.C == best["top10"][0]["C"]
@@ -0,0 +1,59 @@
+import json
+import sys
+
+import pandas as pd
+import pytest
+
+from scripts import build_dataset, validate_data
+from scripts.get_results import synthetic_rows
+from scripts.results_store import ResultsStore
+from scripts.storage import write_table
+
+
+def _validate(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["validate_data.py", "--chunk_rows", "7", *argv])
+    validate_data.main()
+    return json.loads(validate_data.REPORT_JSON.read_text(encoding="utf-8"))
+
+
+def _build(monkeypatch, results):
+    ResultsStore().write_frame(results)
+    monkeypatch.setattr(sys, "argv", ["build_dataset.py", "--incremental"])
+    build_dataset.main()
+
+
+def test_incremental_validation_matches_full(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    results = pd.DataFrame([r for race in (1, 2, 3) for r in synthetic_rows(2024, race)])
+    results["driver_id"] = results["Driver"].str.lower().str.replace(" ", "_")
+    _build(monkeypatch, results)
+    first = _validate(monkeypatch, "--incremental")
+    assert first["mode"].startswith("full") and first["duplicate_keys"] == 0 and first["schema_drift"]["added"] == []
+
+    results.loc[results["sked_id"].eq(202403) & results["Driver"].eq("Kyle Larson"), "Finish"] = 99
+    _build(monkeypatch, results)
+    inc = _validate(monkeypatch, "--incremental")
+    assert inc["mode"] == "incremental: changed=1 unchanged=2"
+    assert inc["range_violations"]["Finish"] == 1 and list(inc["races_with_issues"]) == ["202403"]
+
+    full = _validate(monkeypatch)
+    assert {k: v for k, v in inc.items() if k != "mode"} == {k: v for k, v in full.items() if k != "mode"}
+
+
+def test_duplicates_across_chunks_and_schema_drift(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = pd.DataFrame([r for race in (1, 2) for r in synthetic_rows(2024, race)])
+    df["driver_id"] = df["Driver"].str.lower().str.replace(" ", "_")
+    write_table(df, "data/raw/data.csv", "raw")
+    _validate(monkeypatch)
+
+    # The repeated first row lands in a later chunk than the original.
+    df = pd.concat([df, df.iloc[[0]]], ignore_index=True)
+    df["new_col"] = 1.5
+    write_table(df.drop(columns=["race_date"]), "data/raw/data.csv", "raw")
+    with pytest.raises(SystemExit):
+        _validate(monkeypatch)
+    report = json.loads(validate_data.REPORT_JSON.read_text(encoding="utf-8"))
+    assert report["critical"] and report["duplicate_keys"] == 1 and report["missing_columns"] == ["race_date"]
+    assert report["schema_drift"]["added"] == ["new_col"] and report["schema_drift"]["removed"] == ["race_date"]
+    assert "duplicate_keys=1" in validate_data.REPORT_TXT.read_text(encoding="utf-8")
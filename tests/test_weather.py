@@ -0,0 +1,80 @@
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from scripts import enrich_weather
+from scripts.get_results import synthetic_rows
+from scripts.results_store import ResultsStore
+from scripts.storage import read_table, write_table
+from scripts.weather import HttpProvider, WeatherCache, lookup
+
+
+def _races():
+    return pd.DataFrame({
+        "sked_id": [1, 2, 3, 4],
+        "race_date": ["2024-02-18", "2024-02-18", "2024-07-04", "2024-07-04"],
+        "scheduled_start_time_local": ["14:30", "14:30", None, "19:00"],
+        # Races 1 and 2 round to the same grid cell and hour; race 4 has no timezone.
+        "track_lat": [29.185, 29.19, 35.37, 35.37],
+        "track_lon": [-81.07, -81.07, -80.68, -80.68],
+        "track_timezone": ["America/New_York", "America/New_York", "America/Chicago", None],
+    })
+
+
+def test_http_provider_batches_and_cache_skips_repeats(tmp_path):
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            points = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["points"]
+            calls.append(points)
+            body = json.dumps({"results": [{**p, "temp_f": 60 + p["lat"], "wind_mph": 5, "precip_in": 0.1} for p in points]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        provider = HttpProvider(f"http://127.0.0.1:{server.server_port}/", batch_size=1)
+        cache = WeatherCache(tmp_path / "cells.csv")
+        wx, requested = lookup(_races(), provider, cache)
+        cache.save()
+        assert requested == 2 and len(calls) == 2
+        assert calls[0] == [{"lat": 29.2, "lon": -81.1, "time": "2024-02-18T19:00"}]
+        assert calls[1][0]["time"] == "2024-07-04T19:00"
+        assert wx["wx_temp_f"].round(1).tolist()[:3] == [89.2, 89.2, 95.4] and pd.isna(wx.loc[3, "wx_temp_f"])
+        assert wx["wx_source"].tolist() == ["http", "http", "http", "missing"] and wx["wx_precip_flag"].tolist()[:3] == [1.0, 1.0, 1.0]
+
+        again, requested = lookup(_races(), provider, WeatherCache(tmp_path / "cells.csv"))
+        assert requested == 0 and len(calls) == 2
+        pd.testing.assert_frame_equal(again, wx)
+    finally:
+        server.shutdown()
+
+
+def test_enrich_weather_joins_track_and_start_time(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    ResultsStore().write_frame(pd.DataFrame(synthetic_rows(2024, 1) + synthetic_rows(2024, 2)))
+    write_table(pd.DataFrame({"sked_id": [202401, 202402], "scheduled_start_time_local": ["13:00", "15:00"]}), "data/enrich/race_meta.csv", "race_meta")
+    tracks = pd.DataFrame({"track_id": ["track_0001", "track_0002"], "track_canonical": ["Track 1", "Track 2"], "track_lat": [33.38, 33.38], "track_lon": [-112.31, -112.31], "track_timezone": "America/Phoenix"})
+    write_table(tracks, "data/enrich/track_meta.csv", "track_meta")
+    archive = pd.DataFrame({"lat": 33.4, "lon": -112.3, "time": ["2024-01-01T20:00Z", "2024-01-02T22:00Z"], "temp_f": [70.0, 48.0], "wind_mph": [3.0, 9.0], "gust_mph": [5.0, 15.0], "precip_in": [0.0, 0.2]})
+    write_table(archive, "data/enrich/weather_archive.csv")
+
+    monkeypatch.setattr(sys, "argv", ["enrich_weather.py"])
+    enrich_weather.main()
+    wx = read_table("data/enrich/weather.csv", "weather").set_index("sked_id")
+    assert wx["wx_temp_f"].tolist() == [70.0, 48.0] and wx["wx_precip_flag"].tolist() == [0.0, 1.0]
+    assert wx["wx_time_utc"].tolist() == ["2024-01-01T20:00", "2024-01-02T22:00"]
+    assert "2 cells requested" in capsys.readouterr().out
+
+    enrich_weather.main()
+    assert "0 cells requested" in capsys.readouterr().out